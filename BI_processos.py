@@ -1,157 +1,291 @@
-import pandas as pd
-from dash import dcc, html, dash_table
-import plotly.express as px
+from dash import dcc, html, dash_table, ctx, no_update
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output
 from app_instance import app
+import agregacao
+import banco
+import cache_resultados
+import dados
+import exportar
+import graficos
+import indice
+import metricas
+import modo_cliente
+import segundo_plano
+import tabelas
 
-# Carregar dados
-df = pd.read_excel("processos.xlsx")
-df["% Concluído"] = pd.to_numeric(df["% Concluído"], errors='coerce')
-
-# Layout
-layout = dbc.Container([
-    dbc.Row([
-        dbc.Col(html.H2("B.I PPGC - PROCESSOS", className="text-center fw-bold text-light mb-4"))
-    ]),
-
-    dbc.Row([
-        # Sidebar
-        dbc.Col([
-            html.Div([
-                html.Label("Setor", className="fw-bold text-light"),
-                dcc.Dropdown(
-                    options=[{"label": s, "value": s} for s in sorted(df['Setores mapeados'].dropna().unique())],
-                    id="filtro-setor-processos", placeholder="Todos", multi=True, className="mb-3"
-                ),
-                html.Label("Responsável", className="fw-bold text-light"),
-                dcc.Dropdown(
-                    options=[{"label": r, "value": r} for r in sorted(df['Responsável'].dropna().unique())],
-                    id="filtro-responsavel-processos", placeholder="Todos", multi=True, className="mb-3"
-                ),
-                html.Label("Status Entrega", className="fw-bold text-light"),
-                dcc.Dropdown(
-                    options=[{"label": e, "value": e} for e in sorted(df['Status'].dropna().unique())],
-                    id="filtro-status-processos", placeholder="Todos", multi=True
-                )
-            ], style={"backgroundColor": "#0E1A21", "padding": "20px", "borderRadius": "10px"})
-        ], width=2),
-
-        # Conteúdo principal
-        dbc.Col([
-            # Tabela
-            dbc.Card(
-                dash_table.DataTable(
-                    id="tabela-processos",
-                    columns=[
-                        {"name": "ID", "id": "ID"},
-                        {"name": "Setores mapeados", "id": "Setores mapeados"},
-                        {"name": "Atividades mapeadas por setor", "id": "Atividades mapeadas"},
-                        {"name": "Instruções feitas pelo setor", "id": "Instruçoes feitas"},
-                        {"name": "Instruções reestruturadas", "id": "Instruçoes reestruturadas"},
-                        {"name": "Entrevistados", "id": "Qtd colaboradores entrevistados"},
-                        {"name": "% Concluído", "id": "% Concluído", "type": "numeric"},
-                        {"name": "Status Entrega", "id": "Status"},
-                        {"name": "Etapa / Entrega", "id": "Etapa / Entrega"},
-                    ],
-                    style_table={'overflowX': 'auto'},
-                    style_cell={'textAlign': 'center', 'backgroundColor': '#192A35', 'color': '#C2E0E7', 'whiteSpace': 'normal', 'height': 'auto'},
-                    style_header={'fontWeight': 'bold', 'backgroundColor': '#263640', 'color': '#C2E0E7'},
+
+# Colunas dos filtros laterais, indexadas a cada versão dos dados
+COLUNAS_FILTRO = ["Setores mapeados", "Responsável", "Status"]
+
+# Colunas enviadas ao navegador no modo cliente (tabela + gráficos)
+COLUNAS_CLIENTE = [
+    "ID", "Setores mapeados", "Atividades mapeadas", "Instruçoes feitas", "Instruçoes reestruturadas",
+    "Qtd colaboradores entrevistados", "% Concluído", "Status", "Etapa / Entrega", "Responsável",
+]
+
+
+# Gráficos montados uma vez; os filtros só trocam os dados do trace (Patch)
+ESQUELETO_ATIVIDADES = graficos.esqueleto_barras(
+    "Atividades Mapeadas por Setor", "Setores mapeados", "Atividades mapeadas", texto=True
+)
+ESQUELETO_ENTREGAS = graficos.esqueleto_barras("Entregas Concluídas", "Etapa / Entrega", "Quantidade")
+ESQUELETO_STATUS = graficos.esqueleto_pizza("Composição Status", "Status", "Quantidade")
+
+# Tipos das colunas, aplicados na carga (ver esquema.py)
+ESQUEMA = {
+    "ID": "decimal",
+    "Setores mapeados": "categoria",
+    "Atividades mapeadas": "inteiro",
+    "Instruçoes feitas": "inteiro",
+    "Instruçoes reestruturadas": "inteiro",
+    "Manuais": "inteiro",
+    "Qtd colaboradores entrevistados": "inteiro",
+    "Qtd treinamentos executados": "inteiro",
+    "Responsável": "categoria",
+    "% Concluído": "inteiro",
+    "Status": "categoria",
+    "Etapa / Entrega": "categoria",
+}
+
+
+# Preparar dados (executado a cada nova versão da planilha)
+def preparar(df, versao):
+    if banco.ATIVO:
+        # Dados no banco analítico: o snapshot guarda só a referência à tabela
+        return {"tabela": banco.ingerir("processos", versao, df, COLUNAS_FILTRO)}
+    return {"df": df, "indice": indice.construir_indice(df, COLUNAS_FILTRO)}
+
+
+# Valores distintos de uma coluna, para as opções dos filtros
+def opcoes(snap, coluna):
+    if banco.ATIVO:
+        return banco.distintos(snap.tabela, coluna)
+    return sorted(snap.df[coluna].dropna().unique())
+
+
+dados.registrar_fonte("processos", "processos.xlsx", preparar, tipos=ESQUEMA)
+
+
+# Layout (montado a cada acesso para refletir a versão atual dos dados)
+def layout():
+    snap = dados.snapshot("processos")
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col(html.H2("B.I PPGC - PROCESSOS", className="text-center fw-bold text-light mb-4"))
+        ]),
+
+        # Modo cliente: retrato compacto dos dados para os callbacks no navegador
+        *([dcc.Store(id="dados-processos", data=modo_cliente.compactar(snap, COLUNAS_CLIENTE))] if modo_cliente.ATIVO else []),
+
+        dbc.Row([
+            # Sidebar
+            dbc.Col([
+                html.Div([
+                    html.Label("Setor", className="fw-bold text-light"),
+                    dcc.Dropdown(
+                        options=[{"label": s, "value": s} for s in opcoes(snap, 'Setores mapeados')],
+                        id="filtro-setor-processos", placeholder="Todos", multi=True, className="mb-3"
+                    ),
+                    html.Label("Responsável", className="fw-bold text-light"),
+                    dcc.Dropdown(
+                        options=[{"label": r, "value": r} for r in opcoes(snap, 'Responsável')],
+                        id="filtro-responsavel-processos", placeholder="Todos", multi=True, className="mb-3"
+                    ),
+                    html.Label("Status Entrega", className="fw-bold text-light"),
+                    dcc.Dropdown(
+                        options=[{"label": e, "value": e} for e in opcoes(snap, 'Status')],
+                        id="filtro-status-processos", placeholder="Todos", multi=True
+                    )
+                ], style={"backgroundColor": "#0E1A21", "padding": "20px", "borderRadius": "10px"})
+            ], width=2),
+
+            # Conteúdo principal
+            dbc.Col([
+                *segundo_plano.barra("progresso-processos"),
+                exportar.links("processos"),
+
+                # Tabela
+                dbc.Card(
+                    dash_table.DataTable(
+                        id="tabela-processos",
+                        columns=[
+                            {"name": "ID", "id": "ID"},
+                            {"name": "Setores mapeados", "id": "Setores mapeados"},
+                            {"name": "Atividades mapeadas por setor", "id": "Atividades mapeadas"},
+                            {"name": "Instruções feitas pelo setor", "id": "Instruçoes feitas"},
+                            {"name": "Instruções reestruturadas", "id": "Instruçoes reestruturadas"},
+                            {"name": "Entrevistados", "id": "Qtd colaboradores entrevistados"},
+                            {"name": "% Concluído", "id": "% Concluído", "type": "numeric"},
+                            {"name": "Status Entrega", "id": "Status"},
+                            {"name": "Etapa / Entrega", "id": "Etapa / Entrega"},
+                        ],
+                        style_table={'overflowX': 'auto'},
+                        style_cell={'textAlign': 'center', 'backgroundColor': '#192A35', 'color': '#C2E0E7', 'whiteSpace': 'normal', 'height': 'auto'},
+                        style_header={'fontWeight': 'bold', 'backgroundColor': '#263640', 'color': '#C2E0E7'},
+                        **(tabelas.MODO_NATIVO if modo_cliente.ATIVO else tabelas.MODO_SERVIDOR)
+                    ),
+                    style={
+                        "backgroundColor": "#192A35",
+                        "borderRadius": "15px",
+                        "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
+                        "padding": "10px",
+                        "marginBottom": "20px"
+                    }
                 ),
-                style={
-                    "backgroundColor": "#192A35",
-                    "borderRadius": "15px",
-                    "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
-                    "padding": "10px",
-                    "marginBottom": "20px"
-                }
-            ),
-
-            # Gráficos
-            dbc.Row([
-                dbc.Col(dbc.Card(dcc.Graph(id="grafico-atividades-processos"), style={
-                    "backgroundColor": "#192A35",
-                    "borderRadius": "15px",
-                    "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
-                    "padding": "10px",
-                    "marginBottom": "20px"
-                }), width=12),  # Ocupa 100% da largura
-            ]),
-
-            dbc.Row([
-                dbc.Col(dbc.Card(dcc.Graph(id="grafico-entregas-processos"), style={
-                    "backgroundColor": "#192A35",
-                    "borderRadius": "15px",
-                    "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
-                    "padding": "10px",
-                    "marginBottom": "20px"
-                }), width=6),
-                dbc.Col(dbc.Card(dcc.Graph(id="grafico-status-processos"), style={
-                    "backgroundColor": "#192A35",
-                    "borderRadius": "15px",
-                    "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
-                    "padding": "10px",
-                    "marginBottom": "20px"
-                }), width=6),
-            ])
-        ], width=10)
-    ])
-], fluid=True, style={"backgroundColor": "#121E26", "minHeight": "100vh", "padding": "20px"})
+
+                # Gráficos
+                dbc.Row([
+                    dbc.Col(dbc.Card(dcc.Graph(id="grafico-atividades-processos", figure=ESQUELETO_ATIVIDADES), style={
+                        "backgroundColor": "#192A35",
+                        "borderRadius": "15px",
+                        "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
+                        "padding": "10px",
+                        "marginBottom": "20px"
+                    }), width=12),  # Ocupa 100% da largura
+                ]),
+
+                dbc.Row([
+                    dbc.Col(dbc.Card(dcc.Graph(id="grafico-entregas-processos", figure=ESQUELETO_ENTREGAS), style={
+                        "backgroundColor": "#192A35",
+                        "borderRadius": "15px",
+                        "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
+                        "padding": "10px",
+                        "marginBottom": "20px"
+                    }), width=6),
+                    dbc.Col(dbc.Card(dcc.Graph(id="grafico-status-processos", figure=ESQUELETO_STATUS), style={
+                        "backgroundColor": "#192A35",
+                        "borderRadius": "15px",
+                        "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
+                        "padding": "10px",
+                        "marginBottom": "20px"
+                    }), width=6),
+                ])
+            ], width=10)
+        ])
+    ], fluid=True, style={"backgroundColor": "#121E26", "minHeight": "100vh", "padding": "20px"})
 
 
 # CALLBACKS
-@app.callback(
-    Output("tabela-processos", "data"),
-    Output("grafico-atividades-processos", "figure"),
-    Output("grafico-entregas-processos", "figure"),
-    Output("grafico-status-processos", "figure"),
-    Input("filtro-setor-processos", "value"),
-    Input("filtro-responsavel-processos", "value"),
-    Input("filtro-status-processos", "value")
-)
-def atualizar_tudo(f_setor, f_resp, f_status):
-    dff = df.copy()
-    if f_setor:
-        dff = dff[dff['Setores mapeados'].isin(f_setor)]
-    if f_resp:
-        dff = dff[dff['Responsável'].isin(f_resp)]
-    if f_status:
-        dff = dff[dff['Status'].isin(f_status)]
-
-    tabela = dff.to_dict('records')
-
-    # Gráfico Atividades Mapeadas por Setor
-    fig_ativ = px.bar(
-        dff, x='Setores mapeados', y='Atividades mapeadas',
-        title="Atividades Mapeadas por Setor", color='Setores mapeados',
-        text_auto=True, color_discrete_sequence=px.colors.sequential.Oranges
+if modo_cliente.ATIVO:
+    # Filtros, tabela e gráficos no navegador, a partir do dcc.Store da página
+    app.clientside_callback(
+        ClientsideFunction(namespace="bi", function_name="processos"),
+        Output("tabela-processos", "data"),
+        Output("grafico-atividades-processos", "figure"),
+        Output("grafico-entregas-processos", "figure"),
+        Output("grafico-status-processos", "figure"),
+        Input("dados-processos", "data"),
+        Input("filtro-setor-processos", "value"),
+        Input("filtro-responsavel-processos", "value"),
+        Input("filtro-status-processos", "value")
     )
-
-    # Gráfico Entregas Concluídas por Etapa
-    fig_entregas = px.bar(
-        dff, x='Etapa / Entrega', title="Entregas Concluídas",
-        color='Etapa / Entrega',
-        color_discrete_sequence=px.colors.sequential.Oranges
+else:
+    # Em segundo plano quando BI_SEGUNDO_PLANO=1 (ver segundo_plano.py)
+    @segundo_plano.callback(
+        "progresso-processos",
+        Output("tabela-processos", "data"),
+        Output("tabela-processos", "page_count"),
+        Output("tabela-processos", "page_current"),
+        Output("grafico-atividades-processos", "figure"),
+        Output("grafico-entregas-processos", "figure"),
+        Output("grafico-status-processos", "figure"),
+        Input("filtro-setor-processos", "value"),
+        Input("filtro-responsavel-processos", "value"),
+        Input("filtro-status-processos", "value"),
+        Input("tabela-processos", "page_current"),
+        Input("tabela-processos", "page_size"),
+        Input("tabela-processos", "sort_by"),
+        Input("tabela-processos", "filter_query")
     )
+    def atualizar_tudo(f_setor, f_resp, f_status, page_current, page_size, sort_by, filter_query):
+        snap = dados.snapshot("processos")
 
-    # Gráfico Composição Status
-    fig_status = px.pie(
-        dff, names='Status', hole=0.5,
-        title="Composição Status",
-        color_discrete_sequence=["#FFA726", "#FB8C00", "#F57C00", "#EF6C00", "#E65100"]
+        # Só a página visível da tabela vai para o navegador
+        tabela, page_count, page_current = pagina_tabela(
+            snap, f_setor, f_resp, f_status, page_current, page_size, sort_by, filter_query
+        )
 
-    )
+        # Paginação, ordenação e filtro da tabela não mudam os gráficos
+        if ctx.triggered_id == "tabela-processos":
+            return tabela, page_count, page_current, no_update, no_update, no_update
+        segundo_plano.progresso(30)
 
-    # Estilo dos Gráficos (Dark Theme)
-    for fig in [fig_ativ, fig_entregas, fig_status]:
-        fig.update_layout(
-            plot_bgcolor="rgba(0,0,0,0)",
-            paper_bgcolor="rgba(0,0,0,0)",
-            font_color="#C2E0E7",
-            title_font_size=16,
-            title_x=0.5,
-            margin=dict(l=20, r=20, t=50, b=20),
-            font=dict(size=12)
+        # Só os dados dos traces; tema e títulos já estão nos esqueletos
+        ativ, entregas, status = figuras(snap, f_setor, f_resp, f_status)
+        return (
+            tabela, page_count, page_current,
+            graficos.atualizar(ativ), graficos.atualizar(entregas), graficos.atualizar(status),
         )
 
-    return tabela, fig_ativ, fig_entregas, fig_status
+
+# Links de exportação com os filtros laterais e os da tabela
+exportar.atualizar_links(
+    "processos",
+    {
+        'Setores mapeados': Input("filtro-setor-processos", "value"),
+        'Responsável': Input("filtro-responsavel-processos", "value"),
+        'Status': Input("filtro-status-processos", "value"),
+    },
+    "tabela-processos",
+)
+
+
+def filtros_processos(f_setor, f_resp, f_status):
+    return {
+        'Setores mapeados': f_setor,
+        'Responsável': f_resp,
+        'Status': f_status,
+    }
+
+
+def filtrar_processos(snap, f_setor, f_resp, f_status):
+    return indice.filtrar(snap.df, snap.indice, filtros_processos(f_setor, f_resp, f_status))
+
+
+@cache_resultados.memorizar("processos-tabela")
+def pagina_tabela(snap, f_setor, f_resp, f_status, page_current, page_size, sort_by, filter_query):
+    if banco.ATIVO:
+        filtros = filtros_processos(f_setor, f_resp, f_status)
+        return banco.pagina(snap.tabela, filtros, page_current, page_size, sort_by, filter_query)
+    dff = filtrar_processos(snap, f_setor, f_resp, f_status)
+    return tabelas.pagina(dff, page_current, page_size, sort_by, filter_query)
+
+
+# Todas as linhas do resultado da tabela (filtros laterais, filtro e
+# ordenação do DataTable), em blocos para a exportação
+def exportar_tabela(args, tamanho):
+    snap = dados.snapshot("processos")
+    filtros = {coluna: exportar.valores(args, coluna) for coluna in COLUNAS_FILTRO}
+    sort_by, filter_query = exportar.ordem(args), exportar.filtro(args)
+    if banco.ATIVO:
+        return banco.exportar(snap.tabela, filtros, sort_by, filter_query, tamanho)
+    dff = indice.filtrar(snap.df, snap.indice, filtros)
+    return exportar.blocos(dff, tamanho, sort_by, filter_query)
+
+
+exportar.registrar("processos", exportar_tabela)
+
+
+# Dados dos traces dos três gráficos, aplicados aos esqueletos como Patch
+@cache_resultados.memorizar("processos-figuras")
+@metricas.fase("figuras")
+def figuras(snap, f_setor, f_resp, f_status):
+    # Agregados por categoria: cada gráfico leva um ponto por categoria, não por linha
+    if banco.ATIVO:
+        filtros = filtros_processos(f_setor, f_resp, f_status)
+        ativ_por_setor = banco.somar(snap.tabela, 'Setores mapeados', 'Atividades mapeadas', filtros)
+        entregas_por_etapa = banco.contar(snap.tabela, 'Etapa / Entrega', filtros)
+        contagem_status = banco.contar(snap.tabela, 'Status', filtros)
+    else:
+        dff = filtrar_processos(snap, f_setor, f_resp, f_status)
+        ativ_por_setor = agregacao.somar(dff, 'Setores mapeados', 'Atividades mapeadas')
+        entregas_por_etapa = agregacao.contar(dff, 'Etapa / Entrega')
+        contagem_status = agregacao.contar(dff, 'Status')
+    segundo_plano.progresso(90)
+
+    return (
+        graficos.dados_barras(ativ_por_setor, 'Setores mapeados', 'Atividades mapeadas', graficos.CORES_BARRAS),
+        graficos.dados_barras(entregas_por_etapa, 'Etapa / Entrega', 'Quantidade', graficos.CORES_BARRAS),
+        graficos.dados_pizza(contagem_status, 'Status', 'Quantidade'),
+    )
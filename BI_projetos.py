@@ -1,203 +1,274 @@
-import pandas as pd
 from dash import dcc, html, dash_table
-import plotly.express as px
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output
 from app_instance import app
+import agregacao
+import banco
+import cache_resultados
+import dados
+import exportar
+import graficos
+import indice
+import metricas
+import modo_cliente
+import segundo_plano
+import tabelas
 
 # Cores do tema
 COR_FUNDO = "#121E26"
 COR_CARD = "#192A35"
 COR_TEXTO = "#C2E0E7"
-COR_GRAFICO = px.colors.sequential.Oranges
-
-# Carregar dados
-df = pd.read_excel("Projetos.xlsx")
-
-# Garantir que a coluna '% Concluído' seja numérica
-df["% Concluído"] = pd.to_numeric(df["% Concluído"], errors='coerce')
-
-# Layout da página
-layout = dbc.Container([
-    dbc.Row([
-        dbc.Col(html.H2("B.I PPGC - PROJETOS", className="text-center fw-bold text-light mb-4"))
-    ]),
-
-    dbc.Row([
-        # Filtros laterais
-        dbc.Col([
-            html.Div([
-                html.Label("Status", className="fw-bold text-light"),
-                dcc.Dropdown(
-                    options=[{"label": s, "value": s} for s in sorted(df['Status'].dropna().unique())],
-                    id="filtro-status",
-                    placeholder="Todos",
-                    multi=True,
-                    className="mb-3"
-                ),
-            ], style={"backgroundColor": COR_CARD, "padding": "20px", "borderRadius": "10px"})
-        ], width=2),
-
-        # Conteúdo principal: tabela + gráficos
-        dbc.Col([
-            dbc.Card(
-                dash_table.DataTable(
-                    id="tabela-projetos",
-                    columns=[
-                        {"name": "ID", "id": "ID"},
-                        {"name": "Nome do Projeto", "id": "Nome do Projeto"},
-                        {"name": "Início", "id": "Início"},
-                        {"name": "Status", "id": "Status"},
-                        {"name": "% Concluído", "id": "% Concluído", "type": "numeric"},
-                    ],
-                    style_table={'overflowX': 'auto'},
-                    style_cell={
-                        'textAlign': 'center',
-                        'backgroundColor': COR_CARD,
-                        'color': COR_TEXTO,
-                        'whiteSpace': 'normal',
-                        'height': 'auto'
-                    },
-                    style_header={
-                        'fontWeight': 'bold',
-                        'backgroundColor': "#263640",
-                        'color': COR_TEXTO
-                    },
-                    
-                ),
-                style={
-                    "backgroundColor": COR_CARD,
-                    "borderRadius": "15px",
-                    "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
-                    "padding": "10px",
-                    "marginBottom": "20px"
-                }
-            ),
-
-            dbc.Row([
-                # Gráfico de Rosca (Status)
-                dbc.Col(
-                    dbc.Card(
-                        dcc.Graph(id="grafico-distribuicao"),
-                        style={
-                            "backgroundColor": COR_CARD,
-                            "borderRadius": "15px",
-                            "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
-                            "padding": "10px",
-                            "marginBottom": "20px"
-                        }
+COR_GRAFICO = graficos.CORES_BARRAS
+
+# Gráficos montados uma vez; o filtro só troca os dados do trace (Patch)
+ESQUELETO_STATUS = graficos.esqueleto_barras(
+    "Composição de Status dos Projetos", "Status", "Quantidade", cor="#FB8C00"
+)
+ESQUELETO_DISTRIBUICAO = graficos.esqueleto_pizza("Distribuição de Projetos por Status", "Status", "Quantidade")
+ESQUELETO_PERCENTUAL = graficos.esqueleto_barras(
+    "Percentual de Conclusão por Projeto", "Nome do Projeto", "% Concluído",
+    cor=COR_GRAFICO[0], xaxis_tickangle=-45
+)
+
+
+# Colunas enviadas ao navegador no modo cliente (tabela + gráficos)
+COLUNAS_CLIENTE = ["ID", "Nome do Projeto", "Início", "Status", "% Concluído"]
+
+
+# Tipos das colunas, aplicados na carga (ver esquema.py). '% Concluído' vem
+# misturado com textos como "100%", que ficam vazios
+ESQUEMA = {
+    "ID": "inteiro",
+    "Nome do Projeto": "texto",
+    "Início": "data",
+    "Status": "categoria",
+    "% Concluído": "inteiro",
+}
+
+
+# Preparar dados (executado a cada nova versão da planilha)
+def preparar(df, versao):
+    if banco.ATIVO:
+        # Dados no banco analítico: o snapshot guarda só a referência à tabela
+        return {"tabela": banco.ingerir("projetos", versao, df, ["Status"])}
+    return {"df": df, "indice": indice.construir_indice(df, ["Status"])}
+
+
+dados.registrar_fonte("projetos", "Projetos.xlsx", preparar, tipos=ESQUEMA)
+
+
+# Layout da página (montado a cada acesso para refletir a versão atual dos dados)
+def layout():
+    snap = dados.snapshot("projetos")
+    status = banco.distintos(snap.tabela, "Status") if banco.ATIVO else sorted(snap.df['Status'].dropna().unique())
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col(html.H2("B.I PPGC - PROJETOS", className="text-center fw-bold text-light mb-4"))
+        ]),
+
+        # Modo cliente: retrato compacto dos dados para os callbacks no navegador
+        *([dcc.Store(id="dados-projetos", data=modo_cliente.compactar(snap, COLUNAS_CLIENTE))] if modo_cliente.ATIVO else []),
+
+        dbc.Row([
+            # Filtros laterais
+            dbc.Col([
+                html.Div([
+                    html.Label("Status", className="fw-bold text-light"),
+                    dcc.Dropdown(
+                        options=[{"label": s, "value": s} for s in status],
+                        id="filtro-status",
+                        placeholder="Todos",
+                        multi=True,
+                        className="mb-3"
                     ),
-                    width=6
-                ),
-                # Gráfico de Barras (Status)
-                dbc.Col(
-                    dbc.Card(
-                        dcc.Graph(id="grafico-status"),
-                        style={
-                            "backgroundColor": COR_CARD,
-                            "borderRadius": "15px",
-                            "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
-                            "padding": "10px",
-                            "marginBottom": "20px"
-                        }
+                ], style={"backgroundColor": COR_CARD, "padding": "20px", "borderRadius": "10px"})
+            ], width=2),
+
+            # Conteúdo principal: tabela + gráficos
+            dbc.Col([
+                *segundo_plano.barra("progresso-projetos"),
+                exportar.links("projetos"),
+
+                dbc.Card(
+                    dash_table.DataTable(
+                        id="tabela-projetos",
+                        columns=[
+                            {"name": "ID", "id": "ID"},
+                            {"name": "Nome do Projeto", "id": "Nome do Projeto"},
+                            {"name": "Início", "id": "Início"},
+                            {"name": "Status", "id": "Status"},
+                            {"name": "% Concluído", "id": "% Concluído", "type": "numeric"},
+                        ],
+                        style_table={'overflowX': 'auto'},
+                        style_cell={
+                            'textAlign': 'center',
+                            'backgroundColor': COR_CARD,
+                            'color': COR_TEXTO,
+                            'whiteSpace': 'normal',
+                            'height': 'auto'
+                        },
+                        style_header={
+                            'fontWeight': 'bold',
+                            'backgroundColor': "#263640",
+                            'color': COR_TEXTO
+                        },
+                        **(tabelas.MODO_NATIVO if modo_cliente.ATIVO else tabelas.MODO_SERVIDOR)
                     ),
-                    width=6
-                )
-            ]),
-
-            dbc.Row([
-                # Gráfico Percentual de Conclusão
-                dbc.Col(
-                    dbc.Card(
-                        dcc.Graph(id="grafico-percentual"),
-                        style={
-                            "backgroundColor": COR_CARD,
-                            "borderRadius": "15px",
-                            "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
-                            "padding": "10px",
-                            "marginBottom": "20px"
-                        }
+                    style={
+                        "backgroundColor": COR_CARD,
+                        "borderRadius": "15px",
+                        "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
+                        "padding": "10px",
+                        "marginBottom": "20px"
+                    }
+                ),
+
+                dbc.Row([
+                    # Gráfico de Rosca (Status)
+                    dbc.Col(
+                        dbc.Card(
+                            dcc.Graph(id="grafico-distribuicao", figure=ESQUELETO_DISTRIBUICAO),
+                            style={
+                                "backgroundColor": COR_CARD,
+                                "borderRadius": "15px",
+                                "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
+                                "padding": "10px",
+                                "marginBottom": "20px"
+                            }
+                        ),
+                        width=6
                     ),
-                    width=12
-                )
-            ])
-        ], width=10)
-    ])
-], fluid=True, style={"backgroundColor": COR_FUNDO, "minHeight": "100vh", "padding": "20px"})
+                    # Gráfico de Barras (Status)
+                    dbc.Col(
+                        dbc.Card(
+                            dcc.Graph(id="grafico-status", figure=ESQUELETO_STATUS),
+                            style={
+                                "backgroundColor": COR_CARD,
+                                "borderRadius": "15px",
+                                "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
+                                "padding": "10px",
+                                "marginBottom": "20px"
+                            }
+                        ),
+                        width=6
+                    )
+                ]),
+
+                dbc.Row([
+                    # Gráfico Percentual de Conclusão
+                    dbc.Col(
+                        dbc.Card(
+                            dcc.Graph(id="grafico-percentual", figure=ESQUELETO_PERCENTUAL),
+                            style={
+                                "backgroundColor": COR_CARD,
+                                "borderRadius": "15px",
+                                "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
+                                "padding": "10px",
+                                "marginBottom": "20px"
+                            }
+                        ),
+                        width=12
+                    )
+                ])
+            ], width=10)
+        ])
+    ], fluid=True, style={"backgroundColor": COR_FUNDO, "minHeight": "100vh", "padding": "20px"})
+
 
 # CALLBACKS
 
-@app.callback(
-    Output("tabela-projetos", "data"),
-    Input("filtro-status", "value")
-)
-def filtrar_tabela(f_status):
-    dff = df.copy()
-    if f_status:
-        dff = dff[dff['Status'].isin(f_status)]
-    return dff.to_dict('records')
-
-@app.callback(
-    Output("grafico-status", "figure"),
-    Output("grafico-distribuicao", "figure"),
-    Output("grafico-percentual", "figure"),
-    Input("tabela-projetos", "data"),
-)
-def atualizar_graficos(dados_tabela):
-    df_filtrado = pd.DataFrame(dados_tabela)
-
-    if df_filtrado.empty:
-        empty_fig = px.scatter()
-        empty_fig.update_layout(
-            plot_bgcolor="rgba(0,0,0,0)",
-            paper_bgcolor="rgba(0,0,0,0)",
-            font_color=COR_TEXTO,
-            title_font_size=16,
-            title_x=0.5,
-            margin=dict(l=20, r=20, t=50, b=20),
-            font=dict(size=12)
-        )
-        return empty_fig, empty_fig, empty_fig
-
-    # Contagem status para gráfico de barras
-    contagem_status = df_filtrado["Status"].value_counts().reset_index()
-    contagem_status.columns = ["Status", "Quantidade"]
-
-    fig_status = px.bar(
-        contagem_status,
-        x="Status",
-        y="Quantidade",
-        labels={"Status": "Status", "Quantidade": "Quantidade"},
-        title="Composição de Status dos Projetos",
-        color_discrete_sequence=["#FB8C00", "#FB8C00", "#F57C00", "#EF6C00", "#E65100"]
+def filtrar_projetos(snap, f_status):
+    return indice.filtrar(snap.df, snap.indice, {'Status': f_status})
+
+if modo_cliente.ATIVO:
+    # Filtro, tabela e gráficos no navegador, a partir do dcc.Store da página
+    app.clientside_callback(
+        ClientsideFunction(namespace="bi", function_name="projetos_tabela"),
+        Output("tabela-projetos", "data"),
+        Input("dados-projetos", "data"),
+        Input("filtro-status", "value")
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace="bi", function_name="projetos_graficos"),
+        Output("grafico-status", "figure"),
+        Output("grafico-distribuicao", "figure"),
+        Output("grafico-percentual", "figure"),
+        Input("dados-projetos", "data"),
+        Input("filtro-status", "value")
+    )
+else:
+    @app.callback(
+        Output("tabela-projetos", "data"),
+        Output("tabela-projetos", "page_count"),
+        Output("tabela-projetos", "page_current"),
+        Input("filtro-status", "value"),
+        Input("tabela-projetos", "page_current"),
+        Input("tabela-projetos", "page_size"),
+        Input("tabela-projetos", "sort_by"),
+        Input("tabela-projetos", "filter_query")
     )
+    def filtrar_tabela(f_status, page_current, page_size, sort_by, filter_query):
+        # Só a página visível da tabela vai para o navegador
+        return pagina_tabela(dados.snapshot("projetos"), f_status, page_current, page_size, sort_by, filter_query)
 
-    fig_distribuicao = px.pie(
-        df_filtrado,
-        names="Status",
-        hole=0.5,
-        title="Distribuição de Projetos por Status",
-        color_discrete_sequence=["#FFA726", "#FB8C00", "#F57C00", "#EF6C00", "#E65100"]
+    # Os gráficos partem do filtro de Status, em paralelo com a tabela, sem
+    # depender dos dados dela (que só tem a página visível). Em segundo plano
+    # quando BI_SEGUNDO_PLANO=1 (ver segundo_plano.py)
+    @segundo_plano.callback(
+        "progresso-projetos",
+        Output("grafico-status", "figure"),
+        Output("grafico-distribuicao", "figure"),
+        Output("grafico-percentual", "figure"),
+        Input("filtro-status", "value"),
     )
+    def atualizar_graficos(f_status):
+        # Só os dados dos traces; tema e títulos já estão nos esqueletos
+        return [graficos.atualizar(d) for d in figuras(dados.snapshot("projetos"), f_status)]
+
+
+# Links de exportação com o filtro de Status e os da tabela
+exportar.atualizar_links("projetos", {'Status': Input("filtro-status", "value")}, "tabela-projetos")
+
+
+@cache_resultados.memorizar("projetos-tabela")
+def pagina_tabela(snap, f_status, page_current, page_size, sort_by, filter_query):
+    if banco.ATIVO:
+        return banco.pagina(snap.tabela, {'Status': f_status}, page_current, page_size, sort_by, filter_query)
+    dff = filtrar_projetos(snap, f_status)
+    return tabelas.pagina(dff, page_current, page_size, sort_by, filter_query)
+
+# Todas as linhas do resultado da tabela, em blocos para a exportação
+def exportar_tabela(args, tamanho):
+    snap = dados.snapshot("projetos")
+    f_status = exportar.valores(args, 'Status')
+    sort_by, filter_query = exportar.ordem(args), exportar.filtro(args)
+    if banco.ATIVO:
+        return banco.exportar(snap.tabela, {'Status': f_status}, sort_by, filter_query, tamanho)
+    return exportar.blocos(filtrar_projetos(snap, f_status), tamanho, sort_by, filter_query)
+
+
+exportar.registrar("projetos", exportar_tabela)
+
+
+# Dados dos traces dos três gráficos, aplicados aos esqueletos como Patch
+@cache_resultados.memorizar("projetos-figuras")
+@metricas.fase("figuras")
+def figuras(snap, f_status):
+    # Contagem de status: barras e rosca usam o mesmo agregado. No percentual,
+    # um ponto por projeto, limitado aos maiores (média do restante em "Outros")
+    if banco.ATIVO:
+        filtros = {'Status': f_status}
+        contagem_status = banco.contar(snap.tabela, "Status", filtros)
+        segundo_plano.progresso(50)
+        percentual_por_projeto = banco.somar(snap.tabela, "Nome do Projeto", "% Concluído", filtros, funcao="mean")
+    else:
+        df_filtrado = filtrar_projetos(snap, f_status)
+        contagem_status = agregacao.contar(df_filtrado, "Status")
+        segundo_plano.progresso(50)
+        percentual_por_projeto = agregacao.somar(df_filtrado, "Nome do Projeto", "% Concluído", funcao="mean")
 
-    fig_percentual = px.bar(
-        df_filtrado,
-        x="Nome do Projeto",
-        y="% Concluído",
-        title="Percentual de Conclusão por Projeto",
-        color_discrete_sequence=COR_GRAFICO
+    return (
+        graficos.dados_barras(contagem_status, "Status", "Quantidade"),
+        graficos.dados_pizza(contagem_status, "Status", "Quantidade"),
+        graficos.dados_barras(percentual_por_projeto, "Nome do Projeto", "% Concluído"),
     )
-    fig_percentual.update_layout(xaxis_tickangle=-45)
-
-    for fig in [fig_status, fig_distribuicao, fig_percentual]:
-        fig.update_layout(
-            plot_bgcolor="rgba(0,0,0,0)",
-            paper_bgcolor="rgba(0,0,0,0)",
-            font_color=COR_TEXTO,
-            title_font_size=16,
-            title_x=0.5,
-            margin=dict(l=20, r=20, t=50, b=20),
-            font=dict(size=12)
-        )
-
-    return fig_status, fig_distribuicao, fig_percentual
@@ -0,0 +1,41 @@
+import pandas as pd
+
+# Máximo de categorias por gráfico de barras; o restante vira "Outros"
+LIMITE_CATEGORIAS = 30
+OUTROS = "Outros"
+
+
+# Para a média, `quantidades` traz quantos valores (não vazios) cada linha do
+# agregado resume: o "Outros" é a média das linhas que ele junta (soma sobre
+# quantidade), e não a média das médias, em que uma categoria com um projeto
+# pesaria tanto quanto uma com cinquenta
+def agrupar_outros(agregado, coluna, valor, limite, funcao, quantidades=None):
+    if limite is None or len(agregado) <= limite:
+        return agregado
+    principais = agregado.nlargest(limite - 1, valor, keep="first")
+    resto = agregado.drop(principais.index)
+    if funcao == "mean" and quantidades is not None:
+        n = pd.Series(quantidades, index=agregado.index)[resto.index]
+        # Médias vazias têm quantidade 0 e ficam fora da soma (skipna)
+        total = n.sum()
+        valor_outros = (resto[valor] * n).sum() / total if total else float("nan")
+    else:
+        valor_outros = getattr(resto[valor], funcao)()
+    outros = pd.DataFrame({coluna: [OUTROS], valor: [valor_outros]})
+    return pd.concat([principais, outros], ignore_index=True)
+
+
+# Quantidade de linhas por categoria: um ponto por categoria no gráfico
+def contar(dff, coluna, limite=LIMITE_CATEGORIAS, nome="Quantidade"):
+    contagem = dff[coluna].value_counts(sort=True)
+    # Em colunas categóricas o value_counts traz também as categorias sem linhas
+    agregado = contagem[contagem > 0].rename_axis(coluna).reset_index(name=nome)
+    return agrupar_outros(agregado, coluna, nome, limite, "sum")
+
+
+# Soma (ou média) de uma coluna numérica por categoria
+def somar(dff, coluna, valor, limite=LIMITE_CATEGORIAS, funcao="sum"):
+    grupos = dff.groupby(coluna, sort=False, observed=True)[valor]
+    agregado = grupos.agg(funcao).reset_index()
+    quantidades = grupos.count().to_numpy() if funcao == "mean" else None
+    return agrupar_outros(agregado, coluna, valor, limite, funcao, quantidades)
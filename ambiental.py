@@ -1,122 +1,399 @@
+import functools
+from datetime import date
+
 import pandas as pd
-import plotly.express as px
 from dash import html, dcc, dash_table
 import dash_bootstrap_components as dbc
+from dash.dependencies import Input, Output
+from app_instance import app
+import banco
+import cache_resultados
+import dados
+import esquema
+import exportar
+import graficos
+import metricas
+import prazos
+import segundo_plano
+import tabelas
+
+CORES_STATUS = {
+    prazos.EM_ANDAMENTO: "#FFA726",
+    prazos.PROXIMOS_PASSOS: "#29B6F6",
+    prazos.VENCIDO: "#EF5350",
+}
+
+
+# Tipos das colunas fixas; as colunas de cidade variam com a planilha e são
+# tipadas já no formato longo (Cidade/Prazo)
+ESQUEMA = {"Item": "inteiro", "Atividades": "categoria"}
+ESQUEMA_LONGO = {"Cidade": "categoria", "Prazo": "categoria"}
+
+
+# Preparar dados (executado a cada nova versão da planilha)
+def preparar(df, versao):
+    # Transformar para formato longo
+    df_long = pd.melt(
+        df,
+        id_vars=["Item", "Atividades"],
+        var_name="Cidade",
+        value_name="Prazo"
+    )
+
+    # Remover linhas com Prazo vazio
+    df_long = esquema.aplicar(df_long.dropna(subset=["Prazo"]), ESQUEMA_LONGO)
+
+    # Prazo em texto livre -> datas de início e fim (cada texto distinto é lido
+    # uma vez); o ano dado aos prazos sem ano fica no snapshot (ver longo)
+    ano = prazos.ano_corrente()
+    df_long["Início"], df_long["Fim"] = prazos.interpretar_coluna(df_long["Prazo"], ano)
+
+    if banco.ATIVO:
+        # Planilha original (tabela da página) e formato longo (gráfico) no
+        # banco analítico; o Status do dia é calculado na consulta
+        return {
+            "tabela": banco.ingerir("ambiental", versao, df, ["Item"]),
+            "tabela_longa": banco.ingerir("ambiental_longo", f"{versao}_{ano}", df_long, ["Cidade", "Item"]),
+            "ano_prazos": ano,
+        }
+    return {"df": df, "df_long": df_long, "ano_prazos": ano}
+
+
+# Formato longo (o DataFrame ou, com o banco, a Tabela) com os prazos sem ano
+# lidos no ano `ano`. O snapshot traz o do ano em que foi preparado; um
+# processo que atravessa o 1º de janeiro relê os prazos com o ano novo.
+@functools.lru_cache(maxsize=4)
+def _longo_do_ano(snap, ano):
+    if ano == snap.ano_prazos:
+        return snap.tabela_longa if banco.ATIVO else snap.df_long
+    df_long = banco.ler(snap.tabela_longa) if banco.ATIVO else snap.df_long.copy()
+    df_long["Início"], df_long["Fim"] = prazos.interpretar_coluna(df_long["Prazo"], ano)
+    if banco.ATIVO:
+        return banco.ingerir("ambiental_longo", f"{snap.versao}_{ano}", df_long, ["Cidade", "Item"])
+    return df_long
+
+
+def longo(snap, hoje):
+    return _longo_do_ano(snap, prazos.ano_corrente(hoje))
+
+
+# O Status depende do dia de hoje, então é recalculado uma vez por dia para
+# cada versão dos dados, junto com o cubo de contagens (Item, Cidade, Status)
+# usado pelos filtros
+@functools.lru_cache(maxsize=4)
+def _status_do_dia(snap, hoje, ano):
+    df_long = _longo_do_ano(snap, ano)
+    df_long = df_long.assign(Status=prazos.calcular_status(df_long["Início"], df_long["Fim"], hoje))
+
+    # Filtrar somente linhas com Status definido para evitar valores None no gráfico
+    df_status = df_long.dropna(subset=["Status"])
+
+    # Contagem de atividades por Item, Cidade e Status: filtrar vira só um recorte
+    cubo = df_status.groupby(["Item", "Cidade", "Status"], observed=True).size().rename("Quantidade")
+
+    return {"df_long": df_long, "df_status": df_status, "cubo": cubo}
+
+
+def status_do_dia(snap, hoje=None):
+    hoje = hoje or date.today()
+    return _status_do_dia(snap, hoje, prazos.ano_corrente(hoje))
+
+
+# Formato longo com o Status do dia `hoje` (mesma regra de
+# prazos.calcular_status), como subconsulta SQL para o banco analítico. A
+# coluna "_linha" guarda a ordem do formato longo em pandas.
+def status_sql(snap, hoje):
+    tabela = longo(snap, hoje)
+    hoje = banco.data_iso(hoje)
+    sql = (
+        'SELECT *, CASE'
+        ' WHEN "Início" IS NULL AND "Fim" IS NULL THEN NULL'
+        ' WHEN "Fim" < ? THEN ? WHEN "Início" > ? THEN ? ELSE ? END AS "Status", rowid AS "_linha"'
+        f' FROM {banco.coluna(tabela.nome)}'
+    )
+    return sql, [hoje, prazos.VENCIDO, hoje, prazos.PROXIMOS_PASSOS, prazos.EM_ANDAMENTO]
+
+
+# Condições SQL da janela de tempo (mesma regra de prazos.filtrar_janela)
+def janela_sql(inicio, fim):
+    partes, params = [], []
+    if inicio or fim:
+        partes.append('("Início" IS NOT NULL OR "Fim" IS NOT NULL)')
+    if inicio:
+        partes.append('("Fim" IS NULL OR "Fim" >= ?)')
+        params.append(banco.data_iso(inicio))
+    if fim:
+        partes.append('("Início" IS NULL OR "Início" <= ?)')
+        params.append(banco.data_iso(fim))
+    return partes, params
+
+
+# Barras horizontais agrupadas por Status (um trace por Status, na ordem em
+# que aparecem, como o px.bar(color="Status") fazia)
+def montar_figura(df_status_count):
+    traces = []
+    for status in pd.unique(df_status_count["Status"]):
+        parte = df_status_count[df_status_count["Status"] == status]
+        quantidades = parte["Quantidade"].tolist()
+        traces.append({
+            "type": "bar", "orientation": "h", "name": status, "legendgroup": status,
+            "offsetgroup": status, "alignmentgroup": "True", "showlegend": True,
+            "x": quantidades, "y": parte["Cidade"].astype(str).tolist(),
+            "text": quantidades, "textposition": "auto",
+            "marker": {"color": CORES_STATUS.get(status), "pattern": {"shape": ""}},
+            "hovertemplate": f"Status={status}<br>Quantidade=%{{text}}<br>Cidade=%{{y}}<extra></extra>",
+        })
+    return graficos.figura(
+        traces,
+        title={"text": "Quantidade de Atividades por Cidade e Status"},
+        barmode="group",
+        xaxis={"title": {"text": "Quantidade"}},
+        yaxis={"title": {"text": "Cidade"}},
+        legend={"title": {"text": "Status"}, "tracegroupgap": 0},
+    )
+
 
 # Carregar a planilha
-df = pd.read_excel("Cronograma_Ambiental_MCM-STX.xlsx", sheet_name="Sheet1")
-
-# Transformar para formato longo
-df_long = pd.melt(
-    df,
-    id_vars=["Item", "Atividades"],
-    var_name="Cidade",
-    value_name="Prazo"
-)
+dados.registrar_fonte("ambiental", "Cronograma_Ambiental_MCM-STX.xlsx", preparar, sheet_name="Sheet1", tipos=ESQUEMA)
 
-# Remover linhas com Prazo vazio
-df_long = df_long.dropna(subset=["Prazo"])
-
-# Função para definir Status baseado no Prazo
-def definir_status(prazo):
-    if isinstance(prazo, str):
-        prazo_lower = prazo.lower()
-        if "julho" in prazo_lower or "agosto" in prazo_lower:
-            return "Em andamento"
-        elif any(mes in prazo_lower for mes in ["setembro", "outubro", "novembro", "dezembro"]):
-            return "Próximos passos"
-    return None
-
-df_long["Status"] = df_long["Prazo"].apply(definir_status)
-
-# Filtrar somente linhas com Status definido para evitar valores None no gráfico
-df_status = df_long.dropna(subset=["Status"])
-
-# Agrupar por Cidade e Status, contando as atividades
-df_status_count = df_status.groupby(["Cidade", "Status"]).size().reset_index(name="Quantidade")
-
-# Gráfico de barras agrupadas
-fig1 = px.bar(
-    df_status_count,
-    y="Cidade",        # cidades no eixo vertical
-    x="Quantidade",    # quantidade no eixo horizontal
-    color="Status",
-    title="Quantidade de Atividades por Cidade e Status",
-    barmode="group",
-    text="Quantidade",
-    color_discrete_map={
-        "Em andamento": "#FFA726",
-        "Próximos passos": "#29B6F6"
-    },
-    orientation='h'    # importante para o gráfico horizontal
-)
 
-# Estilo do gráfico
-fig1.update_layout(
-    plot_bgcolor="rgba(0,0,0,0)",
-    paper_bgcolor="rgba(0,0,0,0)",
-    font_color="#C2E0E7",
-    title_font_size=16,
-    title_x=0.5,
-    margin=dict(l=20, r=20, t=50, b=20),
-    font=dict(size=12)
-)
+# Layout da página Ambiental (montado a cada acesso para refletir a versão atual dos dados)
+def layout():
+    snap = dados.snapshot("ambiental")
+    if banco.ATIVO:
+        colunas = snap.tabela.colunas
+        nome = banco.coluna(snap.tabela.nome)
+        # Primeira linha de cada Item, na ordem da planilha
+        itens = banco.quadro(
+            f'SELECT "Item", "Atividades" FROM {nome}'
+            f' WHERE rowid IN (SELECT MIN(rowid) FROM {nome} GROUP BY "Item") ORDER BY rowid',
+            [], ["Item", "Atividades"],
+        )
+        cidades = banco.distintos(snap.tabela_longa, "Cidade")
+        sql, params = status_sql(snap, date.today())
+        presentes = {s for (s,) in banco.consultar(f'SELECT DISTINCT "Status" FROM ({sql})', params)}
+    else:
+        df = snap.df
+        colunas = list(df.columns)
+        itens = df[["Item", "Atividades"]].drop_duplicates("Item")
+        cidades = sorted(snap.df_long["Cidade"].dropna().unique())
+        presentes = set(status_do_dia(snap)["df_status"]["Status"])
 
-# Tabela com dados originais
-tabela = dbc.Card(
-    dash_table.DataTable(
-        data=df.to_dict('records'),
-        columns=[{"name": col, "id": col} for col in df.columns],
-        page_size=10,
-        style_table={'overflowX': 'auto'},
-        style_cell={
-            'textAlign': 'left',
-            'backgroundColor': '#192A35',
-            'color': '#C2E0E7',
-            'whiteSpace': 'normal',
-            'height': 'auto',
-            'padding': '5px'
-        },
-        style_header={
-            'fontWeight': 'bold',
-            'backgroundColor': '#263640',
-            'color': '#C2E0E7'
+    # Tabela com dados originais (paginada no servidor)
+    tabela = dbc.Card(
+        dash_table.DataTable(
+            id="tabela-ambiental",
+            columns=[{"name": col, "id": col} for col in colunas],
+            **dict(tabelas.MODO_SERVIDOR, page_size=10),
+            style_table={'overflowX': 'auto'},
+            style_cell={
+                'textAlign': 'left',
+                'backgroundColor': '#192A35',
+                'color': '#C2E0E7',
+                'whiteSpace': 'normal',
+                'height': 'auto',
+                'padding': '5px'
+            },
+            style_header={
+                'fontWeight': 'bold',
+                'backgroundColor': '#263640',
+                'color': '#C2E0E7'
+            }
+        ),
+        style={
+            "backgroundColor": "#192A35",
+            "borderRadius": "15px",
+            "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
+            "padding": "10px",
+            "marginBottom": "20px"
         }
-    ),
-    style={
-        "backgroundColor": "#192A35",
-        "borderRadius": "15px",
-        "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
-        "padding": "10px",
-        "marginBottom": "20px"
-    }
+    )
+
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col(html.H2("B.I PPGC - AMBIENTAL", className="text-center fw-bold text-light mb-4"))
+        ]),
+
+        dbc.Row([
+            # Filtros laterais
+            dbc.Col([
+                html.Div([
+                    html.Label("Cidade", className="fw-bold text-light"),
+                    dcc.Dropdown(
+                        options=[{"label": c, "value": c} for c in cidades],
+                        id="filtro-cidade-ambiental", placeholder="Todas", multi=True, className="mb-3"
+                    ),
+                    html.Label("Status", className="fw-bold text-light"),
+                    dcc.Dropdown(
+                        options=[{"label": s, "value": s} for s in CORES_STATUS if s in presentes],
+                        id="filtro-status-ambiental", placeholder="Todos", multi=True, className="mb-3"
+                    ),
+                    html.Label("Item", className="fw-bold text-light"),
+                    dcc.Dropdown(
+                        options=[{"label": f"{i} - {a}", "value": i} for i, a in itens.itertuples(index=False)],
+                        id="filtro-item-ambiental", placeholder="Todos", multi=True, className="mb-3"
+                    ),
+                    html.Label("Período", className="fw-bold text-light"),
+                    dcc.DatePickerRange(
+                        id="filtro-periodo-ambiental", display_format="DD/MM/YYYY",
+                        start_date_placeholder_text="Início", end_date_placeholder_text="Fim",
+                        clearable=True
+                    ),
+                ], style={"backgroundColor": "#0E1A21", "padding": "20px", "borderRadius": "10px"})
+            ], width=2),
+
+            # Conteúdo principal: gráfico + tabela
+            dbc.Col([
+                *segundo_plano.barra("progresso-ambiental"),
+                exportar.links("ambiental"),
+
+                dbc.Card(
+                    dcc.Graph(id="grafico-ambiental"),
+                    style={
+                        "backgroundColor": "#192A35",
+                        "borderRadius": "15px",
+                        "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
+                        "padding": "10px",
+                        "marginBottom": "20px"
+                    }
+                ),
+
+                html.H4("Tabela de Dados", className="text-light fw-bold mb-3"),
+                tabela
+            ], width=10)
+        ])
+    ], fluid=True, style={"backgroundColor": "#121E26", "minHeight": "100vh", "padding": "20px"})
+
+
+# CALLBACKS
+# Em segundo plano quando BI_SEGUNDO_PLANO=1 (ver segundo_plano.py)
+@segundo_plano.callback(
+    "progresso-ambiental",
+    Output("grafico-ambiental", "figure"),
+    Input("filtro-cidade-ambiental", "value"),
+    Input("filtro-status-ambiental", "value"),
+    Input("filtro-item-ambiental", "value"),
+    Input("filtro-periodo-ambiental", "start_date"),
+    Input("filtro-periodo-ambiental", "end_date")
 )
+def atualizar_grafico(f_cidade, f_status, f_item, inicio, fim):
+    # O dia entra na chave do cache porque o Status depende dele
+    return figura(dados.snapshot("ambiental"), date.today().isoformat(), f_cidade, f_status, f_item, inicio, fim)
+
+
+@cache_resultados.memorizar("ambiental-figura")
+@metricas.fase("figuras")
+def figura(snap, hoje, f_cidade, f_status, f_item, inicio, fim):
+    if banco.ATIVO:
+        return montar_figura(_contagem_banco(snap, hoje, f_cidade, f_status, f_item, inicio, fim))
+
+    # O Status é o do dia da chave (`hoje`), não o de agora: perto da meia-noite
+    # os dois podem diferir e o resultado guardado tem de valer para a chave
+    visao = status_do_dia(snap, date.fromisoformat(hoje))
+    segundo_plano.progresso(50)
+
+    if inicio or fim:
+        # A janela de tempo depende das datas de cada linha, que não estão no cubo
+        df_status = prazos.filtrar_janela(visao["df_status"], inicio, fim)
+        cubo = df_status.groupby(["Item", "Cidade", "Status"], observed=True).size().rename("Quantidade")
+    else:
+        cubo = visao["cubo"]
 
-# Layout da página Ambiental
-layout = dbc.Container([
-    dbc.Row([
-        dbc.Col(html.H2("B.I PPGC - AMBIENTAL", className="text-center fw-bold text-light mb-4"))
-    ]),
-
-    dbc.Row([
-        dbc.Col(
-            dbc.Card(
-                dcc.Graph(figure=fig1),
-                style={
-                    "backgroundColor": "#192A35",
-                    "borderRadius": "15px",
-                    "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
-                    "padding": "10px",
-                    "marginBottom": "20px"
-                }
-            ), width=12
+    # Recorte do cubo pelos filtros e soma por Cidade e Status
+    mascara = None
+    for nivel, selecionados in (("Cidade", f_cidade), ("Status", f_status), ("Item", f_item)):
+        if selecionados:
+            cond = cubo.index.get_level_values(nivel).isin(selecionados)
+            mascara = cond if mascara is None else mascara & cond
+    if mascara is not None:
+        cubo = cubo[mascara]
+
+    df_status_count = cubo.groupby(level=["Cidade", "Status"], observed=True).sum().reset_index()
+    return montar_figura(df_status_count)
+
+
+# Contagem por Cidade e Status feita no banco: filtros, janela de tempo e
+# agrupamento numa única consulta
+def _contagem_banco(snap, hoje, f_cidade, f_status, f_item, inicio, fim):
+    sql, params = status_sql(snap, hoje)
+    partes, extras = janela_sql(inicio, fim)
+    clausula, extras = banco.onde(
+        {"Cidade": f_cidade, "Status": f_status, "Item": f_item}, ['"Status" IS NOT NULL'] + partes, extras
+    )
+    return banco.quadro(
+        f'SELECT "Cidade", "Status", COUNT(*) FROM ({sql}){clausula}'
+        ' GROUP BY "Cidade", "Status" ORDER BY "Cidade", "Status"',
+        params + extras, ["Cidade", "Status", "Quantidade"],
+    )
+
+
+# Links de exportação do formato longo com os filtros do gráfico
+exportar.atualizar_links("ambiental", {
+    "Cidade": Input("filtro-cidade-ambiental", "value"),
+    "Status": Input("filtro-status-ambiental", "value"),
+    "Item": Input("filtro-item-ambiental", "value"),
+    "inicio": Input("filtro-periodo-ambiental", "start_date"),
+    "fim": Input("filtro-periodo-ambiental", "end_date"),
+})
+
+
+# Formato longo (uma linha por Item e Cidade, com datas e o Status do dia)
+# com os filtros do gráfico, em blocos para a exportação. Inclui as linhas
+# sem Status quando o filtro de Status não é usado.
+def exportar_longo(args, tamanho):
+    snap = dados.snapshot("ambiental")
+    hoje = date.today()
+    filtros = {
+        "Cidade": exportar.valores(args, "Cidade"),
+        "Status": exportar.valores(args, "Status"),
+        "Item": exportar.valores(args, "Item", int),
+    }
+    inicio, fim = args.get("inicio"), args.get("fim")
+    if banco.ATIVO:
+        sql, params = status_sql(snap, hoje)
+        clausula, extras = banco.onde(filtros, *janela_sql(inicio, fim))
+        tipos = dict(snap.tabela_longa.tipos, Status="TEXT")
+        return banco.blocos(
+            f'SELECT {", ".join(map(banco.coluna, tipos))} FROM ({sql}){clausula} ORDER BY "_linha"',
+            params + extras, list(tipos), tipos, tamanho,
         )
-    ]),
 
-    dbc.Row([
-        dbc.Col([
-            html.H4("Tabela de Dados", className="text-light fw-bold mb-3"),
-            tabela
-        ])
-    ])
-], fluid=True, style={"backgroundColor": "#121E26", "minHeight": "100vh", "padding": "20px"})
+    df_long = status_do_dia(snap, hoje)["df_long"]
+    if inicio or fim:
+        df_long = prazos.filtrar_janela(df_long, inicio, fim)
+    for coluna, selecionados in filtros.items():
+        if selecionados:
+            df_long = df_long[df_long[coluna].isin(selecionados)]
+    return exportar.blocos(df_long, tamanho)
+
+
+exportar.registrar("ambiental", exportar_longo)
+
+
+@app.callback(
+    Output("tabela-ambiental", "data"),
+    Output("tabela-ambiental", "page_count"),
+    Output("tabela-ambiental", "page_current"),
+    Output("tabela-ambiental", "columns"),
+    Input("filtro-cidade-ambiental", "value"),
+    Input("filtro-item-ambiental", "value"),
+    Input("tabela-ambiental", "page_current"),
+    Input("tabela-ambiental", "page_size"),
+    Input("tabela-ambiental", "sort_by"),
+    Input("tabela-ambiental", "filter_query")
+)
+def paginar_tabela(f_cidade, f_item, page_current, page_size, sort_by, filter_query):
+    snap = dados.snapshot("ambiental")
+    # Item filtra as linhas e Cidade escolhe as colunas da planilha original
+    todas = snap.tabela.colunas if banco.ATIVO else snap.df.columns
+    colunas = [c for c in todas if c in ("Item", "Atividades") or not f_cidade or c in f_cidade]
+    if banco.ATIVO:
+        registros, page_count, page_current = banco.pagina(
+            snap.tabela, {"Item": f_item}, page_current, page_size, sort_by, filter_query, colunas
+        )
+    else:
+        df = snap.df
+        if f_item:
+            df = df[df["Item"].isin(f_item)]
+        registros, page_count, page_current = tabelas.pagina(df[colunas], page_current, page_size, sort_by, filter_query)
+    return registros, page_count, page_current, [{"name": col, "id": col} for col in colunas]
@@ -1,12 +1,27 @@
+import os
+
 from dash import dcc, html
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output, State
+from dash.dependencies import ClientsideFunction, Input, Output, State
 
 from app_instance import app
 from sidebar import sidebar
-import BI_projetos
-import BI_processos
-import ambiental
+import dados
+import estaticos
+import modo_cliente
+import paginas
+
+# Declara os callbacks das páginas; dados e layouts só no primeiro acesso
+paginas.registrar_callbacks()
+
+# Sob o gunicorn (wsgi.py) este módulo é importado no processo mestre, antes
+# do fork: as páginas são montadas lá e o monitoramento começa em cada worker
+# (gunicorn.conf.py), já que threads não passam para os processos filhos
+PREFORK = os.environ.get("BI_PREFORK") == "1"
+
+# Recarrega as planilhas em segundo plano quando forem alteradas
+if not PREFORK:
+    dados.iniciar_monitoramento()
 
 # Conteúdo principal da página
 content = html.Div(
@@ -36,23 +51,35 @@ app.layout = html.Div(
 )
 
 # Callback para recolher/expandir a sidebar
-@app.callback(
-    Output("sidebar", "style"),
-    Output("page-content", "style"),
-    Input("btn-toggle", "n_clicks"),
-    State("sidebar", "style"),
-    State("page-content", "style"),
-    prevent_initial_call=True
-)
-def toggle_sidebar(n_clicks, sidebar_style, content_style):
-    is_open = sidebar_style.get("left") == "0rem"
-    if is_open:
-        sidebar_style["left"] = "-16rem"
-        content_style["margin-left"] = "0rem"
-    else:
-        sidebar_style["left"] = "0rem"
-        content_style["margin-left"] = "18rem"
-    return sidebar_style, content_style
+if modo_cliente.ATIVO:
+    # No modo cliente só troca os estilos no navegador, sem ir ao servidor
+    app.clientside_callback(
+        ClientsideFunction(namespace="bi", function_name="toggle_sidebar"),
+        Output("sidebar", "style"),
+        Output("page-content", "style"),
+        Input("btn-toggle", "n_clicks"),
+        State("sidebar", "style"),
+        State("page-content", "style"),
+        prevent_initial_call=True
+    )
+else:
+    @app.callback(
+        Output("sidebar", "style"),
+        Output("page-content", "style"),
+        Input("btn-toggle", "n_clicks"),
+        State("sidebar", "style"),
+        State("page-content", "style"),
+        prevent_initial_call=True
+    )
+    def toggle_sidebar(n_clicks, sidebar_style, content_style):
+        is_open = sidebar_style.get("left") == "0rem"
+        if is_open:
+            sidebar_style["left"] = "-16rem"
+            content_style["margin-left"] = "0rem"
+        else:
+            sidebar_style["left"] = "0rem"
+            content_style["margin-left"] = "18rem"
+        return sidebar_style, content_style
 
 # Callback de navegação entre páginas
 @app.callback(
@@ -60,17 +87,14 @@ def toggle_sidebar(n_clicks, sidebar_style, content_style):
     Input("url", "pathname")
 )
 def render_page_content(pathname):
-    if pathname == "/projetos":
-        return BI_projetos.layout
-    elif pathname == "/processos":
-        return BI_processos.layout
-    elif pathname == "/ambiental":
-        return ambiental.layout  # usa o layout definido em ambiental.py
+    pagina = paginas.layout(pathname)  # monta a página no primeiro acesso
+    if pagina is not None:
+        return pagina
     else:
         # Página inicial com imagem de fundo full screen
         return html.Div(
             html.Img(
-                src="/assets/home.png",
+                src=estaticos.ativo("home.png"),
                 style={
                     "position": "absolute",
                     "top": "0",
@@ -91,6 +115,10 @@ def render_page_content(pathname):
             }
         )
 
+# Monta as páginas em segundo plano para o primeiro acesso não esperar
+if not PREFORK:
+    paginas.preaquecer()
+
 # Rodar o servidor acessível por IP
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8050, debug=True)
@@ -1,8 +1,17 @@
 import dash
 import dash_bootstrap_components as dbc
+import estaticos
+import metricas
 
 app = dash.Dash(
     __name__,
     external_stylesheets=[dbc.themes.BOOTSTRAP],
     suppress_callback_exceptions=True
 )
+
+# Compressão das respostas e cache dos assets; instalado antes das métricas,
+# que assim contam os bytes das respostas antes da compressão
+estaticos.instalar(app)
+
+# Mede todos os callbacks registrados a partir daqui e publica /metrics
+metricas.instrumentar(app)
@@ -0,0 +1,244 @@
+// Callbacks do modo cliente (BI_MODO_CLIENTE=1): filtros, agregações e
+// gráficos a partir do retrato compacto gerado por modo_cliente.compactar.
+(function () {
+    var CORES_PIZZA = ["#FFA726", "#FB8C00", "#F57C00", "#EF6C00", "#E65100"];
+
+    function valor(store, coluna, i) {
+        var c = store.colunas[coluna];
+        if (c.codigos) {
+            var codigo = c.codigos[i];
+            return codigo < 0 ? null : c.dicionario[codigo];
+        }
+        return c.valores[i];
+    }
+
+    // Índices das linhas que passam nos filtros {coluna: [valores]}
+    function filtrar(store, filtros) {
+        var testes = [];
+        Object.keys(filtros).forEach(function (coluna) {
+            var selecionados = filtros[coluna];
+            if (!selecionados || !selecionados.length) {
+                return;
+            }
+            var c = store.colunas[coluna];
+            var permitidos = new Set();
+            selecionados.forEach(function (v) {
+                var codigo = c.dicionario.indexOf(String(v));
+                if (codigo >= 0) {
+                    permitidos.add(codigo);
+                }
+            });
+            testes.push(function (i) { return permitidos.has(c.codigos[i]); });
+        });
+        var linhas = [];
+        for (var i = 0; i < store.linhas; i++) {
+            if (testes.every(function (t) { return t(i); })) {
+                linhas.push(i);
+            }
+        }
+        return linhas;
+    }
+
+    function registros(store, linhas) {
+        var colunas = Object.keys(store.colunas);
+        return linhas.map(function (i) {
+            var r = {};
+            colunas.forEach(function (c) { r[c] = valor(store, c, i); });
+            return r;
+        });
+    }
+
+    // Mesmo critério de agregacao.py: acima do limite, o restante vira "Outros".
+    // Na média cada par é [chave, média, quantidade de valores] e o "Outros" é
+    // a média das linhas que ele junta, não a média das médias
+    function agruparOutros(store, pares, funcao) {
+        if (pares.length <= store.limite) {
+            return pares;
+        }
+        // Valores vazios (média sem nenhum número) vão para o fim, como no
+        // nlargest, e ficam fora da soma e da média do "Outros", como no pandas
+        var vazio = function (v) { return v === null || Number.isNaN(v); };
+        var ordenados = pares.slice().sort(function (a, b) {
+            if (vazio(a[1]) || vazio(b[1])) {
+                return vazio(a[1]) - vazio(b[1]);
+            }
+            return b[1] - a[1];
+        });
+        var principais = ordenados.slice(0, store.limite - 1);
+        var resto = ordenados.slice(store.limite - 1).filter(function (p) { return !vazio(p[1]); });
+        if (funcao === "mean") {
+            var soma = 0;
+            var quantidade = 0;
+            resto.forEach(function (p) {
+                soma += p[1] * p[2];
+                quantidade += p[2];
+            });
+            principais.push([store.outros, quantidade ? soma / quantidade : null]);
+        } else {
+            principais.push([store.outros, resto.reduce(function (a, p) { return a + p[1]; }, 0)]);
+        }
+        return principais;
+    }
+
+    function contar(store, coluna, linhas) {
+        var contagem = new Map();
+        linhas.forEach(function (i) {
+            var v = valor(store, coluna, i);
+            if (v !== null) {
+                contagem.set(v, (contagem.get(v) || 0) + 1);
+            }
+        });
+        var pares = Array.from(contagem.entries());
+        pares.sort(function (a, b) { return b[1] - a[1]; });
+        return agruparOutros(store, pares, "sum");
+    }
+
+    function somar(store, coluna, colunaValor, linhas, funcao) {
+        var somas = new Map();
+        var quantidades = new Map();
+        linhas.forEach(function (i) {
+            var chave = valor(store, coluna, i);
+            var v = valor(store, colunaValor, i);
+            if (chave === null) {
+                return;
+            }
+            if (!somas.has(chave)) {
+                somas.set(chave, 0);
+                quantidades.set(chave, 0);
+            }
+            if (v !== null) {
+                somas.set(chave, somas.get(chave) + v);
+                quantidades.set(chave, quantidades.get(chave) + 1);
+            }
+        });
+        var pares = Array.from(somas.entries()).map(function (p) {
+            if (funcao === "mean") {
+                var n = quantidades.get(p[0]);
+                return [p[0], n ? p[1] / n : null, n];
+            }
+            return p;
+        });
+        return agruparOutros(store, pares, funcao);
+    }
+
+    function layout(store, titulo, extra) {
+        var tema = JSON.parse(JSON.stringify(store.tema));
+        tema.title.text = titulo;
+        return Object.assign(tema, extra || {});
+    }
+
+    function barras(store, pares, titulo, texto, extra) {
+        var trace = {
+            type: "bar",
+            x: pares.map(function (p) { return p[0]; }),
+            y: pares.map(function (p) { return p[1]; }),
+            marker: {color: pares.map(function (p, i) { return store.cores[i % store.cores.length]; })},
+            showlegend: false
+        };
+        if (texto) {
+            trace.text = trace.y;
+        }
+        return {data: [trace], layout: layout(store, titulo, extra)};
+    }
+
+    function pizza(store, pares, titulo) {
+        return {
+            data: [{
+                type: "pie",
+                labels: pares.map(function (p) { return p[0]; }),
+                values: pares.map(function (p) { return p[1]; }),
+                hole: 0.5,
+                marker: {colors: CORES_PIZZA}
+            }],
+            layout: layout(store, titulo)
+        };
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        bi: {
+            processos: function (store, fSetor, fResp, fStatus) {
+                if (!store) {
+                    return window.dash_clientside.no_update;
+                }
+                var linhas = filtrar(store, {
+                    "Setores mapeados": fSetor,
+                    "Responsável": fResp,
+                    "Status": fStatus
+                });
+                return [
+                    registros(store, linhas),
+                    barras(store, somar(store, "Setores mapeados", "Atividades mapeadas", linhas, "sum"),
+                           "Atividades Mapeadas por Setor", true),
+                    barras(store, contar(store, "Etapa / Entrega", linhas), "Entregas Concluídas"),
+                    pizza(store, contar(store, "Status", linhas), "Composição Status")
+                ];
+            },
+
+            projetos_tabela: function (store, fStatus) {
+                if (!store) {
+                    return window.dash_clientside.no_update;
+                }
+                return registros(store, filtrar(store, {"Status": fStatus}));
+            },
+
+            projetos_graficos: function (store, fStatus) {
+                if (!store) {
+                    return window.dash_clientside.no_update;
+                }
+                var linhas = filtrar(store, {"Status": fStatus});
+                if (!linhas.length) {
+                    var vazio = {data: [], layout: layout(store, "")};
+                    return [vazio, vazio, vazio];
+                }
+                var contagem = contar(store, "Status", linhas);
+                return [
+                    barras(store, contagem, "Composição de Status dos Projetos"),
+                    pizza(store, contagem, "Distribuição de Projetos por Status"),
+                    barras(store, somar(store, "Nome do Projeto", "% Concluído", linhas, "mean"),
+                           "Percentual de Conclusão por Projeto", false, {xaxis: {tickangle: -45}})
+                ];
+            },
+
+            // Links de exportação com os filtros da página, no mesmo formato
+            // de exportar.href: um parâmetro por valor selecionado, mais a
+            // ordenação ("ordem") e o filtro ("filtro") do DataTable
+            exportar: function (pagina, formatos, nomes, comTabela, valores) {
+                var parametros = new URLSearchParams();
+                nomes.forEach(function (nome, i) {
+                    var v = valores[i];
+                    if (v === null || v === undefined) {
+                        return;
+                    }
+                    (Array.isArray(v) ? v : [v]).forEach(function (x) {
+                        parametros.append(nome, x);
+                    });
+                });
+                if (comTabela) {
+                    (valores[nomes.length] || []).forEach(function (s) {
+                        parametros.append("ordem", s.column_id + ":" + s.direction);
+                    });
+                    if (valores[nomes.length + 1]) {
+                        parametros.append("filtro", valores[nomes.length + 1]);
+                    }
+                }
+                var consulta = parametros.toString();
+                return formatos.map(function (formato) {
+                    return "/exportar/" + pagina + "." + formato + (consulta ? "?" + consulta : "");
+                });
+            },
+
+            toggle_sidebar: function (nClicks, sidebarStyle, contentStyle) {
+                var sidebar = Object.assign({}, sidebarStyle);
+                var content = Object.assign({}, contentStyle);
+                if (sidebar.left === "0rem") {
+                    sidebar.left = "-16rem";
+                    content["margin-left"] = "0rem";
+                } else {
+                    sidebar.left = "0rem";
+                    content["margin-left"] = "18rem";
+                }
+                return [sidebar, content];
+            }
+        }
+    });
+})();
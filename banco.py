@@ -0,0 +1,333 @@
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+import agregacao
+import dados
+import metricas
+import modo_cliente
+import tabelas
+
+# Banco analítico embutido (SQLite): com BI_BACKEND=sqlite cada versão das
+# planilhas é gravada numa tabela indexada pelas colunas de filtro, e filtros,
+# agregações, ordenação e paginação viram SQL. Só a página da tabela e os
+# agregados dos gráficos chegam ao Python; o snapshot não guarda o DataFrame.
+# O modo cliente manda os dados inteiros ao navegador e continua em pandas.
+BACKEND = os.environ.get("BI_BACKEND", "pandas")
+ATIVO = BACKEND == "sqlite" and not modo_cliente.ATIVO
+
+# Arquivo do banco; por padrão junto do cache colunar (BI_CACHE_DIR)
+CAMINHO = os.environ.get("BI_BANCO") or os.path.join(dados.CACHE_DIR, "bi.sqlite")
+
+# Versões mantidas por tabela: a atual e a anterior, que callbacks ainda em
+# andamento com o snapshot antigo podem estar consultando
+VERSOES_MANTIDAS = 2
+
+# Mesmo formato que o Dash usa ao serializar datas para o navegador
+FORMATO_DATA = "%Y-%m-%dT%H:%M:%S"
+
+# Linhas por lote na gravação
+_LOTE = 50_000
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def _minusculas(valor):
+    return None if valor is None else str(valor).lower()
+
+
+def _conexao():
+    # Uma conexão por thread; depois de um fork (gunicorn) o worker abre a sua
+    conexao = getattr(_local, "conexao", None)
+    if conexao is None or _local.pid != os.getpid():
+        os.makedirs(os.path.dirname(CAMINHO) or ".", exist_ok=True)
+        conexao = sqlite3.connect(CAMINHO, timeout=300, isolation_level=None, check_same_thread=False)
+        # WAL: leituras não esperam a gravação de uma versão nova
+        conexao.execute("PRAGMA journal_mode=WAL")
+        # lower() do SQLite só conhece ASCII; o filtro "icontains" do DataTable
+        # precisa de acentos, como o str.lower do pandas
+        conexao.create_function("minusculas", 1, _minusculas, deterministic=True)
+        _local.conexao, _local.pid = conexao, os.getpid()
+    return conexao
+
+
+def coluna(nome):
+    return '"' + str(nome).replace('"', '""') + '"'
+
+
+class Tabela:
+    # Uma versão de um DataFrame gravada no banco. Nunca muda depois de
+    # gravada: uma nova versão da planilha vai para outra tabela. `tipos` é
+    # {coluna: INTEGER, REAL, TEXT ou DATA}; DATA é gravada como texto ISO.
+    def __init__(self, nome, tipos):
+        self.nome = nome
+        self.tipos = tipos
+        self.colunas = list(tipos)
+        self.numericas = {c for c, tipo in tipos.items() if tipo in ("INTEGER", "REAL")}
+
+
+def _tipo(serie):
+    if pd.api.types.is_integer_dtype(serie) or pd.api.types.is_bool_dtype(serie):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(serie):
+        return "REAL"
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return "DATA"
+    return "TEXT"
+
+
+def _valores(serie):
+    # Valores prontos para o sqlite3: datas em texto ISO, números e textos
+    # como objetos Python e vazios como None
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        serie = serie.dt.strftime(FORMATO_DATA)
+    serie = serie.astype(object)
+    return serie.where(serie.notna(), None).tolist()
+
+
+def _gravar(conexao, nome, df, indices):
+    colunas = ", ".join(f"{coluna(c)} {_tipo(df[c]).replace('DATA', 'TEXT')}" for c in df.columns)
+    conexao.execute(f"CREATE TABLE {coluna(nome)} ({colunas})")
+    marcadores = ", ".join("?" * len(df.columns))
+    for inicio in range(0, len(df), _LOTE):
+        lote = df.iloc[inicio:inicio + _LOTE]
+        conexao.executemany(
+            f"INSERT INTO {coluna(nome)} VALUES ({marcadores})",
+            zip(*(_valores(lote[c]) for c in df.columns)),
+        )
+    for c in indices:
+        conexao.execute(f"CREATE INDEX {coluna(f'{nome}:{c}')} ON {coluna(nome)} ({coluna(c)})")
+
+
+# Grava `df` como a versão `versao` da tabela `base`, com um índice por
+# coluna de `indices`, e devolve a Tabela. Se a versão já estiver no banco
+# (outro worker ou uma execução anterior), só a reaproveita.
+def ingerir(base, versao, df, indices=()):
+    nome = f"{base}_{versao}"
+    tabela = Tabela(nome, {str(c): _tipo(df[c]) for c in df.columns})
+    conexao = _conexao()
+    # BEGIN IMMEDIATE: só um processo grava; os demais esperam e reaproveitam
+    conexao.execute("BEGIN IMMEDIATE")
+    try:
+        conexao.execute(
+            "CREATE TABLE IF NOT EXISTS _versoes (base TEXT, tabela TEXT PRIMARY KEY, criada REAL)"
+        )
+        existe = conexao.execute("SELECT 1 FROM _versoes WHERE tabela = ?", (nome,)).fetchone()
+        if existe is None:
+            inicio = time.perf_counter()
+            _gravar(conexao, nome, df, indices)
+            conexao.execute("INSERT INTO _versoes VALUES (?, ?, ?)", (base, nome, time.time()))
+            logger.info("Tabela %s gravada no banco em %.1f s", nome, time.perf_counter() - inicio)
+        antigas = conexao.execute(
+            "SELECT tabela FROM _versoes WHERE base = ? ORDER BY criada DESC LIMIT -1 OFFSET ?",
+            (base, VERSOES_MANTIDAS),
+        ).fetchall()
+        for (antiga,) in antigas:
+            conexao.execute(f"DROP TABLE IF EXISTS {coluna(antiga)}")
+            conexao.execute("DELETE FROM _versoes WHERE tabela = ?", (antiga,))
+        conexao.execute("COMMIT")
+    except BaseException:
+        conexao.execute("ROLLBACK")
+        raise
+    return tabela
+
+
+def consultar(sql, params=()):
+    return _conexao().execute(sql, params).fetchall()
+
+
+def quadro(sql, params, colunas):
+    return pd.DataFrame(consultar(sql, params), columns=colunas)
+
+
+def data_iso(valor):
+    return pd.Timestamp(valor).strftime(FORMATO_DATA)
+
+
+# Cláusula WHERE dos filtros ({coluna: valores}, mesma regra do
+# indice.posicoes: união dentro da coluna, interseção entre colunas) somada às
+# condições já prontas em `partes`
+def onde(filtros, partes=(), params=()):
+    partes, params = list(partes), list(params)
+    for nome, selecionados in filtros.items():
+        if not selecionados:
+            continue
+        valores = list(dict.fromkeys(selecionados))
+        partes.append(f"{coluna(nome)} IN ({', '.join('?' * len(valores))})")
+        params += valores
+    return (" WHERE " + " AND ".join(partes) if partes else ""), params
+
+
+# filter_query do DataTable em SQL, com a mesma semântica de tabelas._comparar
+def _filtro_sql(tabela, filter_query, colunas):
+    partes, params = [], []
+    for nome, op, valor, sensivel in tabelas.interpretar_filtro(filter_query):
+        if nome not in colunas:
+            continue
+        texto = f"CAST({coluna(nome)} AS TEXT)"
+        if op == "contains":
+            if sensivel:
+                partes.append(f"instr({texto}, ?) > 0")
+            else:
+                partes.append(f"instr(minusculas({texto}), ?) > 0")
+                valor = valor.lower()
+            params.append(valor)
+        elif op == "datestartswith":
+            partes.append(f"substr({texto}, 1, ?) = ?")
+            params += [len(valor), valor]
+        elif nome in tabela.numericas:
+            try:
+                params.append(float(valor))
+            except ValueError:
+                partes.append("0")
+                continue
+            partes.append(f"{coluna(nome)} {op} ?")
+        elif sensivel:
+            partes.append(f"{texto} {op} ?")
+            params.append(valor)
+        else:
+            partes.append(f"minusculas({texto}) {op} ?")
+            params.append(valor.lower())
+    return partes, params
+
+
+# Equivalente a tabelas.pagina: filtro e ordenação do DataTable, contagem e
+# LIMIT/OFFSET no banco. Vazios ficam por último nos dois sentidos e empates
+# mantêm a ordem da planilha, como no sort_values estável do pandas.
+@metricas.fase("tabela")
+def pagina(tabela, filtros, page_current, page_size, sort_by, filter_query, colunas=None):
+    colunas = colunas or tabela.colunas
+    page_size = page_size or tabelas.TAMANHO_PAGINA
+    clausula, params = onde(filtros, *_filtro_sql(tabela, filter_query, colunas))
+
+    (total,), = consultar(f"SELECT COUNT(*) FROM {coluna(tabela.nome)}{clausula}", params)
+    metricas.contar_linhas(total)
+    page_count = max(1, math.ceil(total / page_size))
+    page_current = min(page_current or 0, page_count - 1)
+
+    linhas = consultar(
+        f"SELECT {', '.join(map(coluna, colunas))} FROM {coluna(tabela.nome)}{clausula}"
+        f"{_ordem(sort_by, colunas)} LIMIT ? OFFSET ?",
+        params + [page_size, page_current * page_size],
+    )
+    return [dict(zip(colunas, linha)) for linha in linhas], page_count, page_current
+
+
+def _ordem(sort_by, colunas):
+    ordem = [
+        f"{coluna(s['column_id'])} IS NULL, {coluna(s['column_id'])} {'ASC' if s['direction'] == 'asc' else 'DESC'}"
+        for s in (sort_by or []) if s["column_id"] in colunas
+    ]
+    return f" ORDER BY {', '.join(ordem + ['rowid'])}"
+
+
+# Linhas de `sql` em DataFrames de até `tamanho` linhas, lidas do cursor aos
+# poucos. Os tipos de `tipos` (ver Tabela) são aplicados a cada bloco para
+# que todos tenham as mesmas colunas e dtypes; sempre sai ao menos um bloco.
+def blocos(sql, params, colunas, tipos, tamanho):
+    cursor = _conexao().cursor()
+    try:
+        cursor.execute(sql, params)
+        primeiro = True
+        while True:
+            linhas = cursor.fetchmany(tamanho)
+            if not linhas and not primeiro:
+                return
+            yield _quadro_tipado(linhas, colunas, tipos)
+            if not linhas:
+                return
+            primeiro = False
+    finally:
+        cursor.close()
+
+
+def _quadro_tipado(linhas, colunas, tipos):
+    df = pd.DataFrame.from_records(linhas, columns=colunas)
+    for c in colunas:
+        tipo = tipos.get(c, "TEXT")
+        if tipo == "INTEGER":
+            df[c] = df[c].astype("Int64")
+        elif tipo == "REAL":
+            df[c] = df[c].astype("float64")
+        elif tipo == "DATA":
+            df[c] = pd.to_datetime(df[c], format=FORMATO_DATA)
+        else:
+            df[c] = df[c].astype("str")
+    return df
+
+
+# Tabela inteira como DataFrame, com os tipos da versão gravada
+def ler(tabela, colunas=None):
+    colunas = colunas or tabela.colunas
+    sql = f"SELECT {', '.join(map(coluna, colunas))} FROM {coluna(tabela.nome)} ORDER BY rowid"
+    return pd.concat(blocos(sql, [], colunas, tabela.tipos, _LOTE), ignore_index=True)
+
+
+# Resultado completo do filtro da tabela (como em pagina, sem paginação) em blocos
+def exportar(tabela, filtros, sort_by, filter_query, tamanho, colunas=None):
+    colunas = colunas or tabela.colunas
+    clausula, params = onde(filtros, *_filtro_sql(tabela, filter_query, colunas))
+    sql = (
+        f"SELECT {', '.join(map(coluna, colunas))} FROM {coluna(tabela.nome)}{clausula}"
+        f"{_ordem(sort_by, colunas)}"
+    )
+    return blocos(sql, params, colunas, tabela.tipos, tamanho)
+
+
+# Equivalente a agregacao.contar: empates em ordem alfabética, como nas
+# colunas categóricas
+def contar(tabela, nome, filtros, limite=agregacao.LIMITE_CATEGORIAS, rotulo="Quantidade"):
+    clausula, params = onde(filtros, [f"{coluna(nome)} IS NOT NULL"])
+    agregado = quadro(
+        f"SELECT {coluna(nome)}, COUNT(*) FROM {coluna(tabela.nome)}{clausula}"
+        f" GROUP BY {coluna(nome)} ORDER BY COUNT(*) DESC, {coluna(nome)}",
+        params, [nome, rotulo],
+    )
+    return agregacao.agrupar_outros(agregado, nome, rotulo, limite, "sum")
+
+
+_FUNCOES = {"sum": "COALESCE(SUM({}), 0)", "mean": "AVG({})"}
+
+
+# Equivalente a agregacao.somar: categorias na ordem em que aparecem na planilha
+def somar(tabela, nome, valor, filtros, limite=agregacao.LIMITE_CATEGORIAS, funcao="sum"):
+    clausula, params = onde(filtros, [f"{coluna(nome)} IS NOT NULL"])
+    # COUNT(valor): valores não vazios de cada categoria, peso dela na média do "Outros"
+    agregado = quadro(
+        f"SELECT {coluna(nome)}, {_FUNCOES[funcao].format(coluna(valor))}, COUNT({coluna(valor)})"
+        f" FROM {coluna(tabela.nome)}{clausula} GROUP BY {coluna(nome)} ORDER BY MIN(rowid)",
+        params, [nome, valor, "_quantidade"],
+    )
+    quantidades = agregado.pop("_quantidade").to_numpy()
+    return agregacao.agrupar_outros(agregado, nome, valor, limite, funcao, quantidades)
+
+
+# Valores distintos (sem vazios) em ordem, para as opções dos filtros
+def distintos(tabela, nome):
+    linhas = consultar(
+        f"SELECT DISTINCT {coluna(nome)} FROM {coluna(tabela.nome)}"
+        f" WHERE {coluna(nome)} IS NOT NULL ORDER BY {coluna(nome)}"
+    )
+    return [valor for (valor,) in linhas]
+
+
+@metricas.registrar_coletor
+def _metricas():
+    if not ATIVO:
+        return []
+    try:
+        tamanho = os.path.getsize(CAMINHO)
+    except OSError:
+        return []
+    return [
+        "# HELP bi_banco_bytes Tamanho do arquivo do banco analítico.",
+        "# TYPE bi_banco_bytes gauge",
+        f"bi_banco_bytes {tamanho}",
+    ]
@@ -0,0 +1,87 @@
+# Comparação do tempo de partida: leitura direta do Excel x cache colunar.
+# Cada medição roda em um processo novo, como um worker subindo do zero.
+#
+#   python benchmarks/carga.py [repeticoes]
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PLANILHAS = [
+    ("processos.xlsx", 0),
+    ("Projetos.xlsx", 0),
+    ("Cronograma_Ambiental_MCM-STX.xlsx", "Sheet1"),
+]
+
+LEITURA_EXCEL = """
+import time, pandas as pd
+t = time.perf_counter()
+for caminho, aba in {planilhas!r}:
+    pd.read_excel(caminho, sheet_name=aba)
+print(time.perf_counter() - t)
+"""
+
+LEITURA_CACHE = """
+import time, pandas as pd
+from dados import carregar_planilha
+t = time.perf_counter()
+for caminho, aba in {planilhas!r}:
+    carregar_planilha(caminho, sheet_name=aba)
+print(time.perf_counter() - t)
+"""
+
+IMPORT_APP = """
+import time
+t = time.perf_counter()
+import app
+print(time.perf_counter() - t)
+"""
+
+
+def _medir(codigo, cache_dir):
+    env = dict(os.environ, BI_CACHE_DIR=cache_dir)
+    saida = subprocess.run(
+        [sys.executable, "-c", codigo], cwd=RAIZ, env=env,
+        capture_output=True, text=True, check=True
+    )
+    return float(saida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    cache_dir = tempfile.mkdtemp(prefix="bi_cache_")
+    try:
+        cenarios = {
+            "planilhas: read_excel": [],
+            "planilhas: cache frio (converte)": [],
+            "planilhas: cache quente (mmap)": [],
+            "import app: cache frio": [],
+            "import app: cache quente": [],
+        }
+        for _ in range(repeticoes):
+            cenarios["planilhas: read_excel"].append(
+                _medir(LEITURA_EXCEL.format(planilhas=PLANILHAS), cache_dir))
+
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            cenarios["planilhas: cache frio (converte)"].append(
+                _medir(LEITURA_CACHE.format(planilhas=PLANILHAS), cache_dir))
+            cenarios["planilhas: cache quente (mmap)"].append(
+                _medir(LEITURA_CACHE.format(planilhas=PLANILHAS), cache_dir))
+
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            cenarios["import app: cache frio"].append(_medir(IMPORT_APP, cache_dir))
+            cenarios["import app: cache quente"].append(_medir(IMPORT_APP, cache_dir))
+
+        print(f"{'cenário':<36}{'mediana (ms)':>14}{'mínimo (ms)':>14}")
+        for nome, tempos in cenarios.items():
+            tempos.sort()
+            print(f"{nome:<36}{tempos[len(tempos) // 2] * 1000:>14.1f}{tempos[0] * 1000:>14.1f}")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# Latência de uma troca de filtro na página Projetos: fluxo antigo (tabela
+# completa vai ao navegador e volta como Input dos gráficos) x fluxo atual
+# (tabela paginada e gráficos em paralelo, ambos a partir do filtro).
+#
+#   python benchmarks/latencia_projetos.py [linhas] [repeticoes]
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from plotly.io.json import to_json_plotly
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(sys.path[0])
+
+import dados  # noqa: E402
+import esquema  # noqa: E402
+import BI_projetos  # noqa: E402
+
+STATUS = ["Concluído", "Em Andamento", "Atrasado", "Não iniciado"]
+
+
+def projetos_sinteticos(linhas):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "ID": np.arange(1, linhas + 1),
+        "Nome do Projeto": [f"Projeto- Sintético {i}" for i in range(linhas)],
+        "Início": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365, linhas), unit="D"),
+        "Status": rng.choice(STATUS, linhas),
+        "% Concluído": rng.integers(0, 101, linhas).astype(str),
+    })
+
+
+# Fluxo antigo, como estava antes da paginação no servidor
+def antigo_filtrar_tabela(df, f_status):
+    dff = df.copy()
+    if f_status:
+        dff = dff[dff['Status'].isin(f_status)]
+    return dff.to_dict('records')
+
+
+def antigo_atualizar_graficos(dados_tabela):
+    df_filtrado = pd.DataFrame(dados_tabela)
+    contagem_status = df_filtrado["Status"].value_counts().reset_index()
+    contagem_status.columns = ["Status", "Quantidade"]
+    fig_status = px.bar(
+        contagem_status, x="Status", y="Quantidade",
+        labels={"Status": "Status", "Quantidade": "Quantidade"},
+        title="Composição de Status dos Projetos",
+        color_discrete_sequence=["#FB8C00", "#FB8C00", "#F57C00", "#EF6C00", "#E65100"]
+    )
+    fig_distribuicao = px.pie(
+        df_filtrado, names="Status", hole=0.5,
+        title="Distribuição de Projetos por Status",
+        color_discrete_sequence=["#FFA726", "#FB8C00", "#F57C00", "#EF6C00", "#E65100"]
+    )
+    fig_percentual = px.bar(
+        df_filtrado, x="Nome do Projeto", y="% Concluído",
+        title="Percentual de Conclusão por Projeto",
+        color_discrete_sequence=BI_projetos.COR_GRAFICO
+    )
+    fig_percentual.update_layout(xaxis_tickangle=-45)
+    for fig in [fig_status, fig_distribuicao, fig_percentual]:
+        fig.update_layout(
+            plot_bgcolor="rgba(0,0,0,0)",
+            paper_bgcolor="rgba(0,0,0,0)",
+            font_color=BI_projetos.COR_TEXTO,
+            title_font_size=16,
+            title_x=0.5,
+            margin=dict(l=20, r=20, t=50, b=20),
+            font=dict(size=12)
+        )
+    return fig_status, fig_distribuicao, fig_percentual
+
+
+def medir_antigo(df, f_status):
+    t = time.perf_counter()
+    resposta_tabela = to_json_plotly(antigo_filtrar_tabela(df, f_status))
+    t_tabela = time.perf_counter() - t
+    # O navegador devolve a tabela inteira como Input do segundo callback
+    corpo = resposta_tabela
+    t = time.perf_counter()
+    resposta_graficos = to_json_plotly(antigo_atualizar_graficos(json.loads(corpo)))
+    t_graficos = time.perf_counter() - t
+    # Requisições em sequência: a segunda só sai depois da primeira voltar
+    return t_tabela + t_graficos, len(resposta_tabela) + len(corpo) + len(resposta_graficos)
+
+
+def medir_atual(snap, f_status):
+    pagina_tabela = BI_projetos.pagina_tabela.__wrapped__
+    figuras = BI_projetos.figuras.__wrapped__
+    t = time.perf_counter()
+    resposta_tabela = to_json_plotly(pagina_tabela(snap, f_status, 0, None, [], ""))
+    t_tabela = time.perf_counter() - t
+    t = time.perf_counter()
+    resposta_graficos = to_json_plotly(figuras(snap, f_status))
+    t_graficos = time.perf_counter() - t
+    # Requisições em paralelo: a interação termina com a mais lenta
+    return max(t_tabela, t_graficos), len(resposta_tabela) + len(resposta_graficos)
+
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    df = projetos_sinteticos(linhas)
+    snap = dados.Snapshot("projetos", "bench", **BI_projetos.preparar(esquema.aplicar(df, BI_projetos.ESQUEMA), "bench"))
+    filtros = [None, ["Concluído"], ["Em Andamento", "Atrasado"]]
+
+    resultados = {"antes": [], "depois": []}
+    for _ in range(repeticoes):
+        for f_status in filtros:
+            resultados["antes"].append(medir_antigo(snap.df, f_status))
+            resultados["depois"].append(medir_atual(snap, f_status))
+
+    print(f"{linhas} projetos, {repeticoes * len(filtros)} trocas de filtro")
+    print(f"{'fluxo':<8}{'mediana (ms)':>14}{'bytes/interação':>18}")
+    for nome, medidas in resultados.items():
+        tempos = sorted(m[0] for m in medidas)
+        tamanho = sum(m[1] for m in medidas) / len(medidas)
+        print(f"{nome:<8}{tempos[len(tempos) // 2] * 1000:>14.1f}{tamanho:>18,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# Planilhas sintéticas com as mesmas abas e colunas que as páginas esperam
+# (processos.xlsx, Projetos.xlsx e o cronograma ambiental), em qualquer
+# tamanho. Mesma semente e mesmo tamanho geram sempre os mesmos arquivos.
+#
+#   python benchmarks/sinteticos.py <pasta> <linhas> [semente]
+import json
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+from openpyxl import Workbook
+
+PROCESSOS = "processos.xlsx"
+PROJETOS = "Projetos.xlsx"
+AMBIENTAL = "Cronograma_Ambiental_MCM-STX.xlsx"
+
+RESPONSAVEIS = [
+    "João Tiago", "Ana Paula", "Carlos Eduardo", "Fernanda Lima", "Marcos Vinícius",
+    "Juliana Souza", "Rafael Costa", "Patrícia Alves", "Bruno Martins", "Camila Rocha",
+]
+STATUS_PROCESSOS = ["Concluído", "Em Andamento", "Não iniciado"]
+STATUS_PROJETOS = ["Concluído", "Em Andamento", "Atrasado", "Não iniciado"]
+ETAPAS = [
+    "Criação de IT's", "Processo publicado", "Mapeamento", "Validação com o setor",
+    "Treinamento", "Revisão de manuais",
+]
+AREAS = [
+    "Vendas", "Administrativo de Vendas", "Pós Vendas", "Garantia", "Peças", "Oficina",
+    "Financeiro", "Contabilidade", "Compras", "RH", "T.I.", "Marketing", "Logística",
+]
+CIDADES = ["Gurupi", "Araguaína", "Imperatriz", "São Luís", "Posto Roma", "Teresina", "Balsas"]
+ATIVIDADES = [
+    "Visita in loco", "Relatório", "Renovação de Licença Ambiental", "Renovação de Outorga Água",
+    "Análise de efluentes", "PGRS", "Treinamento ambiental", "Auditoria interna",
+]
+# Formatos de prazo encontrados no cronograma real (e células vazias)
+PRAZOS = [
+    "Julho", "Agosto", "Julho/Agosto", "Setembro a Dezembro", "1ª quinzena de Outubro",
+    "2ª quinzena de Novembro", "15/08", "Janeiro/2026", "Março a Junho de 2026", "Concluído", None,
+]
+
+# Setores ativos cresce com o tamanho, mas fica em algumas centenas de valores
+# (como no real: muitas linhas por setor)
+LIMITE_SETORES = 300
+
+
+def setores(linhas):
+    quantidade = max(len(AREAS), min(LIMITE_SETORES, linhas // 50))
+    return [f"Processo de {AREAS[i % len(AREAS)]} {i // len(AREAS) + 1}" for i in range(quantidade)]
+
+
+def _gravar(caminho, abas):
+    # write_only grava linha a linha, sem manter a planilha inteira em memória
+    wb = Workbook(write_only=True)
+    for nome, colunas, linhas in abas:
+        ws = wb.create_sheet(nome)
+        ws.append(colunas)
+        for linha in linhas:
+            ws.append(linha)
+    wb.save(caminho)
+
+
+def _processos(rng, linhas):
+    nomes = setores(linhas)
+    setor = rng.integers(0, len(nomes), linhas)
+    numeros = rng.integers(0, 20, (linhas, 6))
+    responsavel = rng.integers(0, len(RESPONSAVEIS), linhas)
+    concluido = rng.integers(0, 101, linhas)
+    status = rng.integers(0, len(STATUS_PROCESSOS), linhas)
+    etapa = rng.integers(0, len(ETAPAS), linhas)
+    colunas = [
+        "ID", "Setores mapeados", "Atividades mapeadas", "Instruçoes feitas",
+        "Instruçoes reestruturadas", "Manuais", "Qtd colaboradores entrevistados",
+        "Qtd treinamentos executados", "Responsável", "% Concluído", "Status", "Etapa / Entrega",
+    ]
+    return colunas, (
+        [
+            float(f"{i // 10 + 1}.{i % 10}"), nomes[setor[i]], *numeros[i].tolist(),
+            RESPONSAVEIS[responsavel[i]], int(concluido[i]), STATUS_PROCESSOS[status[i]], ETAPAS[etapa[i]],
+        ]
+        for i in range(linhas)
+    )
+
+
+def _projetos(rng, linhas):
+    inicio = rng.integers(0, 730, linhas)
+    status = rng.integers(0, len(STATUS_PROJETOS), linhas)
+    concluido = rng.integers(0, 101, linhas)
+    # Como na planilha real, parte dos percentuais vem como texto ("100%")
+    texto = rng.random(linhas) < 0.1
+    colunas = ["ID", "Nome do Projeto", "Início", "Status", "% Concluído"]
+    base = datetime(2024, 1, 1).toordinal()
+    return colunas, (
+        [
+            i + 1, f"Projeto- {AREAS[i % len(AREAS)]} {i + 1}",
+            datetime.fromordinal(base + int(inicio[i])), STATUS_PROJETOS[status[i]],
+            f"{concluido[i]}%" if texto[i] else int(concluido[i]),
+        ]
+        for i in range(linhas)
+    )
+
+
+def _ambiental(rng, linhas):
+    atividade = rng.integers(0, len(ATIVIDADES), linhas)
+    prazos = rng.integers(0, len(PRAZOS), (linhas, len(CIDADES)))
+    colunas = ["Item", "Atividades", *CIDADES]
+    return colunas, (
+        [i + 1, ATIVIDADES[atividade[i]], *(PRAZOS[p] for p in prazos[i])]
+        for i in range(linhas)
+    )
+
+
+# Gera as três planilhas em `pasta` (reaproveita se já existirem com os
+# mesmos parâmetros) e devolve a pasta
+def gerar(pasta, linhas, semente=0):
+    os.makedirs(pasta, exist_ok=True)
+    caminho_meta = os.path.join(pasta, "sinteticos.json")
+    meta = {"linhas": linhas, "semente": semente}
+    arquivos = [os.path.join(pasta, nome) for nome in (PROCESSOS, PROJETOS, AMBIENTAL)]
+    try:
+        with open(caminho_meta) as f:
+            if json.load(f) == meta and all(os.path.exists(a) for a in arquivos):
+                return pasta
+    except (OSError, ValueError):
+        pass
+
+    rng = np.random.default_rng(semente)
+    _gravar(arquivos[0], [("Planilha1", *_processos(rng, linhas))])
+    # Projetos.xlsx real tem uma segunda aba; a página lê só a primeira
+    _gravar(arquivos[1], [("Projetos", *_projetos(rng, linhas)), ("Processos", ["ID"], [])])
+    _gravar(arquivos[2], [("Sheet1", *_ambiental(rng, linhas))])
+    with open(caminho_meta, "w") as f:
+        json.dump(meta, f)
+    return pasta
+
+
+if __name__ == "__main__":
+    gerar(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]) if len(sys.argv) > 3 else 0)
@@ -0,0 +1,297 @@
+# Suíte de benchmarks com planilhas sintéticas (benchmarks/sinteticos.py).
+# Para cada tamanho mede partida, carga das planilhas, os callbacks das
+# páginas (tempo e bytes da resposta) e o pico de memória. Cada cenário roda
+# num processo novo e o resultado vai para um JSON, para comparar commits.
+#
+#   python benchmarks/suite.py [--linhas 1000 100000 1000000] [--repeticoes 5] [--saida arquivo.json]
+#   python benchmarks/suite.py --comparar antes.json depois.json [--tolerancia 0.1]
+#
+# O cache de resultados (cache_resultados) fica desligado: toda repetição
+# recalcula figuras e tabelas.
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks import sinteticos  # noqa: E402
+
+TAMANHOS = [1000, 100000, 1000000]
+CENARIOS = ["partida", "carga_fria", "carga_quente", "processos", "projetos", "ambiental"]
+FONTES = ["processos", "projetos", "ambiental"]
+
+
+# ---------------------------------------------------------------- cenários
+# Rodam no processo filho, com a pasta das planilhas sintéticas como cwd
+
+def _cliente():
+    from app_instance import app
+    cliente = app.server.test_client()
+    return cliente, cliente.get("/_dash-dependencies").get_json()
+
+
+def _corpo(dep, valores):
+    saidas = dep["output"].strip(".").split("...")
+    outputs = [dict(zip(("id", "property"), s.rsplit(".", 1))) for s in saidas]
+    corpo = {
+        "output": dep["output"],
+        "outputs": outputs if dep["output"].startswith("..") else outputs[0],
+        "inputs": [],
+        "state": [],
+        "changedPropIds": [],
+    }
+    for tipo in ("inputs", "state"):
+        for item in dep[tipo]:
+            chave = f"{item['id']}.{item['property']}"
+            corpo[tipo].append(dict(item, value=valores.get(chave)))
+            if tipo == "inputs":
+                corpo["changedPropIds"].append(chave)
+    return corpo
+
+
+# Chama o callback cuja saída inclui `saida`; devolve (segundos, bytes)
+def _chamar(cliente, deps, saida, valores):
+    dep = next(d for d in deps if saida in d["output"] and not d.get("clientside_function"))
+    corpo = _corpo(dep, valores)
+    inicio = time.perf_counter()
+    resposta = cliente.post("/_dash-update-component", json=corpo)
+    segundos = time.perf_counter() - inicio
+    if resposta.status_code not in (200, 204):
+        raise RuntimeError(f"{saida}: HTTP {resposta.status_code}\n{resposta.get_data(as_text=True)[:2000]}")
+    return segundos, len(resposta.get_data())
+
+
+def _repetir(medicoes, nome, repeticoes, funcao, variacoes):
+    for _ in range(repeticoes):
+        for variacao in variacoes:
+            segundos, tamanho = funcao(variacao)
+            medicoes.setdefault(nome, []).append((segundos, tamanho))
+
+
+def cenario_partida(repeticoes, linhas):
+    inicio = time.perf_counter()
+    import app  # noqa: F401
+    return {"import_app": [(time.perf_counter() - inicio, 0)]}
+
+
+def _carga():
+    import app  # noqa: F401
+    import dados
+    medicoes = {}
+    for fonte in FONTES:
+        inicio = time.perf_counter()
+        dados.snapshot(fonte)
+        medicoes[fonte] = [(time.perf_counter() - inicio, 0)]
+    return medicoes
+
+
+def cenario_carga_fria(repeticoes, linhas):
+    return _carga()
+
+
+def cenario_carga_quente(repeticoes, linhas):
+    return _carga()
+
+
+def cenario_processos(repeticoes, linhas):
+    import app  # noqa: F401
+    import dados
+    dados.snapshot("processos")
+    cliente, deps = _cliente()
+    setores = sinteticos.setores(linhas)
+    base = {"tabela-processos.page_current": 0, "tabela-processos.page_size": 20}
+    variacoes = [
+        {},
+        {"filtro-status-processos.value": ["Concluído"]},
+        {"filtro-setor-processos.value": setores[:3], "filtro-responsavel-processos.value": sinteticos.RESPONSAVEIS[:2]},
+        {"tabela-processos.page_current": 3,
+         "tabela-processos.sort_by": [{"column_id": "% Concluído", "direction": "desc"}]},
+    ]
+    medicoes = {}
+    _repetir(medicoes, "atualizar_tudo", repeticoes,
+             lambda v: _chamar(cliente, deps, "tabela-processos.data", dict(base, **v)), variacoes)
+    return medicoes
+
+
+def cenario_projetos(repeticoes, linhas):
+    import app  # noqa: F401
+    import dados
+    dados.snapshot("projetos")
+    cliente, deps = _cliente()
+    base = {"tabela-projetos.page_current": 0, "tabela-projetos.page_size": 20}
+    variacoes = [{}, {"filtro-status.value": ["Concluído"]}, {"filtro-status.value": ["Em Andamento", "Atrasado"]}]
+    medicoes = {}
+    _repetir(medicoes, "filtrar_tabela", repeticoes,
+             lambda v: _chamar(cliente, deps, "tabela-projetos.data", dict(base, **v)), variacoes)
+    _repetir(medicoes, "atualizar_graficos", repeticoes,
+             lambda v: _chamar(cliente, deps, "grafico-status.figure", v), variacoes)
+    return medicoes
+
+
+def cenario_ambiental(repeticoes, linhas):
+    import app  # noqa: F401
+    import paginas
+    cliente, deps = _cliente()
+    # Primeira montagem: snapshot (melt + prazos) e layout
+    inicio = time.perf_counter()
+    paginas.layout("/ambiental")
+    medicoes = {"montagem": [(time.perf_counter() - inicio, 0)]}
+    _repetir(medicoes, "layout", repeticoes,
+             lambda v: _chamar(cliente, deps, "page-content.children", {"url.pathname": "/ambiental"}), [None])
+    variacoes = [
+        {},
+        {"filtro-cidade-ambiental.value": sinteticos.CIDADES[:2]},
+        {"filtro-periodo-ambiental.start_date": f"{datetime.now().year}-07-01",
+         "filtro-periodo-ambiental.end_date": f"{datetime.now().year}-12-31"},
+    ]
+    _repetir(medicoes, "atualizar_grafico", repeticoes,
+             lambda v: _chamar(cliente, deps, "grafico-ambiental.figure", v), variacoes)
+    base = {"tabela-ambiental.page_current": 0, "tabela-ambiental.page_size": 10}
+    _repetir(medicoes, "paginar_tabela", repeticoes,
+             lambda v: _chamar(cliente, deps, "tabela-ambiental.data", dict(base, **v)), variacoes[:2])
+    return medicoes
+
+
+def _executar_cenario(nome, repeticoes, linhas):
+    medicoes = globals()[f"cenario_{nome}"](repeticoes, linhas)
+    # ru_maxrss vem em KiB no Linux e em bytes no macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    pico *= 1 if sys.platform == "darwin" else 1024
+    print(json.dumps({"medicoes": medicoes, "pico_memoria_bytes": pico}))
+
+
+# ------------------------------------------------------------- orquestração
+
+def _ambiente(pasta):
+    return dict(
+        os.environ,
+        BI_CACHE_DIR=os.path.join(pasta, "cache"),
+        BI_CACHE_RESULTADOS="memoria",
+        BI_CACHE_RESULTADOS_MB="0",
+        BI_PREAQUECER="0",
+        BI_MODO_CLIENTE="0",
+        BI_PROFILE="0",
+    )
+
+
+def _rodar(nome, pasta, repeticoes, linhas):
+    if nome == "carga_fria":
+        shutil.rmtree(os.path.join(pasta, "cache"), ignore_errors=True)
+    saida = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--cenario", nome,
+         "--repeticoes", str(repeticoes), "--linhas", str(linhas)],
+        cwd=pasta, env=_ambiente(pasta), capture_output=True, text=True,
+    )
+    if saida.returncode != 0:
+        raise RuntimeError(f"cenário {nome} ({linhas} linhas) falhou:\n{saida.stderr[-4000:]}")
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def _resumo(linhas, cenario, nome, amostras, pico):
+    tempos = sorted(a[0] for a in amostras)
+    tamanhos = sorted(a[1] for a in amostras)
+    return {
+        "linhas": linhas,
+        "cenario": cenario,
+        "medicao": nome,
+        "n": len(tempos),
+        "mediana_ms": round(tempos[len(tempos) // 2] * 1000, 3),
+        "p95_ms": round(tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))] * 1000, 3),
+        "min_ms": round(tempos[0] * 1000, 3),
+        "bytes": tamanhos[len(tamanhos) // 2],
+        "pico_memoria_bytes": pico,
+    }
+
+
+def _commit():
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=RAIZ, capture_output=True, text=True).stdout.strip()
+    commit = git("rev-parse", "--short", "HEAD") or "desconhecido"
+    return commit + ("-alterado" if git("status", "--porcelain", "--untracked-files=no") else "")
+
+
+def medir(tamanhos, repeticoes, pasta_base, semente):
+    resultados = []
+    for linhas in tamanhos:
+        pasta = sinteticos.gerar(os.path.join(pasta_base, f"{linhas}-{semente}"), linhas, semente)
+        for cenario in CENARIOS:
+            saida = _rodar(cenario, pasta, repeticoes, linhas)
+            for nome, amostras in saida["medicoes"].items():
+                resumo = _resumo(linhas, cenario, nome, amostras, saida["pico_memoria_bytes"])
+                resultados.append(resumo)
+                print(f"{linhas:>9} {cenario + '.' + nome:<34}{resumo['mediana_ms']:>12.1f} ms"
+                      f"{resumo['bytes']:>12,} B{resumo['pico_memoria_bytes'] / 2**20:>10.0f} MiB",
+                      file=sys.stderr)
+    return {
+        "commit": _commit(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "repeticoes": repeticoes,
+        "semente": semente,
+        "resultados": resultados,
+    }
+
+
+# Compara dois JSONs da suíte; devolve True se alguma mediana piorou além
+# da tolerância
+def comparar(antes, depois, tolerancia):
+    chave = lambda r: (r["linhas"], r["cenario"], r["medicao"])  # noqa: E731
+    anteriores = {chave(r): r for r in antes["resultados"]}
+    piorou = False
+    print(f"{antes['commit']} -> {depois['commit']}")
+    print(f"{'linhas':>9} {'medição':<34}{'antes (ms)':>12}{'depois (ms)':>13}{'razão':>8}{'memória':>9}")
+    for r in depois["resultados"]:
+        a = anteriores.get(chave(r))
+        if a is None:
+            continue
+        razao = r["mediana_ms"] / a["mediana_ms"] if a["mediana_ms"] else float("inf")
+        memoria = r["pico_memoria_bytes"] / a["pico_memoria_bytes"] if a["pico_memoria_bytes"] else float("inf")
+        marca = ""
+        if razao > 1 + tolerancia:
+            marca, piorou = "  <- mais lento", True
+        print(f"{r['linhas']:>9} {r['cenario'] + '.' + r['medicao']:<34}{a['mediana_ms']:>12.1f}"
+              f"{r['mediana_ms']:>13.1f}{razao:>8.2f}{memoria:>9.2f}{marca}")
+    return piorou
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--linhas", type=int, nargs="+", default=TAMANHOS)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--pasta", default=os.path.join(tempfile.gettempdir(), "bi_sinteticos"),
+                        help="onde guardar as planilhas geradas (reaproveitadas entre execuções)")
+    parser.add_argument("--saida", help="arquivo JSON (padrão: benchmarks/resultados/<commit>.json)")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DEPOIS"))
+    parser.add_argument("--tolerancia", type=float, default=0.1)
+    parser.add_argument("--cenario", choices=CENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cenario:
+        _executar_cenario(args.cenario, args.repeticoes, args.linhas[0])
+        return
+
+    if args.comparar:
+        with open(args.comparar[0]) as f_antes, open(args.comparar[1]) as f_depois:
+            sys.exit(1 if comparar(json.load(f_antes), json.load(f_depois), args.tolerancia) else 0)
+
+    resultado = medir(args.linhas, args.repeticoes, args.pasta, args.semente)
+    saida = args.saida or os.path.join(RAIZ, "benchmarks", "resultados", f"{resultado['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(saida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,482 @@
+# Teste de carga com usuários simultâneos: sobe o app (app.py no servidor
+# de desenvolvimento, ou o wsgi.py sob o gunicorn) e cada usuário virtual
+# repete uma sessão como a do navegador: abre o app, troca de página
+# (render_page_content e os callbacks iniciais da página), muda filtros de
+# seleção múltipla em Processos e Projetos e recolhe/expande a sidebar.
+# Os usuários são corrotinas asyncio, cada um com as próprias conexões
+# HTTP/1.1 keep-alive. Para cada nível de concorrência o relatório traz, por
+# callback, p50/p95/p99 da latência, vazão e taxa de erro. O cliente roda num
+# único núcleo: com centenas de usuários sem pausa, confira que não é ele o
+# gargalo (uso de CPU deste processo).
+#
+#   python benchmarks/usuarios.py [--usuarios 1 10 50] [--duracao 30] [--pausa 1.0]
+#                                 [--gunicorn --workers 4] [--linhas 100000] [--url http://host:8050]
+#                                 [--saida resultado.json]
+#
+# O servidor sobe com BI_MODO_CLIENTE=0 e BI_SEGUNDO_PLANO=0: no modo cliente
+# os filtros nem chegam ao servidor e os callbacks em segundo plano
+# respondem com consultas de progresso, que este teste não acompanha.
+import argparse
+import asyncio
+import gzip
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import defaultdict
+from datetime import datetime
+from urllib.parse import urlsplit
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks import sinteticos  # noqa: E402
+
+ROTAS = ["/", "/processos", "/projetos", "/ambiental", "/ia", "/planejamento"]
+# Páginas em que os usuários mexem nos filtros
+PAGINAS_FILTROS = ["/processos", "/projetos"]
+# Chance de cada ação numa página com filtros (o resto é filtrar) e fora dela
+# (o resto é trocar de página)
+NAVEGAR, SIDEBAR = 0.2, 0.1
+SIDEBAR_FORA = 0.2
+# Ações em média antes de o usuário fechar o app e abrir uma sessão nova
+ACOES_POR_SESSAO = 20
+# Máximo de valores escolhidos de uma vez num filtro de seleção múltipla
+MAXIMO_SELECIONADOS = 3
+QUANTIS = (0.5, 0.95, 0.99)
+
+
+# ------------------------------------------------------------ cliente HTTP
+
+class _ConexaoFechada(Exception):
+    # O servidor fechou a conexão keep-alive antes de responder
+    pass
+
+
+async def _ler_resposta(leitor, metodo):
+    linha = await leitor.readline()
+    if not linha:
+        raise _ConexaoFechada()
+    versao, status = linha.decode("latin-1").split(" ", 2)[:2]
+    status = int(status)
+    cabecalhos = {}
+    while True:
+        linha = await leitor.readline()
+        if linha in (b"\r\n", b"\n", b""):
+            break
+        nome, _, valor = linha.decode("latin-1").partition(":")
+        cabecalhos[nome.strip().lower()] = valor.strip()
+
+    if metodo == "HEAD" or status in (204, 304) or status < 200:
+        corpo = b""
+    elif cabecalhos.get("transfer-encoding", "").lower() == "chunked":
+        partes = []
+        while True:
+            tamanho = int((await leitor.readline()).split(b";")[0], 16)
+            if tamanho == 0:
+                while await leitor.readline() not in (b"\r\n", b"\n", b""):
+                    pass
+                break
+            partes.append(await leitor.readexactly(tamanho))
+            await leitor.readexactly(2)
+        corpo = b"".join(partes)
+    elif "content-length" in cabecalhos:
+        corpo = await leitor.readexactly(int(cabecalhos["content-length"]))
+    else:
+        corpo = await leitor.read()
+        cabecalhos["connection"] = "close"
+    manter = versao == "HTTP/1.1" and cabecalhos.get("connection", "").lower() != "close"
+    return status, cabecalhos, corpo, manter
+
+
+class Cliente:
+    # Conexões de um usuário virtual. Como o navegador, abre mais de uma
+    # quando dispara callbacks em paralelo e reaproveita as que ficam livres.
+    def __init__(self, host, porta, timeout):
+        self.host = host
+        self.porta = porta
+        self.timeout = timeout
+        self._livres = []
+
+    async def pedir(self, metodo, caminho, corpo=None):
+        dados = json.dumps(corpo).encode() if corpo is not None else b""
+        cabecalhos = [
+            f"{metodo} {caminho} HTTP/1.1",
+            f"Host: {self.host}:{self.porta}",
+            "Accept-Encoding: gzip",
+            "Connection: keep-alive",
+            f"Content-Length: {len(dados)}",
+        ]
+        if corpo is not None:
+            cabecalhos.append("Content-Type: application/json")
+        pedido = ("\r\n".join(cabecalhos) + "\r\n\r\n").encode() + dados
+
+        while True:
+            reaproveitada = bool(self._livres)
+            leitor, escritor = self._livres.pop() if reaproveitada else await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.porta), self.timeout)
+            try:
+                escritor.write(pedido)
+                await escritor.drain()
+                status, cabecalhos_resposta, resposta, manter = await asyncio.wait_for(
+                    _ler_resposta(leitor, metodo), self.timeout)
+            except (_ConexaoFechada, ConnectionResetError, BrokenPipeError):
+                escritor.close()
+                if reaproveitada:
+                    # Keep-alive vencido no servidor: tenta de novo numa conexão nova
+                    continue
+                raise
+            except BaseException:
+                escritor.close()
+                raise
+            break
+
+        if manter:
+            self._livres.append((leitor, escritor))
+        else:
+            escritor.close()
+        tamanho = len(resposta)
+        if cabecalhos_resposta.get("content-encoding") == "gzip":
+            resposta = gzip.decompress(resposta)
+        return status, resposta, tamanho
+
+    def fechar(self):
+        for _, escritor in self._livres:
+            escritor.close()
+        self._livres.clear()
+
+
+# ------------------------------------------------------------ estatísticas
+
+class Estatisticas:
+    # Amostras (segundos, bytes, erro) por callback, só dentro da janela de
+    # medição (depois do aquecimento e antes do fim)
+    def __init__(self, inicio, fim):
+        self.inicio = inicio
+        self.fim = fim
+        self.amostras = defaultdict(list)
+
+    def registrar(self, rotulo, comeco, segundos, tamanho, erro):
+        if comeco >= self.inicio and comeco + segundos <= self.fim:
+            self.amostras[rotulo].append((segundos, tamanho, erro))
+
+
+def _quantil(ordenados, q):
+    if not ordenados:
+        return float("nan")
+    return ordenados[max(0, math.ceil(q * len(ordenados)) - 1)]
+
+
+def resumir(estatisticas, duracao):
+    linhas = []
+    for rotulo, amostras in sorted(estatisticas.amostras.items()):
+        tempos = sorted(a[0] for a in amostras if not a[2])
+        erros = sum(1 for a in amostras if a[2])
+        linha = {
+            "callback": rotulo,
+            "requisicoes": len(amostras),
+            "erros": erros,
+            "taxa_erro": erros / len(amostras),
+            "vazao_rps": len(amostras) / duracao,
+            "bytes_medio": sum(a[1] for a in amostras) / len(amostras),
+        }
+        for q in QUANTIS:
+            linha[f"p{round(q * 100)}_ms"] = round(_quantil(tempos, q) * 1000, 2)
+        linhas.append(linha)
+    return linhas
+
+
+# ------------------------------------------------------------ sessão
+
+def _rotulo(dep):
+    # Primeira saída do callback ("tabela-processos.data"), que o identifica
+    saida = dep["output"].strip(".").split("...")[0]
+    return saida.split("@")[0]
+
+
+def _saidas(dep):
+    saidas = dep["output"].strip(".").split("...")
+    itens = [dict(zip(("id", "property"), s.rsplit(".", 1))) for s in saidas]
+    return itens if dep["output"].startswith("..") else itens[0]
+
+
+class Usuario:
+    def __init__(self, cliente, deps, estatisticas, rng, pausa, rotas, paginas_filtros):
+        self.cliente = cliente
+        self.deps = deps
+        self.estatisticas = estatisticas
+        self.rng = rng
+        self.pausa = pausa
+        self.rotas = rotas
+        self.paginas_filtros = paginas_filtros
+        self.valores = {}   # "id.propriedade" -> valor atual no navegador
+        self.filtros = {}   # id do filtro da página -> (valores possíveis, seleção múltipla)
+        self.fixos = set()  # ids do layout principal (url, sidebar)
+        self.ids_pagina = set()
+        self.pagina = None
+
+    async def _pedir(self, rotulo, metodo, caminho, corpo=None):
+        comeco = time.perf_counter()
+        try:
+            status, resposta, tamanho = await self.cliente.pedir(metodo, caminho, corpo)
+            erro = status >= 400
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            status, resposta, tamanho, erro = None, b"", 0, True
+        self.estatisticas.registrar(rotulo, comeco, time.perf_counter() - comeco, tamanho, erro)
+        return status, resposta
+
+    # Guarda as propriedades dos componentes de uma árvore de layout, seus ids
+    # em `ids` e os filtros (Dropdown/Checklist com opções) que aparecem nela
+    def _ler_layout(self, no, ids):
+        if isinstance(no, list):
+            for item in no:
+                self._ler_layout(item, ids)
+            return
+        if not isinstance(no, dict) or "props" not in no:
+            return
+        props = no["props"]
+        ident = props.get("id")
+        if isinstance(ident, str):
+            ids.add(ident)
+            for prop, valor in props.items():
+                if prop != "children":
+                    self.valores[f"{ident}.{prop}"] = valor
+            if ident.startswith("filtro-") and props.get("options"):
+                opcoes = [o["value"] if isinstance(o, dict) else o for o in props["options"]]
+                multiplo = bool(props.get("multi")) or isinstance(props.get("value"), list)
+                self.filtros[ident] = (opcoes, multiplo)
+        self._ler_layout(props.get("children"), ids)
+
+    async def _disparar(self, dep, mudou=()):
+        corpo = {
+            "output": dep["output"],
+            "outputs": _saidas(dep),
+            "inputs": [dict(i, value=self.valores.get(f"{i['id']}.{i['property']}")) for i in dep["inputs"]],
+            "state": [dict(s, value=self.valores.get(f"{s['id']}.{s['property']}")) for s in dep["state"]],
+            "changedPropIds": list(mudou),
+        }
+        status, resposta = await self._pedir(_rotulo(dep), "POST", "/_dash-update-component", corpo)
+        if status != 200:
+            return None
+        resultado = json.loads(resposta).get("response", {})
+        for ident, props in resultado.items():
+            for prop, valor in props.items():
+                # Patch só muda parte do valor no navegador; filhos não são Input
+                if prop != "children" and not (isinstance(valor, dict) and "__dash_patch_update" in valor):
+                    self.valores[f"{ident}.{prop}"] = valor
+        return resultado
+
+    def _com_entrada(self, chave):
+        return [d for d in self.deps if chave in (f"{i['id']}.{i['property']}" for i in d["inputs"])]
+
+    async def abrir(self):
+        await self._pedir("GET /", "GET", "/")
+        status, resposta = await self._pedir("GET /_dash-layout", "GET", "/_dash-layout")
+        if status == 200:
+            self._ler_layout(json.loads(resposta), self.fixos)
+        await self._pedir("GET /_dash-dependencies", "GET", "/_dash-dependencies")
+        await self.navegar(self.rng.choice(self.rotas))
+
+    # Troca de página e, como o navegador, dispara em paralelo os callbacks
+    # da página nova cujas entradas estão todas no layout
+    async def navegar(self, rota):
+        self.valores["url.pathname"] = rota
+        self.pagina = rota
+        self.filtros = {}
+        self.ids_pagina = set()
+        for dep in self._com_entrada("url.pathname"):
+            resultado = await self._disparar(dep, ["url.pathname"])
+            if resultado and "page-content" in resultado:
+                self._ler_layout(resultado["page-content"].get("children"), self.ids_pagina)
+        presentes = self.fixos | self.ids_pagina
+        iniciais = [
+            d for d in self.deps
+            if not d.get("prevent_initial_call")
+            and any(i["id"] in self.ids_pagina for i in d["inputs"])
+            and all(i["id"] in presentes for i in d["inputs"])
+        ]
+        await asyncio.gather(*(self._disparar(d) for d in iniciais))
+
+    async def filtrar(self):
+        ident = self.rng.choice(sorted(self.filtros))
+        opcoes, multiplo = self.filtros[ident]
+        if multiplo:
+            valor = self.rng.sample(opcoes, self.rng.randint(0, min(MAXIMO_SELECIONADOS, len(opcoes))))
+        else:
+            valor = self.rng.choice(opcoes + [None])
+        chave = f"{ident}.value"
+        self.valores[chave] = valor
+        await asyncio.gather(*(self._disparar(d, [chave]) for d in self._com_entrada(chave)))
+
+    async def alternar_sidebar(self):
+        self.valores["btn-toggle.n_clicks"] = (self.valores.get("btn-toggle.n_clicks") or 0) + 1
+        for dep in self._com_entrada("btn-toggle.n_clicks"):
+            await self._disparar(dep, ["btn-toggle.n_clicks"])
+
+    # Sessões até o fim da janela de medição
+    async def rodar(self):
+        await self.abrir()
+        while time.perf_counter() < self.estatisticas.fim:
+            if self.rng.random() < 1 / ACOES_POR_SESSAO:
+                self.cliente.fechar()
+                self.valores, self.fixos = {}, set()
+                await self.abrir()
+            if self.pausa > 0:
+                await asyncio.sleep(self.rng.expovariate(1 / self.pausa))
+            sorteio = self.rng.random()
+            if self.pagina in self.paginas_filtros and self.filtros:
+                if sorteio < NAVEGAR:
+                    await self.navegar(self.rng.choice(self.rotas))
+                elif sorteio < NAVEGAR + SIDEBAR:
+                    await self.alternar_sidebar()
+                else:
+                    await self.filtrar()
+            elif sorteio < SIDEBAR_FORA:
+                await self.alternar_sidebar()
+            else:
+                await self.navegar(self.rng.choice(self.rotas))
+
+
+async def _nivel(host, porta, deps, usuarios, duracao, aquecimento, pausa, timeout, semente, rotas, paginas_filtros):
+    agora = time.perf_counter()
+    estatisticas = Estatisticas(agora + aquecimento, agora + aquecimento + duracao)
+    clientes = [Cliente(host, porta, timeout) for _ in range(usuarios)]
+    tarefas = [
+        asyncio.create_task(Usuario(
+            cliente, deps, estatisticas, random.Random(semente * 100003 + i), pausa, rotas, paginas_filtros,
+        ).rodar())
+        for i, cliente in enumerate(clientes)
+    ]
+    # Cada usuário para sozinho no fim da janela; quem ainda espera uma
+    # resposta além do timeout é cancelado
+    _, pendentes = await asyncio.wait(tarefas, timeout=aquecimento + duracao + timeout)
+    for tarefa in pendentes:
+        tarefa.cancel()
+    if pendentes:
+        await asyncio.wait(pendentes, timeout=5)
+    for cliente in clientes:
+        cliente.fechar()
+    falhas = [t.exception() for t in tarefas if t.done() and not t.cancelled() and t.exception() is not None]
+    if falhas:
+        raise falhas[0]
+    return resumir(estatisticas, duracao)
+
+
+# ------------------------------------------------------------ servidor
+
+def _pronto(url, processo, limite):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        if processo is not None and processo.poll() is not None:
+            raise RuntimeError(f"o servidor terminou com código {processo.returncode}")
+        try:
+            with urllib.request.urlopen(url + "/_dash-layout", timeout=5) as resposta:
+                if resposta.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"o servidor não respondeu em {limite} s")
+
+
+def iniciar_servidor(pasta, porta, gunicorn, workers, log):
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [RAIZ, os.environ.get("PYTHONPATH")])),
+        BI_MODO_CLIENTE="0",
+        BI_SEGUNDO_PLANO="0",
+    )
+    if gunicorn:
+        env.update(BI_BIND=f"127.0.0.1:{porta}", BI_WORKERS=str(workers))
+        comando = [sys.executable, "-m", "gunicorn", "-c", os.path.join(RAIZ, "gunicorn.conf.py"), "wsgi:server"]
+    else:
+        comando = [sys.executable, "-c", f"from app import app; app.run(host='127.0.0.1', port={porta}, debug=False)"]
+    return subprocess.Popen(comando, cwd=pasta, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def _imprimir(usuarios, linhas, duracao):
+    total = sum(linha["requisicoes"] for linha in linhas)
+    erros = sum(linha["erros"] for linha in linhas)
+    print(f"\n{usuarios} usuários: {total} requisições em {duracao:.0f} s ({total / duracao:.1f}/s), "
+          f"erros {erros / total if total else 0:.2%}")
+    print(f"{'callback':<34}{'n':>7}{'erros':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>8}{'KiB':>8}")
+    for linha in linhas:
+        print(f"{linha['callback'][:33]:<34}{linha['requisicoes']:>7}{linha['taxa_erro']:>8.1%}"
+              f"{linha['p50_ms']:>9.1f}{linha['p95_ms']:>9.1f}{linha['p99_ms']:>9.1f}"
+              f"{linha['vazao_rps']:>8.1f}{linha['bytes_medio'] / 1024:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--usuarios", type=int, nargs="+", default=[1, 10, 50],
+                        help="níveis de concorrência, medidos um depois do outro")
+    parser.add_argument("--duracao", type=float, default=30, help="segundos medidos por nível")
+    parser.add_argument("--aquecimento", type=float, default=5, help="segundos descartados no início de cada nível")
+    parser.add_argument("--pausa", type=float, default=1.0,
+                        help="pausa média (s) entre ações de um usuário; 0 = sem pausa")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--rotas", nargs="+", default=ROTAS)
+    parser.add_argument("--paginas-filtros", nargs="+", default=PAGINAS_FILTROS)
+    parser.add_argument("--url", help="servidor já rodando; sem isso o app é iniciado aqui")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--gunicorn", action="store_true", help="sobe wsgi.py sob o gunicorn em vez do app.py")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--linhas", type=int, help="usa planilhas sintéticas com este número de linhas")
+    parser.add_argument("--pasta", default=os.path.join(tempfile.gettempdir(), "bi_sinteticos"),
+                        help="onde guardar as planilhas sintéticas")
+    parser.add_argument("--saida", help="arquivo JSON com o resultado")
+    args = parser.parse_args()
+
+    processo = log = None
+    url = args.url
+    if url is None:
+        pasta = RAIZ
+        if args.linhas:
+            pasta = sinteticos.gerar(os.path.join(args.pasta, f"{args.linhas}-{args.semente}"), args.linhas, args.semente)
+        log = tempfile.NamedTemporaryFile(prefix="bi_usuarios_", suffix=".log", delete=False)
+        processo = iniciar_servidor(pasta, args.porta, args.gunicorn, args.workers, log)
+        url = f"http://127.0.0.1:{args.porta}"
+        print(f"servidor: {'gunicorn' if args.gunicorn else 'app.py'} em {url} (log em {log.name})", file=sys.stderr)
+    try:
+        _pronto(url, processo, 600)
+        with urllib.request.urlopen(url + "/_dash-dependencies") as resposta:
+            deps = [d for d in json.load(resposta) if not d.get("clientside_function")]
+        endereco = urlsplit(url)
+        niveis = []
+        for usuarios in args.usuarios:
+            linhas = asyncio.run(_nivel(
+                endereco.hostname, endereco.port or 80, deps, usuarios, args.duracao, args.aquecimento,
+                args.pausa, args.timeout, args.semente, args.rotas, args.paginas_filtros,
+            ))
+            _imprimir(usuarios, linhas, args.duracao)
+            niveis.append({"usuarios": usuarios, "callbacks": linhas})
+    finally:
+        if processo is not None:
+            processo.terminate()
+            try:
+                processo.wait(10)
+            except subprocess.TimeoutExpired:
+                processo.kill()
+            log.close()
+
+    if args.saida:
+        with open(args.saida, "w") as f:
+            json.dump({
+                "data": datetime.now().isoformat(timespec="seconds"),
+                "url": url,
+                "servidor": "externo" if args.url else ("gunicorn" if args.gunicorn else "app.py"),
+                "duracao": args.duracao,
+                "pausa": args.pausa,
+                "linhas": args.linhas,
+                "niveis": niveis,
+            }, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
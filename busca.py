@@ -0,0 +1,174 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+# Palavras que aparecem em quase todo texto e não ajudam a ordenar resultados
+PALAVRAS_VAZIAS = frozenset(
+    "a o as os de da do das dos e em no na nos nas um uma para por com sem ao aos "
+    "à às que se ou".split()
+)
+
+# Parâmetros do BM25: saturação da frequência do termo e peso do tamanho do texto
+K1 = 1.2
+B = 0.75
+
+# Máximo de termos do vocabulário aceitos para a última palavra da busca
+# quando ela ainda está sendo digitada (busca por prefixo)
+LIMITE_PREFIXOS = 50
+
+
+def _sem_acentos(texto):
+    return "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+
+
+# Termos de um texto: minúsculas, sem acentos, só letras e números
+def termos(texto):
+    return [t for t in re.findall(r"[a-z0-9]+", _sem_acentos(str(texto).lower())) if t not in PALAVRAS_VAZIAS]
+
+
+class IndiceTexto:
+    # Índice invertido (termo -> {documento: frequência}) com pontuação BM25.
+    # Documentos são organizados em grupos (ex.: uma planilha) e cada grupo é
+    # sincronizado por inteiro: só entram e saem os documentos que mudaram, e
+    # as estatísticas do BM25 (frequência dos termos, tamanho médio) são
+    # atualizadas junto, sem reconstruir o índice.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs = {}          # id -> {"grupo", "chave", "texto", "dados", "termos", "tamanho"}
+        self._ids = {}           # (grupo, chave) -> id
+        self._postings = {}      # termo -> {id: frequência}
+        self._vocabulario = None  # termos em ordem, para a busca por prefixo (refeito sob demanda)
+        self._comprimento_total = 0
+        self._proximo_id = 0
+
+    def _adicionar(self, grupo, chave, texto, dados):
+        frequencias = Counter(termos(texto))
+        doc_id = self._proximo_id
+        self._proximo_id += 1
+        tamanho = sum(frequencias.values())
+        self._docs[doc_id] = {
+            "grupo": grupo, "chave": chave, "texto": texto, "dados": dados,
+            "termos": frequencias, "tamanho": tamanho,
+        }
+        self._ids[(grupo, chave)] = doc_id
+        self._comprimento_total += tamanho
+        for termo, tf in frequencias.items():
+            postings = self._postings.get(termo)
+            if postings is None:
+                postings = self._postings[termo] = {}
+                self._vocabulario = None
+            postings[doc_id] = tf
+
+    def _remover(self, doc_id):
+        doc = self._docs.pop(doc_id)
+        del self._ids[(doc["grupo"], doc["chave"])]
+        self._comprimento_total -= doc["tamanho"]
+        for termo in doc["termos"]:
+            postings = self._postings[termo]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[termo]
+                self._vocabulario = None
+
+    # Deixa o grupo com exatamente os `documentos` ({chave: (texto, dados)}).
+    # Documentos com a mesma chave e o mesmo texto só têm os dados trocados.
+    # Devolve (adicionados, removidos).
+    def sincronizar(self, grupo, documentos):
+        with self._lock:
+            atuais = {chave: doc_id for (g, chave), doc_id in self._ids.items() if g == grupo}
+            removidos = 0
+            for chave, doc_id in atuais.items():
+                novo = documentos.get(chave)
+                if novo is None or novo[0] != self._docs[doc_id]["texto"]:
+                    self._remover(doc_id)
+                    removidos += 1
+            adicionados = 0
+            for chave, (texto, dados) in documentos.items():
+                doc_id = self._ids.get((grupo, chave))
+                if doc_id is None:
+                    self._adicionar(grupo, chave, texto, dados)
+                    adicionados += 1
+                else:
+                    self._docs[doc_id]["dados"] = dados
+            return adicionados, removidos
+
+    def _idf(self, termo):
+        total, n = len(self._docs), len(self._postings[termo])
+        return math.log(1 + (total - n + 0.5) / (n + 0.5))
+
+    def _bm25(self, tf, doc, media):
+        return tf * (K1 + 1) / (tf + K1 * (1 - B + B * doc["tamanho"] / media))
+
+    # Pontuação BM25 dos documentos que têm algum dos termos de `pesos`
+    # ({termo: peso na consulta}). Termos presentes em mais da metade dos
+    # documentos (ex.: "projeto") quase não mudam a ordem: depois que algum
+    # termo mais raro já escolheu os candidatos, eles só somam pontos a esses.
+    def _pontuar(self, pesos, grupos=None):
+        if not self._docs:
+            return {}
+        media = self._comprimento_total / len(self._docs) or 1
+        metade = len(self._docs) / 2
+        docs = self._docs
+        pontos = {}
+        for termo in sorted(pesos, key=lambda t: len(self._postings.get(t, ()))):
+            postings = self._postings.get(termo)
+            if not postings:
+                continue
+            fator = pesos[termo] * self._idf(termo)
+            if pontos and len(postings) > metade:
+                pares = [(doc_id, postings[doc_id]) for doc_id in pontos if doc_id in postings]
+            else:
+                pares = postings.items()
+            for doc_id, tf in pares:
+                doc = docs[doc_id]
+                if grupos and doc["grupo"] not in grupos:
+                    continue
+                pontos[doc_id] = pontos.get(doc_id, 0.0) + fator * self._bm25(tf, doc, media)
+        return pontos
+
+    def _resultados(self, pontos, limite):
+        melhores = heapq.nlargest(limite, pontos.items(), key=lambda item: (item[1], -item[0]))
+        return [dict(self._docs[doc_id]["dados"], id=doc_id, texto=self._docs[doc_id]["texto"], pontos=p)
+                for doc_id, p in melhores]
+
+    # Documentos mais relevantes para `consulta`. A última palavra também casa
+    # com termos que começam com ela, para a busca funcionar enquanto se digita.
+    def buscar(self, consulta, limite=20, grupos=None):
+        palavras = termos(consulta)
+        if not palavras:
+            return []
+        with self._lock:
+            pesos = dict.fromkeys(palavras, 1.0)
+            ultima = palavras[-1]
+            if self._vocabulario is None:
+                self._vocabulario = sorted(self._postings)
+            inicio = bisect.bisect_left(self._vocabulario, ultima)
+            for termo in self._vocabulario[inicio:inicio + LIMITE_PREFIXOS]:
+                if not termo.startswith(ultima):
+                    break
+                pesos.setdefault(termo, 0.5)
+            return self._resultados(self._pontuar(pesos, grupos), limite)
+
+    # Documentos parecidos com `doc_id`: seus termos viram a consulta e a
+    # pontuação é dividida pela do próprio documento (1.0 = mesmo conteúdo)
+    def similares(self, doc_id, limite=10, grupos=None):
+        with self._lock:
+            doc = self._docs.get(doc_id)
+            if doc is None or not doc["termos"]:
+                return []
+            pesos = {termo: float(tf) for termo, tf in doc["termos"].items()}
+            media = self._comprimento_total / len(self._docs) or 1
+            referencia = sum(
+                peso * self._idf(termo) * self._bm25(doc["termos"][termo], doc, media)
+                for termo, peso in pesos.items()
+            ) or 1.0
+            pontos = {i: p / referencia for i, p in self._pontuar(pesos, grupos).items() if i != doc_id}
+            return self._resultados(pontos, limite)
+
+    def estatisticas(self):
+        with self._lock:
+            return {"documentos": len(self._docs), "termos": len(self._postings)}
@@ -0,0 +1,178 @@
+import functools
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from flask import jsonify
+from plotly.io.json import to_json_plotly
+
+from app_instance import app
+import dados
+import metricas
+
+try:
+    import diskcache
+except ImportError:  # backend em disco é opcional
+    diskcache = None
+
+# Backend do cache de figuras/tabelas: "memoria" (padrão, por processo) ou
+# "disco" (diskcache, compartilhado entre os workers da mesma máquina)
+BACKEND = os.environ.get("BI_CACHE_RESULTADOS", "memoria")
+LIMITE_BYTES = int(float(os.environ.get("BI_CACHE_RESULTADOS_MB", "64")) * 1024 * 1024)
+PASTA_DISCO = os.environ.get("BI_CACHE_RESULTADOS_DIR", os.path.join(dados.CACHE_DIR, "resultados"))
+
+
+class CacheMemoria:
+    # LRU limitado pelo tamanho (em bytes) dos resultados serializados
+    def __init__(self, limite_bytes):
+        self.limite_bytes = limite_bytes
+        self.bytes = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            valor = self._itens.get(chave)
+            if valor is not None:
+                self._itens.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave, valor):
+        if len(valor) > self.limite_bytes:
+            return
+        with self._lock:
+            anterior = self._itens.pop(chave, None)
+            if anterior is not None:
+                self.bytes -= len(anterior)
+            self._itens[chave] = valor
+            self.bytes += len(valor)
+            while self.bytes > self.limite_bytes:
+                _, removido = self._itens.popitem(last=False)
+                self.bytes -= len(removido)
+
+    def descartar_fonte(self, fonte, versao_atual):
+        # chave = (nome, fonte, versao, argumentos)
+        with self._lock:
+            for chave in [c for c in self._itens if c[1] == fonte and c[2] != versao_atual]:
+                self.bytes -= len(self._itens.pop(chave))
+
+    def tamanho(self):
+        return len(self._itens), self.bytes
+
+
+class CacheDisco:
+    # Mesmo contrato, persistido com diskcache (SQLite + arquivos) para que
+    # vários processos aproveitem os resultados uns dos outros
+    def __init__(self, pasta, limite_bytes):
+        self._cache = diskcache.Cache(
+            pasta, size_limit=limite_bytes, eviction_policy="least-recently-used"
+        )
+
+    def obter(self, chave):
+        return self._cache.get(chave)
+
+    def guardar(self, chave, valor):
+        self._cache.set(chave, valor)
+
+    def descartar_fonte(self, fonte, versao_atual):
+        for chave in list(self._cache.iterkeys()):
+            if chave[1] == fonte and chave[2] != versao_atual:
+                self._cache.delete(chave)
+
+    def tamanho(self):
+        return len(self._cache), self._cache.volume()
+
+
+if BACKEND == "disco" and diskcache is not None:
+    _cache = CacheDisco(PASTA_DISCO, LIMITE_BYTES)
+else:
+    _cache = CacheMemoria(LIMITE_BYTES)
+
+_contadores = {}
+_lock_contadores = threading.Lock()
+
+
+def _contar(nome, evento):
+    with _lock_contadores:
+        contador = _contadores.setdefault(nome, {"hits": 0, "misses": 0})
+        contador[evento] += 1
+
+
+def _normalizar(valor):
+    # Seleções múltiplas viram tuplas ordenadas (a ordem de escolha não importa
+    # e vazio equivale a "sem filtro"); listas de dicts, como sort_by, mantêm a
+    # ordem porque ela muda o resultado
+    if isinstance(valor, (list, tuple)):
+        if not valor:
+            return None
+        if all(isinstance(v, dict) for v in valor):
+            return tuple(tuple(sorted(v.items())) for v in valor)
+        return tuple(sorted(set(valor), key=str))
+    if isinstance(valor, dict):
+        return tuple(sorted((k, _normalizar(v)) for k, v in valor.items()))
+    return valor
+
+
+# Decorador para funções f(snap, *args) cujo resultado depende só da versão
+# dos dados e dos argumentos. O resultado é guardado serializado em JSON (o
+# mesmo formato enviado ao navegador); num acerto volta como dicts/listas.
+def memorizar(nome):
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(snap, *args):
+            chave = (nome, snap.fonte, snap.versao, tuple(_normalizar(a) for a in args))
+            guardado = _cache.obter(chave)
+            if guardado is not None:
+                _contar(nome, "hits")
+                return json.loads(guardado)
+            _contar(nome, "misses")
+            resultado = funcao(snap, *args)
+            _cache.guardar(chave, to_json_plotly(resultado))
+            return resultado
+        return envolvida
+    return decorador
+
+
+def estatisticas():
+    entradas, tamanho = _cache.tamanho()
+    with _lock_contadores:
+        por_funcao = {nome: dict(c) for nome, c in _contadores.items()}
+    return {
+        "backend": type(_cache).__name__,
+        "entradas": entradas,
+        "bytes": tamanho,
+        "limite_bytes": LIMITE_BYTES,
+        "hits": sum(c["hits"] for c in por_funcao.values()),
+        "misses": sum(c["misses"] for c in por_funcao.values()),
+        "por_funcao": por_funcao,
+    }
+
+
+# Uma nova versão da planilha torna inúteis os resultados da versão anterior
+@dados.ao_recarregar
+def _invalidar(snap):
+    _cache.descartar_fonte(snap.fonte, snap.versao)
+
+
+@metricas.registrar_coletor
+def _metricas():
+    est = estatisticas()
+    linhas = [
+        "# HELP bi_cache_resultados_total Consultas ao cache de resultados.",
+        "# TYPE bi_cache_resultados_total counter",
+    ]
+    for nome, c in sorted(est["por_funcao"].items()):
+        for resultado in ("hits", "misses"):
+            linhas.append(f'bi_cache_resultados_total{{funcao="{nome}",resultado="{resultado}"}} {c[resultado]}')
+    linhas += [
+        "# HELP bi_cache_resultados_bytes Bytes ocupados pelo cache de resultados.",
+        "# TYPE bi_cache_resultados_bytes gauge",
+        f"bi_cache_resultados_bytes {est['bytes']}",
+    ]
+    return linhas
+
+
+@app.server.route("/_cache")
+def _rota_estatisticas():
+    return jsonify(estatisticas())
@@ -0,0 +1,292 @@
+import heapq
+import logging
+import math
+import threading
+from collections import ChainMap, defaultdict
+
+logger = logging.getLogger(__name__)
+
+
+class Tarefa:
+    # Uma tarefa do plano. Datas são dias (date.toordinal()); `inicio` é a
+    # data mais cedo em que a tarefa pode começar (None = hoje), `duracao` o
+    # total de dias, `progresso` a fração já feita (0 a 1) e `predecessoras`
+    # as chaves das tarefas que precisam terminar antes. Duração 0 é um marco:
+    # só junta predecessoras (com progresso 1, termina quando elas terminam).
+    # `plano` separa cronogramas independentes (ex.: projetos e ambiental): o
+    # caminho crítico e a folga são calculados até o fim de cada plano.
+    def __init__(self, nome, plano, inicio, duracao, progresso=0.0, predecessoras=(), atraso=0):
+        self.nome = nome
+        self.plano = plano
+        self.inicio = inicio
+        self.duracao = max(0, int(duracao))
+        self.progresso = min(max(float(progresso), 0.0), 1.0)
+        self.predecessoras = tuple(predecessoras)
+        self.atraso = int(atraso)
+
+    def _valores(self):
+        return (self.nome, self.plano, self.inicio, self.duracao, self.progresso, self.predecessoras, self.atraso)
+
+    def __eq__(self, outra):
+        return isinstance(outra, Tarefa) and self._valores() == outra._valores()
+
+    def __hash__(self):
+        return hash(self._valores())
+
+    def com_atraso(self, dias):
+        return Tarefa(self.nome, self.plano, self.inicio, self.duracao, self.progresso, self.predecessoras, dias)
+
+
+class _Estado:
+    # Datas calculadas: início e fim projetados (fim exclusivo), a "cauda" (dias
+    # do fim da tarefa até o fim do plano pelo caminho mais longo de
+    # sucessoras) e o fim de cada plano. Numa simulação cada dicionário é um
+    # ChainMap sobre o estado base: só o que muda é copiado.
+    def __init__(self, tarefas, inicio, fim, cauda, fim_plano):
+        self.tarefas = tarefas
+        self.inicio = inicio
+        self.fim = fim
+        self.cauda = cauda
+        self.fim_plano = fim_plano
+
+    def sobre(self, alteracoes):
+        return _Estado(
+            ChainMap(dict(alteracoes), self.tarefas), ChainMap({}, self.inicio), ChainMap({}, self.fim),
+            ChainMap({}, self.cauda), ChainMap({}, self.fim_plano),
+        )
+
+    # Folga (dias) da tarefa: quanto o fim dela pode atrasar sem atrasar o plano
+    def folga(self, chave):
+        return self.fim_plano[self.tarefas[chave].plano] - self.cauda[chave] - self.fim[chave]
+
+    def linha(self, chave):
+        tarefa = self.tarefas[chave]
+        folga = self.folga(chave)
+        return {
+            "chave": chave, "nome": tarefa.nome, "plano": tarefa.plano,
+            "inicio": self.inicio[chave], "fim": self.fim[chave] - 1,  # último dia
+            "cauda": self.cauda[chave], "progresso": tarefa.progresso, "folga": folga, "critica": folga <= 0,
+            "marco": tarefa.duracao == 0,
+        }
+
+
+class Cronograma:
+    # Caminho crítico (CPM) com recálculo incremental. Ida: o início
+    # projetado é o maior entre o início da tarefa e o fim das predecessoras,
+    # e o fim é o maior entre o previsto (início + duração) e hoje + o que
+    # falta fazer. Volta: a cauda de cada tarefa vem das sucessoras. Quando
+    # algumas tarefas mudam, só elas e as que dependem delas (ida) ou das
+    # quais elas dependem (volta) são recalculadas, em ordem topológica, e a
+    # propagação para onde as datas não mudam.
+    def __init__(self, hoje):
+        self._lock = threading.Lock()
+        self.hoje = hoje
+        self._base = _Estado({}, {}, {}, {}, {})
+        self._pred = {}     # chave -> predecessoras existentes (sem ciclos)
+        self._suc = {}      # chave -> sucessoras
+        self._ordem = {}    # chave -> posição na ordem topológica
+        self.recalculadas = 0  # tarefas recalculadas na última atualização
+        self.geracao = 0       # muda a cada atualização que altera o plano
+        self._linhas = None    # linhas do plano atual, montadas sob demanda
+
+    # Dependências entre as tarefas atuais; predecessoras inexistentes são
+    # ignoradas e a aresta que fecha um ciclo é descartada
+    def _montar_grafo(self):
+        tarefas = self._base.tarefas
+        pred = {k: [p for p in dict.fromkeys(t.predecessoras) if p in tarefas and p != k] for k, t in tarefas.items()}
+        suc = defaultdict(list)
+        for k, ps in pred.items():
+            for p in ps:
+                suc[p].append(k)
+        entrada = {k: len(ps) for k, ps in pred.items()}
+        prontas = sorted(k for k, n in entrada.items() if n == 0)
+        heapq.heapify(prontas)
+        ordem = {}
+        while len(ordem) < len(tarefas):
+            if not prontas:
+                # Ciclo: sobe pelas predecessoras pendentes até repetir uma
+                # tarefa, que está no ciclo, e descarta a aresta que chega nela
+                k, caminho = min(k for k in tarefas if k not in ordem), set()
+                while k not in caminho:
+                    caminho.add(k)
+                    k = next(p for p in pred[k] if p not in ordem)
+                p = next(p for p in pred[k] if p not in ordem)
+                logger.warning("Dependência circular no plano: ignorando %s -> %s", p, k)
+                pred[k].remove(p)
+                suc[p].remove(k)
+                entrada[k] -= 1
+                if entrada[k] == 0:
+                    heapq.heappush(prontas, k)
+                continue
+            k = heapq.heappop(prontas)
+            ordem[k] = len(ordem)
+            for s in suc[k]:
+                entrada[s] -= 1
+                if entrada[s] == 0:
+                    heapq.heappush(prontas, s)
+        self._pred, self._suc, self._ordem = pred, dict(suc), ordem
+
+    def _calcular_ida(self, estado, k):
+        tarefa = estado.tarefas[k]
+        inicio = tarefa.inicio if tarefa.inicio is not None else self.hoje
+        for p in self._pred[k]:
+            inicio = max(inicio, estado.fim[p])
+        fim = inicio + tarefa.duracao
+        if tarefa.progresso < 1:
+            fim = max(fim, max(inicio, self.hoje) + math.ceil(tarefa.duracao * (1 - tarefa.progresso)))
+        return inicio, fim + tarefa.atraso
+
+    # Recalcula a partir de `sementes` (tarefas novas ou alteradas) e de
+    # `sementes_volta` (tarefas cujas sucessoras mudaram). Devolve quantas
+    # tarefas foram recalculadas.
+    def _propagar(self, estado, sementes, sementes_volta=(), removidas_planos=()):
+        ordem = self._ordem
+        sementes = set(sementes)
+        recalculadas = set()
+        duracao_mudou = []
+        planos_tocados = set(removidas_planos)
+        fins_antigos = defaultdict(list)
+
+        fila = [(ordem[k], k) for k in sementes]
+        heapq.heapify(fila)
+        vistas = set(sementes)
+        while fila:
+            _, k = heapq.heappop(fila)
+            recalculadas.add(k)
+            antes = (estado.inicio.get(k), estado.fim.get(k))
+            depois = self._calcular_ida(estado, k)
+            if depois == antes and k not in sementes:
+                continue
+            estado.inicio[k], estado.fim[k] = depois
+            plano = estado.tarefas[k].plano
+            planos_tocados.add(plano)
+            fins_antigos[plano].append(antes[1])
+            if antes[0] is None or antes[1] - antes[0] != depois[1] - depois[0] or k in sementes:
+                duracao_mudou.append(k)
+            if depois[1] != antes[1]:
+                for s in self._suc.get(k, ()):
+                    if s not in vistas:
+                        vistas.add(s)
+                        heapq.heappush(fila, (ordem[s], s))
+
+        # Volta: a cauda de uma tarefa depende da duração e da cauda das sucessoras
+        fila = []
+        vistas = set()
+        for k in list(sementes_volta) + [p for k in duracao_mudou for p in self._pred[k]] + list(sementes):
+            if k in ordem and k not in vistas:
+                vistas.add(k)
+                fila.append((-ordem[k], k))
+        heapq.heapify(fila)
+        while fila:
+            _, k = heapq.heappop(fila)
+            recalculadas.add(k)
+            cauda = max(
+                (estado.cauda[s] + estado.fim[s] - estado.inicio[s] for s in self._suc.get(k, ())), default=0
+            )
+            if estado.cauda.get(k) == cauda:
+                continue
+            estado.cauda[k] = cauda
+            for p in self._pred[k]:
+                if p not in vistas:
+                    vistas.add(p)
+                    heapq.heappush(fila, (-ordem[p], p))
+
+        # Fim de cada plano: só é recalculado por inteiro se a tarefa que
+        # definia o fim terminou mais cedo ou saiu
+        for plano in planos_tocados:
+            atual = estado.fim_plano.get(plano)
+            if plano in removidas_planos or atual is None or atual in fins_antigos[plano]:
+                fins = [estado.fim[k] for k, t in estado.tarefas.items() if t.plano == plano]
+                if fins:
+                    estado.fim_plano[plano] = max(fins)
+                else:
+                    estado.fim_plano.pop(plano, None)
+            else:
+                estado.fim_plano[plano] = max([atual] + [estado.fim[k] for k in recalculadas
+                                                         if estado.tarefas[k].plano == plano])
+        return len(recalculadas)
+
+    # Deixa o plano com exatamente as `tarefas` ({chave: Tarefa}) e recalcula
+    # só o que mudou. Com `hoje` diferente, tudo é recalculado (as datas
+    # projetadas dependem do dia). Devolve quantas tarefas foram recalculadas.
+    def sincronizar(self, tarefas, hoje=None):
+        with self._lock:
+            base = self._base
+            mudou_dia = hoje is not None and hoje != self.hoje
+            if hoje is not None:
+                self.hoje = hoje
+            removidas = [k for k in base.tarefas if k not in tarefas]
+            alteradas = [k for k, t in tarefas.items() if mudou_dia or base.tarefas.get(k) != t]
+            if not removidas and not alteradas:
+                self.recalculadas = 0
+                return 0
+
+            estrutura = removidas or any(
+                k not in base.tarefas or base.tarefas[k].predecessoras != tarefas[k].predecessoras
+                for k in alteradas
+            )
+            sementes_volta = set()
+            removidas_planos = set()
+            for k in removidas:
+                removidas_planos.add(base.tarefas[k].plano)
+                sementes_volta.update(self._pred.get(k, ()))
+                alteradas.extend(self._suc.get(k, ()))
+                for dicionario in (base.tarefas, base.inicio, base.fim, base.cauda):
+                    dicionario.pop(k, None)
+            for k in alteradas:
+                if k in tarefas:
+                    anterior = base.tarefas.get(k)
+                    if anterior is not None:
+                        if anterior.predecessoras != tarefas[k].predecessoras:
+                            sementes_volta.update(anterior.predecessoras)
+                        if anterior.plano != tarefas[k].plano:
+                            removidas_planos.add(anterior.plano)
+                    base.tarefas[k] = tarefas[k]
+            if estrutura:
+                # As arestas efetivas podem mudar além das tarefas alteradas (a
+                # aresta descartada de um ciclo pode ser outra): quem ganhou ou
+                # perdeu predecessoras é recalculado na ida, e as predecessoras
+                # antigas e novas dela na volta
+                pred_antes = self._pred
+                self._montar_grafo()
+                for k, ps in self._pred.items():
+                    antes = pred_antes.get(k)
+                    if antes != ps:
+                        alteradas.append(k)
+                        sementes_volta.update(ps)
+                        sementes_volta.update(antes or ())
+            alteradas = [k for k in dict.fromkeys(alteradas) if k in base.tarefas]
+            sementes_volta = [k for k in sementes_volta if k in base.tarefas]
+            self.recalculadas = self._propagar(base, alteradas, sementes_volta, removidas_planos)
+            self.geracao += 1
+            self._linhas = None
+            return self.recalculadas
+
+    # Linhas de todas as tarefas do plano atual (montadas uma vez por
+    # geração) e o fim de cada plano. Com `alteracoes` ({chave: Tarefa},
+    # mesmas predecessoras) é uma simulação: o plano atual não muda, só as
+    # tarefas afetadas são recalculadas, sobre uma cópia rasa do estado, e
+    # "alteradas" traz as linhas delas. A folga das demais muda só se o fim
+    # do plano mudar: é fim_planos - cauda - fim.
+    def resultado(self, alteracoes=None):
+        with self._lock:
+            base = self._base
+            if self._linhas is None:
+                self._linhas = [base.linha(k) for k in self._ordem]
+            resultado = {
+                "geracao": self.geracao, "linhas": self._linhas, "alteradas": {}, "recalculadas": 0,
+                "fim_planos": {plano: fim - 1 for plano, fim in base.fim_plano.items()},
+            }
+            alteracoes = {k: t for k, t in (alteracoes or {}).items()
+                          if k in base.tarefas and t.predecessoras == base.tarefas[k].predecessoras}
+            if alteracoes:
+                estado = base.sobre(alteracoes)
+                resultado["recalculadas"] = self._propagar(estado, list(alteracoes))
+                mudadas = set(alteracoes) | set(estado.inicio.maps[0]) | set(estado.cauda.maps[0])
+                resultado["alteradas"] = {k: estado.linha(k) for k in mudadas}
+                resultado["fim_planos"] = {plano: fim - 1 for plano, fim in estado.fim_plano.items()}
+            return resultado
+
+    def tarefas(self):
+        with self._lock:
+            return dict(self._base.tarefas)
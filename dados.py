@@ -0,0 +1,336 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime
+
+import pandas as pd
+
+import esquema
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # sem pyarrow o carregamento volta a ser direto do Excel
+    pa = None
+    feather = None
+
+try:
+    import fcntl
+except ImportError:  # fora do Unix cada processo converte por conta própria
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Pasta do cache colunar (Feather/Arrow) das planilhas
+CACHE_DIR = os.environ.get("BI_CACHE_DIR", ".cache")
+
+
+def _hash_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _caminhos_cache(caminho, sheet_name):
+    base = os.path.splitext(os.path.basename(caminho))[0]
+    nome = f"{base}-{sheet_name}"
+    return (
+        os.path.join(CACHE_DIR, nome + ".feather"),
+        os.path.join(CACHE_DIR, nome + ".json"),
+    )
+
+
+def _como_texto(valor):
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)) or valor is pd.NaT:
+        return None
+    if isinstance(valor, (datetime, date)):
+        # Mesmo formato que o Dash usa ao serializar datas para o navegador
+        return valor.isoformat()
+    return str(valor)
+
+
+def _normalizar(df):
+    # O Arrow não aceita colunas object com tipos misturados, como "Início"
+    # (datas e textos) ou "% Concluído" (números e "100%"). Essas colunas são
+    # gravadas como texto; o tratamento feito depois nas páginas não muda.
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].map(_como_texto).astype(object)
+    return df
+
+
+def _ler_meta(caminho_meta):
+    try:
+        with open(caminho_meta, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _gravar_meta(caminho_meta, meta):
+    tmp_meta = f"{caminho_meta}.{os.getpid()}.tmp"
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, caminho_meta)
+
+
+def _gravar_cache(df, caminho_feather, caminho_meta, meta):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_feather = f"{caminho_feather}.{os.getpid()}.tmp"
+    # Sem compressão para que a leitura possa mapear o arquivo em memória
+    feather.write_feather(df, tmp_feather, compression="uncompressed")
+    os.replace(tmp_feather, caminho_feather)
+    _gravar_meta(caminho_meta, meta)
+
+
+def _ler_cache(caminho_feather):
+    # split_blocks evita consolidar as colunas numa cópia: o DataFrame aponta
+    # para as páginas do arquivo mapeado, compartilhadas entre os processos
+    # que lerem o mesmo cache
+    return feather.read_table(caminho_feather, memory_map=True).to_pandas(split_blocks=True)
+
+
+# Trava entre processos: com vários workers só um converte a planilha
+# alterada; os demais esperam e leem o cache recém-gravado
+@contextlib.contextmanager
+def _trava_conversao(caminho_meta):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        f = open(caminho_meta + ".lock", "a") if fcntl is not None else None
+    except OSError:
+        f = None
+    if f is None:
+        yield
+        return
+    with f:
+        fcntl.flock(f, fcntl.LOCK_EX)  # liberada ao fechar o arquivo
+        yield
+
+
+# Aplica o esquema de tipos e mede a memória antes e depois
+def _tipar(df, tipos, caminho):
+    antes = esquema.memoria_por_coluna(df)
+    df = esquema.aplicar(df, tipos)
+    depois = esquema.memoria_por_coluna(df)
+    memoria = {
+        "antes": sum(antes.values()),
+        "depois": sum(depois.values()),
+        "colunas": {c: [antes[c], depois[c]] for c in depois},
+    }
+    logger.info("Planilha %s: %.1f MB -> %.1f MB com o esquema de tipos",
+                caminho, memoria["antes"] / 2**20, memoria["depois"] / 2**20)
+    return df, memoria
+
+
+# Lê uma planilha usando o cache colunar quando ele ainda é válido e devolve
+# também o hash do conteúdo e a memória antes/depois do esquema `tipos`. O
+# cache já guarda as colunas tipadas e é invalidado pelo mtime/tamanho do
+# arquivo de origem e, quando eles mudam, pelo hash (arquivos apenas "tocados"
+# reaproveitam o cache) ou por mudança no esquema.
+def _carregar(caminho, sheet_name=0, tipos=None):
+    if feather is None:
+        df, memoria = _tipar(pd.read_excel(caminho, sheet_name=sheet_name), tipos, caminho)
+        return df, _hash_arquivo(caminho), memoria
+
+    caminho_feather, caminho_meta = _caminhos_cache(caminho, sheet_name)
+    assinatura_tipos = esquema.assinatura(tipos)
+    with _trava_conversao(caminho_meta):
+        stat = os.stat(caminho)
+        meta = _ler_meta(caminho_meta)
+
+        if meta and meta.get("esquema") == assinatura_tipos and os.path.exists(caminho_feather):
+            if meta["mtime_ns"] == stat.st_mtime_ns and meta["tamanho"] == stat.st_size:
+                return _ler_cache(caminho_feather), meta["sha256"], meta["memoria"]
+            sha = _hash_arquivo(caminho)
+            if meta["sha256"] == sha:
+                meta.update(mtime_ns=stat.st_mtime_ns, tamanho=stat.st_size)
+                try:
+                    _gravar_meta(caminho_meta, meta)
+                except OSError:
+                    pass
+                return _ler_cache(caminho_feather), sha, meta["memoria"]
+        else:
+            sha = _hash_arquivo(caminho)
+
+        df, memoria = _tipar(_normalizar(pd.read_excel(caminho, sheet_name=sheet_name)), tipos, caminho)
+        meta = {
+            "mtime_ns": stat.st_mtime_ns,
+            "tamanho": stat.st_size,
+            "sha256": sha,
+            "esquema": assinatura_tipos,
+            "memoria": memoria,
+        }
+        try:
+            _gravar_cache(df, caminho_feather, caminho_meta, meta)
+        except OSError:
+            # Pasta sem permissão de escrita ou arquivo em uso: segue sem cache
+            return df, sha, memoria
+        # Relido do arquivo para que este processo também use as páginas mapeadas
+        return _ler_cache(caminho_feather), sha, memoria
+
+
+def carregar_planilha(caminho, sheet_name=0, tipos=None):
+    return _carregar(caminho, sheet_name, tipos)[0]
+
+
+# ---------------------------------------------------------------------------
+# Snapshots versionados e recarga automática
+# ---------------------------------------------------------------------------
+
+# Intervalo (s) entre verificações das planilhas; 0 desliga o monitoramento
+INTERVALO_RECARGA = float(os.environ.get("BI_RELOAD_INTERVALO", "5"))
+
+_fontes = {}
+_snapshots = {}
+_ouvintes = []
+_monitor = None
+
+
+class Snapshot:
+    # Uma versão dos dados de uma planilha e de tudo que é derivado dela.
+    # Nunca é alterado depois de publicado: uma recarga cria outro snapshot.
+    def __init__(self, fonte, versao, **campos):
+        self.fonte = fonte
+        self.versao = versao
+        self.__dict__.update(campos)
+
+
+def _assinatura(caminho):
+    stat = os.stat(caminho)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _construir(nome):
+    fonte = _fontes[nome]
+    assinatura = _assinatura(fonte["caminho"])
+    df, sha, memoria = _carregar(fonte["caminho"], fonte["sheet_name"], fonte["tipos"])
+    atual = _snapshots.get(nome)
+    if atual is None or atual.versao != sha[:12]:
+        atual = Snapshot(nome, sha[:12], **fonte["preparar"](df, sha[:12]))
+        atual.memoria_planilha = memoria
+    fonte["assinatura"] = assinatura
+    return atual
+
+
+# Registra uma planilha. Nada é lido aqui: o primeiro snapshot é montado no
+# primeiro acesso. `preparar` recebe o DataFrame lido (já com os `tipos` do
+# esquema, ver esquema.py) e a versão, e devolve um dict com os campos do
+# snapshot (ex.: {"df": df}).
+def registrar_fonte(nome, caminho, preparar, sheet_name=0, tipos=None):
+    esquema.validar(tipos)
+    _fontes[nome] = {
+        "caminho": caminho,
+        "sheet_name": sheet_name,
+        "tipos": tipos,
+        "preparar": preparar,
+        "assinatura": None,
+        "lock": threading.Lock(),
+    }
+
+
+def carregada(nome):
+    return nome in _snapshots
+
+
+def snapshot(nome):
+    # Um callback deve pegar o snapshot uma vez e usar só ele até o fim,
+    # para não misturar versões se uma recarga acontecer no meio.
+    atual = _snapshots.get(nome)
+    if atual is None:
+        with _fontes[nome]["lock"]:
+            atual = _snapshots.get(nome)
+            if atual is None:
+                atual = _snapshots[nome] = _construir(nome)
+    return atual
+
+
+# Versão atual de cada planilha já carregada
+def versoes():
+    return {nome: snap.versao for nome, snap in list(_snapshots.items())}
+
+
+# Registra uma função chamada como funcao(novo_snapshot) sempre que uma
+# planilha é recarregada com conteúdo diferente
+def ao_recarregar(funcao):
+    _ouvintes.append(funcao)
+    return funcao
+
+
+def recarregar(nome):
+    with _fontes[nome]["lock"]:
+        anterior = _snapshots.get(nome)
+        novo = _construir(nome)
+        # Troca atômica: quem já pegou o snapshot antigo continua com ele
+        _snapshots[nome] = novo
+    if novo is not anterior:
+        for funcao in _ouvintes:
+            funcao(novo)
+    return novo
+
+
+# Memória de cada planilha carregada: a planilha antes/depois do esquema de
+# tipos e cada DataFrame do snapshot (ex.: df, df_long). Medido uma vez por
+# versão, já que o snapshot não muda.
+_memoria_quadros = {}
+
+
+def relatorio_memoria():
+    global _memoria_quadros
+    relatorio, medidos = {}, {}
+    for nome, snap in list(_snapshots.items()):
+        chave = (nome, snap.versao)
+        quadros = _memoria_quadros.get(chave)
+        if quadros is None:
+            quadros = {
+                campo: esquema.memoria(valor)
+                for campo, valor in vars(snap).items() if isinstance(valor, pd.DataFrame)
+            }
+        medidos[chave] = quadros
+        relatorio[nome] = {"versao": snap.versao, "planilha": snap.memoria_planilha, "quadros": quadros}
+    # Versões substituídas saem do cache
+    _memoria_quadros = medidos
+    return relatorio
+
+
+def verificar_alteracoes():
+    recarregadas = []
+    for nome, fonte in list(_fontes.items()):
+        try:
+            # Fontes ainda não acessadas serão lidas já na versão atual
+            if not carregada(nome) or _assinatura(fonte["caminho"]) == fonte["assinatura"]:
+                continue
+            anterior = _snapshots.get(nome)
+            if recarregar(nome) is not anterior:
+                recarregadas.append(nome)
+        except Exception:
+            # Planilha ainda sendo salva ou com erro: mantém a versão atual e
+            # tenta de novo na próxima verificação
+            logger.exception("Falha ao recarregar a planilha '%s'", nome)
+    return recarregadas
+
+
+def _monitorar(intervalo):
+    while True:
+        time.sleep(intervalo)
+        for nome in verificar_alteracoes():
+            logger.info("Planilha '%s' recarregada (versão %s)", nome, _snapshots[nome].versao)
+
+
+def iniciar_monitoramento(intervalo=None):
+    global _monitor
+    intervalo = INTERVALO_RECARGA if intervalo is None else intervalo
+    if intervalo <= 0 or _monitor is not None:
+        return
+    _monitor = threading.Thread(target=_monitorar, args=(intervalo,), name="monitor-planilhas", daemon=True)
+    _monitor.start()
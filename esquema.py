@@ -0,0 +1,84 @@
+import hashlib
+import json
+
+import pandas as pd
+
+# Esquema de uma planilha: {coluna: tipo}, aplicado na carga (antes do cache
+# colunar). Tipos aceitos:
+#   "categoria"  texto com poucos valores distintos, guardado como códigos
+#                inteiros + dicionário (Status, Responsável, Cidade...)
+#   "inteiro"    número inteiro no menor tipo que comporta os valores; com
+#                células vazias fica em float64
+#   "decimal"    número com casas decimais (float64)
+#   "data"       data ISO ou dd/mm/aaaa; o que não for data vira vazio
+#   "texto"      mantido como veio da planilha
+# Texto que não é número vira vazio em "inteiro" e "decimal", como o
+# pd.to_numeric(errors="coerce") que as páginas já usavam.
+TIPOS = ("categoria", "inteiro", "decimal", "data", "texto")
+
+
+def _categoria(serie):
+    return serie.astype("category")
+
+
+def _inteiro(serie):
+    numeros = pd.to_numeric(serie, errors="coerce")
+    if numeros.isna().any():
+        return numeros.astype("float64")
+    return pd.to_numeric(numeros, downcast="integer")
+
+
+def _decimal(serie):
+    return pd.to_numeric(serie, errors="coerce").astype("float64")
+
+
+def _data(serie):
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    # Datas gravadas pelo Excel chegam em ISO; as digitadas como texto, em dd/mm/aaaa
+    datas = pd.to_datetime(serie, errors="coerce", format="ISO8601")
+    faltando = datas.isna() & serie.notna()
+    if faltando.any():
+        datas[faltando] = pd.to_datetime(serie[faltando], errors="coerce", format="%d/%m/%Y")
+    return datas
+
+
+_CONVERSORES = {
+    "categoria": _categoria,
+    "inteiro": _inteiro,
+    "decimal": _decimal,
+    "data": _data,
+    "texto": lambda serie: serie,
+}
+
+
+def validar(esquema):
+    desconhecidos = {tipo for tipo in (esquema or {}).values() if tipo not in _CONVERSORES}
+    if desconhecidos:
+        raise ValueError(f"Tipos de coluna desconhecidos no esquema: {sorted(desconhecidos)}")
+
+
+# Colunas fora do esquema, ou do esquema mas ausentes na planilha, ficam como estão
+def aplicar(df, esquema):
+    if not esquema:
+        return df
+    df = df.copy(deep=False)
+    for coluna, tipo in esquema.items():
+        if coluna in df.columns:
+            df[coluna] = _CONVERSORES[tipo](df[coluna])
+    return df
+
+
+# Entra nos metadados do cache: mudar o esquema refaz a conversão
+def assinatura(esquema):
+    texto = json.dumps(esquema or {}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()[:12]
+
+
+# Bytes ocupados pelo DataFrame, incluindo o conteúdo dos textos
+def memoria(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def memoria_por_coluna(df):
+    return {str(coluna): int(b) for coluna, b in df.memory_usage(deep=True, index=False).items()}
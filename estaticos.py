@@ -0,0 +1,238 @@
+import gzip
+import hashlib
+import logging
+import os
+import threading
+from collections import defaultdict
+
+from flask import request, send_file
+
+import metricas
+
+try:
+    import brotli
+except ImportError:  # sem brotli as respostas saem só em gzip
+    brotli = None
+
+try:
+    from PIL import Image, features
+except ImportError:  # sem Pillow as imagens não são pré-codificadas
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Respostas JSON do Dash comprimidas quando passam deste tamanho (bytes);
+# abaixo disso o cabeçalho e o custo da compressão não compensam
+COMPRIMIR_MINIMO = int(os.environ.get("BI_COMPRIMIR_MINIMO", "1024"))
+NIVEL_GZIP = int(os.environ.get("BI_COMPRIMIR_NIVEL_GZIP", "6"))
+NIVEL_BROTLI = int(os.environ.get("BI_COMPRIMIR_NIVEL_BROTLI", "5"))
+ROTAS_COMPRIMIDAS = ("_dash-update-component", "_dash-layout", "_dash-dependencies")
+
+# Imagens de assets/ a partir deste tamanho ganham versões WebP e AVIF,
+# gravadas ao lado do original (home.png -> home.png.webp, home.png.avif)
+# por `python estaticos.py` ou na partida do wsgi.py
+IMAGENS_MINIMO = int(os.environ.get("BI_IMAGENS_MINIMO", str(32 * 1024)))
+EXTENSOES_IMAGEM = (".png", ".jpg", ".jpeg")
+# Formato da variante -> (tipo MIME, opções do Pillow), em ordem de preferência
+VARIANTES = {
+    "avif": ("image/avif", {"quality": 60}),
+    "webp": ("image/webp", {"quality": 80, "method": 6}),
+}
+
+# Um ano: URLs com impressão digital (?v= de ativo, ?m= das que o Dash monta)
+# mudam quando o arquivo muda, então a resposta pode ficar no navegador (só
+# quando a impressão confere com o arquivo atual, ver _digital_confere)
+CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+
+PASTA_ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+
+_lock = threading.Lock()
+_digitais = {}
+_contagem = defaultdict(lambda: {"respostas": 0, "original": 0, "enviado": 0})
+
+
+# Impressão digital do conteúdo atual de um arquivo, recalculada quando ele muda
+def _digital(caminho):
+    mtime = os.path.getmtime(caminho)
+    with _lock:
+        digital = _digitais.get(caminho)
+    if digital is None or digital[0] != mtime:
+        with open(caminho, "rb") as arquivo:
+            digital = (mtime, hashlib.sha1(arquivo.read()).hexdigest()[:12])
+        with _lock:
+            _digitais[caminho] = digital
+    return digital[1]
+
+
+# URL de um arquivo de assets/ com impressão digital do conteúdo: o
+# navegador guarda o arquivo por um ano e baixa de novo só quando ele muda
+def ativo(nome):
+    return f"/assets/{nome}?v={_digital(os.path.join(PASTA_ASSETS, nome))}"
+
+
+# A impressão digital da URL é a do arquivo servido agora: ?v= a do ativo() e
+# ?m= a data de modificação que o Dash põe nas URLs. Uma URL antiga ou
+# inventada não pode fixar o conteúdo atual no cache por um ano.
+def _digital_confere(caminho):
+    if not os.path.isfile(caminho):
+        return False
+    if "v" in request.args:
+        return request.args["v"] == _digital(caminho)
+    if "m" in request.args:
+        return request.args["m"] == str(os.path.getmtime(caminho))
+    return False
+
+
+def _variante(caminho, formato):
+    return f"{caminho}.{formato}"
+
+
+# Formatos que esta instalação do Pillow consegue gravar
+def formatos_disponiveis():
+    if Image is None:
+        return []
+    return [formato for formato in VARIANTES if features.check(formato)]
+
+
+# Grava as versões WebP/AVIF das imagens grandes de `pasta` que ainda não
+# existem ou são mais velhas que o original. Uma variante que não ficar menor
+# que o original é descartada. Devolve {arquivo: [formatos gravados]}.
+def pre_codificar(pasta=PASTA_ASSETS, minimo=IMAGENS_MINIMO):
+    formatos = formatos_disponiveis()
+    gravados = {}
+    if not formatos:
+        return gravados
+    for nome in sorted(os.listdir(pasta)):
+        caminho = os.path.join(pasta, nome)
+        if not nome.lower().endswith(EXTENSOES_IMAGEM) or os.path.getsize(caminho) < minimo:
+            continue
+        for formato in formatos:
+            destino = _variante(caminho, formato)
+            if os.path.exists(destino) and os.path.getmtime(destino) >= os.path.getmtime(caminho):
+                continue
+            temporario = f"{destino}.tmp"
+            with Image.open(caminho) as imagem:
+                if imagem.mode not in ("RGB", "RGBA"):
+                    imagem = imagem.convert("RGBA" if "transparency" in imagem.info else "RGB")
+                imagem.save(temporario, format=formato.upper(), **VARIANTES[formato][1])
+            if os.path.getsize(temporario) < os.path.getsize(caminho):
+                os.replace(temporario, destino)
+                gravados.setdefault(nome, []).append(formato)
+            else:
+                os.remove(temporario)
+                if os.path.exists(destino):
+                    os.remove(destino)
+    return gravados
+
+
+# Variante da imagem pedida que o navegador aceita (Accept), se existir
+def _imagem_negociada(caminho):
+    aceitos = {tipo for tipo, qualidade in request.accept_mimetypes if qualidade > 0}
+    for formato, (tipo, _) in VARIANTES.items():
+        destino = _variante(caminho, formato)
+        if tipo in aceitos and os.path.isfile(destino):
+            return destino, tipo
+    return None, None
+
+
+def _tem_variantes(caminho):
+    return any(os.path.isfile(_variante(caminho, formato)) for formato in VARIANTES)
+
+
+def _caminho_asset(app):
+    prefixo = app.config.routes_pathname_prefix + app.config.assets_url_path.strip("/") + "/"
+    if not request.path.startswith(prefixo):
+        return None
+    nome = request.path[len(prefixo):]
+    pasta = os.path.abspath(app.config.assets_folder)
+    caminho = os.path.normpath(os.path.join(pasta, nome))
+    if not caminho.startswith(pasta + os.sep):
+        return None
+    return caminho
+
+
+def _comprimir(resposta):
+    if (
+        resposta.status_code != 200
+        or resposta.direct_passthrough
+        or resposta.is_streamed
+        or "Content-Encoding" in resposta.headers
+    ):
+        return resposta
+    resposta.vary.add("Accept-Encoding")
+    codificacao = request.accept_encodings.best_match(["br", "gzip"] if brotli is not None else ["gzip"])
+    dados = resposta.get_data()
+    if codificacao is None or len(dados) < COMPRIMIR_MINIMO:
+        return resposta
+    if codificacao == "br":
+        comprimido = brotli.compress(dados, quality=NIVEL_BROTLI)
+    else:
+        comprimido = gzip.compress(dados, compresslevel=NIVEL_GZIP, mtime=0)
+    resposta.set_data(comprimido)
+    resposta.headers["Content-Encoding"] = codificacao
+    with _lock:
+        contagem = _contagem[codificacao]
+        contagem["respostas"] += 1
+        contagem["original"] += len(dados)
+        contagem["enviado"] += len(comprimido)
+    return resposta
+
+
+# Liga a compressão das respostas JSON do Dash, o cache longo dos assets com
+# impressão digital e a troca das imagens por WebP/AVIF pré-codificados
+def instalar(app):
+    servidor = app.server
+
+    @servidor.before_request
+    def _imagem():
+        caminho = _caminho_asset(app)
+        if caminho is None or not caminho.lower().endswith(EXTENSOES_IMAGEM):
+            return None
+        destino, tipo = _imagem_negociada(caminho)
+        if destino is None:
+            return None
+        return send_file(destino, mimetype=tipo, conditional=True)
+
+    @servidor.after_request
+    def _cabecalhos(resposta):
+        if request.path.endswith(ROTAS_COMPRIMIDAS):
+            return _comprimir(resposta)
+        caminho = _caminho_asset(app)
+        if caminho is None:
+            return resposta
+        if caminho.lower().endswith(EXTENSOES_IMAGEM) and _tem_variantes(caminho):
+            resposta.vary.add("Accept")
+        if resposta.status_code in (200, 304):
+            if _digital_confere(caminho):
+                resposta.headers["Cache-Control"] = CACHE_IMUTAVEL
+            else:
+                # Sem impressão digital válida o navegador revalida (ETag) a cada uso
+                resposta.headers["Cache-Control"] = "no-cache"
+        return resposta
+
+
+@metricas.registrar_coletor
+def _metricas():
+    with _lock:
+        contagem = {chave: dict(valor) for chave, valor in _contagem.items()}
+    linhas = []
+    for nome, campo, ajuda in (
+        ("bi_compressao_respostas_total", "respostas", "Respostas comprimidas por codificação."),
+        ("bi_compressao_original_bytes_total", "original", "Bytes das respostas antes da compressão."),
+        ("bi_compressao_enviado_bytes_total", "enviado", "Bytes das respostas depois da compressão."),
+    ):
+        linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} counter"]
+        for codificacao, valor in sorted(contagem.items()):
+            linhas.append(f'{nome}{{codificacao="{codificacao}"}} {valor[campo]}')
+    return linhas
+
+
+# Passo de build: python estaticos.py [pasta]
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    if not formatos_disponiveis():
+        sys.exit("Pillow com suporte a WebP/AVIF não está instalado")
+    for arquivo, formatos in pre_codificar(*sys.argv[1:2]).items():
+        logger.info("%s: %s", arquivo, ", ".join(formatos))
@@ -0,0 +1,291 @@
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import defaultdict
+from datetime import date
+from urllib.parse import urlencode
+
+import pandas as pd
+from dash import html
+from dash.dependencies import Input, Output
+from flask import Response, abort, request
+
+from app_instance import app
+import metricas
+import modo_cliente
+import tabelas
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # sem pyarrow não há exportação em Parquet
+    pq = None
+
+try:
+    import openpyxl
+except ImportError:  # sem openpyxl não há exportação em XLSX
+    openpyxl = None
+
+logger = logging.getLogger(__name__)
+
+# Exportação do resultado filtrado de cada página em /exportar/<pagina>.<formato>.
+# Os dados saem em blocos de TAMANHO_BLOCO linhas, cada um serializado e
+# enviado antes de o próximo ser lido: o arquivo inteiro nunca fica na memória
+# e o download começa antes de a serialização terminar.
+TAMANHO_BLOCO = int(os.environ.get("BI_EXPORTAR_BLOCO", "5000"))
+
+# Pedaços em que o XLSX (montado num arquivo temporário) é lido e enviado
+TAMANHO_LEITURA = 64 * 1024
+
+NOMES_FORMATOS = {"csv": "CSV", "xlsx": "Excel", "parquet": "Parquet"}
+TIPOS_MIME = {
+    # O Flask acrescenta o charset (utf-8) aos tipos text/*
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Páginas exportáveis: nome -> função(args, tamanho) que devolve os blocos
+_exportadores = {}
+_lock = threading.Lock()
+_contagem = defaultdict(lambda: {"exportacoes": 0, "linhas": 0, "bytes": 0})
+
+
+# Registra a exportação de uma página. `funcao(args, tamanho)` recebe os
+# parâmetros da URL (ver href), escolhe o snapshot na hora e devolve um
+# gerador de DataFrames de até `tamanho` linhas, todos com as mesmas colunas e
+# tipos, e ao menos um (mesmo que vazio).
+def registrar(pagina, funcao):
+    _exportadores[pagina] = funcao
+    return funcao
+
+
+# Formatos disponíveis com as dependências instaladas
+FORMATOS = [f for f, disponivel in (("csv", True), ("xlsx", openpyxl), ("parquet", pq)) if disponivel]
+
+
+# URL de exportação com os filtros laterais ({coluna: [valores]}) e a
+# ordenação e o filtro do DataTable, como o callback da página recebe
+def href(pagina, formato, filtros=None, sort_by=None, filter_query=None):
+    parametros = []
+    for coluna, valores in (filtros or {}).items():
+        if valores is None or valores == []:
+            continue
+        for valor in valores if isinstance(valores, (list, tuple)) else [valores]:
+            parametros.append((coluna, valor))
+    for s in sort_by or []:
+        parametros.append(("ordem", f"{s['column_id']}:{s['direction']}"))
+    if filter_query:
+        parametros.append(("filtro", filter_query))
+    consulta = urlencode(parametros)
+    return f"/exportar/{pagina}.{formato}" + (f"?{consulta}" if consulta else "")
+
+
+def hrefs(pagina, filtros=None, sort_by=None, filter_query=None):
+    return [href(pagina, formato, filtros, sort_by, filter_query) for formato in FORMATOS]
+
+
+# Parâmetros de href de volta: lista de valores de uma coluna (None se não
+# filtrada), ordenação e filtro do DataTable
+def valores(args, coluna, tipo=str):
+    lista = args.getlist(coluna)
+    if not lista:
+        return None
+    try:
+        return [tipo(v) for v in lista]
+    except ValueError:
+        abort(400)
+
+
+def ordem(args):
+    sort_by = []
+    for item in args.getlist("ordem"):
+        coluna, _, direcao = item.rpartition(":")
+        if coluna and direcao in ("asc", "desc"):
+            sort_by.append({"column_id": coluna, "direction": direcao})
+    return sort_by
+
+
+def filtro(args):
+    return args.get("filtro", "")
+
+
+# Blocos de um DataFrame já filtrado pelos filtros laterais, depois do filtro
+# e da ordenação do DataTable (mesma regra de tabelas.pagina)
+def blocos(dff, tamanho, sort_by=None, filter_query=None):
+    dff = tabelas.ordenar(tabelas.filtrar(dff, filter_query), sort_by)
+    metricas.contar_linhas(len(dff))
+    yield dff.iloc[:tamanho]
+    for inicio in range(tamanho, len(dff), tamanho):
+        yield dff.iloc[inicio:inicio + tamanho]
+
+
+# Links de exportação da página; o href de cada um é atualizado pelo callback
+# dos filtros (ver saidas)
+def links(pagina):
+    return html.Div([
+        html.Span("Exportar:", className="text-light small me-2"),
+        *[
+            html.A(NOMES_FORMATOS[formato], id=f"exportar-{pagina}-{formato}", href=href(pagina, formato),
+                   className="btn btn-sm btn-outline-info me-2")
+            for formato in FORMATOS
+        ],
+    ], className="mb-2 text-end")
+
+
+# Callback que mantém os links de links(pagina) com os filtros da página:
+# `filtros` é {nome do parâmetro: Input} e `tabela` o id do DataTable, cuja
+# ordenação e filtro também vão na URL. No modo cliente a URL é montada no
+# navegador (assets/modo_cliente.js), sem ir ao servidor.
+def atualizar_links(pagina, filtros, tabela=None):
+    nomes = list(filtros)
+    entradas = list(filtros.values())
+    if tabela:
+        entradas += [Input(tabela, "sort_by"), Input(tabela, "filter_query")]
+    saidas = [Output(f"exportar-{pagina}-{formato}", "href") for formato in FORMATOS]
+
+    if modo_cliente.ATIVO:
+        app.clientside_callback(
+            "function () { return window.dash_clientside.bi.exportar("
+            f"{json.dumps(pagina)}, {json.dumps(FORMATOS)}, {json.dumps(nomes)}, {json.dumps(bool(tabela))}, arguments); }}",
+            *saidas, *entradas,
+        )
+        return
+
+    def links_exportacao(*valores):
+        sort_by, filter_query = valores[len(nomes):] if tabela else (None, None)
+        return hrefs(pagina, dict(zip(nomes, valores)), sort_by, filter_query)
+
+    links_exportacao.__name__ = f"links_exportacao_{pagina}"
+    app.callback(*saidas, *entradas)(links_exportacao)
+
+
+def _csv(blocos):
+    primeiro = True
+    for bloco in blocos:
+        # Separadores do Excel em português; BOM para o acento sair certo
+        texto = bloco.to_csv(sep=";", decimal=",", index=False, header=primeiro)
+        yield texto.encode("utf-8-sig" if primeiro else "utf-8")
+        primeiro = False
+
+
+def _celula(valor):
+    if valor is None or valor is pd.NaT or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.to_pydatetime()
+    return valor.item() if hasattr(valor, "item") else valor
+
+
+def _xlsx(blocos):
+    # O XLSX é um zip e só fecha no fim: as linhas vão para um arquivo
+    # temporário (write_only não guarda a planilha na memória), que é enviado
+    # em pedaços e apagado em seguida
+    livro = openpyxl.Workbook(write_only=True)
+    folha = livro.create_sheet("Dados")
+    primeiro = True
+    for bloco in blocos:
+        if primeiro:
+            folha.append([str(c) for c in bloco.columns])
+            primeiro = False
+        for linha in bloco.itertuples(index=False, name=None):
+            folha.append([_celula(v) for v in linha])
+    with tempfile.TemporaryFile(suffix=".xlsx") as arquivo:
+        livro.save(arquivo)
+        arquivo.seek(0)
+        while True:
+            pedaco = arquivo.read(TAMANHO_LEITURA)
+            if not pedaco:
+                return
+            yield pedaco
+
+
+def _parquet(blocos):
+    # Um row group por bloco; o que o escritor produz é enviado a cada bloco
+    saida = io.BytesIO()
+    escritor = esquema = None
+    try:
+        for bloco in blocos:
+            tabela = pa.Table.from_pandas(bloco, schema=esquema, preserve_index=False)
+            if escritor is None:
+                esquema = tabela.schema
+                escritor = pq.ParquetWriter(saida, esquema)
+            escritor.write_table(tabela)
+            yield _esvaziar(saida)
+        escritor.close()
+        escritor = None
+        yield _esvaziar(saida)
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+def _esvaziar(saida):
+    dados = saida.getvalue()
+    saida.seek(0)
+    saida.truncate()
+    return dados
+
+
+SERIALIZADORES = {"csv": _csv, "xlsx": _xlsx, "parquet": _parquet}
+
+
+def _contar(pagina, formato, blocos):
+    linhas = 0
+    for bloco in blocos:
+        linhas += len(bloco)
+        yield bloco
+    with _lock:
+        _contagem[(pagina, formato)]["exportacoes"] += 1
+        _contagem[(pagina, formato)]["linhas"] += linhas
+
+
+def _enviar(pagina, formato, pedacos):
+    total = 0
+    try:
+        for pedaco in pedacos:
+            if pedaco:
+                total += len(pedaco)
+                yield pedaco
+    except Exception:
+        # Os cabeçalhos já foram enviados: só resta registrar e cortar o download
+        logger.exception("Falha ao exportar %s.%s", pagina, formato)
+        raise
+    finally:
+        with _lock:
+            _contagem[(pagina, formato)]["bytes"] += total
+
+
+@app.server.route("/exportar/<pagina>.<formato>")
+def _rota_exportar(pagina, formato):
+    funcao = _exportadores.get(pagina)
+    if funcao is None or formato not in FORMATOS:
+        abort(404)
+    # Filtros lidos e snapshot escolhido aqui; a consulta e a serialização
+    # acontecem enquanto a resposta é enviada
+    blocos_pagina = _contar(pagina, formato, funcao(request.args, TAMANHO_BLOCO))
+    nome = f"{pagina}-{date.today().isoformat()}.{formato}"
+    return Response(
+        _enviar(pagina, formato, SERIALIZADORES[formato](blocos_pagina)),
+        mimetype=TIPOS_MIME[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nome}"', "X-Accel-Buffering": "no"},
+    )
+
+
+@metricas.registrar_coletor
+def _metricas():
+    with _lock:
+        contagem = {chave: dict(valor) for chave, valor in _contagem.items()}
+    linhas = []
+    for nome, campo, ajuda in (
+        ("bi_exportacoes_total", "exportacoes", "Exportações concluídas por página e formato."),
+        ("bi_exportacao_linhas_total", "linhas", "Linhas exportadas por página e formato."),
+        ("bi_exportacao_bytes_total", "bytes", "Bytes enviados nas exportações por página e formato."),
+    ):
+        linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} counter"]
+        for (pagina, formato), valor in sorted(contagem.items()):
+            linhas.append(f'{nome}{{pagina="{pagina}",formato="{formato}"}} {valor[campo]}')
+    return linhas
@@ -0,0 +1,96 @@
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+from dash import Patch
+
+try:
+    import orjson
+except ImportError:  # sem orjson as respostas saem pelo json da biblioteca padrão
+    orjson = None
+
+# Tema escuro dos gráficos das páginas. Vai registrado como template "bi"
+# (o "plotly" com estas cores e margens) e fica como padrão: as figuras não
+# repetem o update_layout. O modo cliente usa o dicionário no navegador.
+TEMA = {
+    "plot_bgcolor": "rgba(0,0,0,0)",
+    "paper_bgcolor": "rgba(0,0,0,0)",
+    "font": {"color": "#C2E0E7", "size": 12},
+    "title": {"font": {"size": 16}, "x": 0.5},
+    "margin": {"l": 20, "r": 20, "t": 50, "b": 20},
+}
+
+CORES_BARRAS = px.colors.sequential.Oranges
+CORES_PIZZA = ["#FFA726", "#FB8C00", "#F57C00", "#EF6C00", "#E65100"]
+
+pio.templates["bi"] = go.layout.Template(pio.templates["plotly"])
+pio.templates["bi"].layout.update(TEMA)
+pio.templates.default = "bi"
+
+# Template já como JSON, para as figuras montadas a cada callback (ver figura)
+TEMPLATE = pio.templates["bi"].to_plotly_json()
+
+# Respostas dos callbacks serializadas com orjson (o Dash usa o serializador
+# do plotly); figuras feitas só de dicts, listas e números passam direto
+if orjson is not None:
+    pio.json.config.default_engine = "orjson"
+
+
+# Figura montada a cada callback: dicionário pronto para o JSON, sem os
+# objetos do plotly.graph_objects, que validam cada propriedade (o que o
+# plotly.express ainda soma à inspeção do DataFrame). Traces são dicts com
+# "type" e o layout usa os nomes aninhados ({"title": {"text": ...}}).
+def figura(traces, **layout):
+    return {"data": traces, "layout": dict(layout, template=TEMPLATE)}
+
+
+# Esqueleto: figura completa (tema, título, eixos, estilo do trace) com um
+# único trace sem dados. Vai uma vez no layout da página; a cada filtro os
+# callbacks mandam só os dados do trace, como Patch (ver atualizar).
+def _esqueleto(trace, titulo, **layout):
+    fig = go.Figure(trace)
+    fig.update_layout(title_text=titulo, **layout)
+    return fig
+
+
+def esqueleto_barras(titulo, x, y, texto=False, cor=None, **layout):
+    trace = go.Bar(
+        x=[], y=[], showlegend=False,
+        hovertemplate=f"{x}=%{{x}}<br>{y}=%{{y}}<extra></extra>",
+        texttemplate="%{y}" if texto else None,
+        marker_color=cor,
+    )
+    return _esqueleto(trace, titulo, xaxis_title_text=x, yaxis_title_text=y, **layout)
+
+
+def esqueleto_pizza(titulo, nomes, valores, cores=CORES_PIZZA):
+    trace = go.Pie(
+        labels=[], values=[], hole=0.5,
+        hovertemplate=f"{nomes}=%{{label}}<br>{valores}=%{{value}}<extra></extra>",
+    )
+    return _esqueleto(trace, titulo, piecolorway=cores)
+
+
+# Dados do trace de barras a partir de um agregado (agregacao.contar/somar).
+# Com `cores`, cada barra ganha uma cor da sequência, como o px.bar(color=...)
+def dados_barras(agregado, x, y, cores=None):
+    dados = {"x": agregado[x].astype(str).tolist(), "y": agregado[y].tolist()}
+    if cores:
+        dados["marker.color"] = [cores[i % len(cores)] for i in range(len(agregado))]
+    return dados
+
+
+def dados_pizza(agregado, nomes, valores):
+    return {"labels": agregado[nomes].astype(str).tolist(), "values": agregado[valores].tolist()}
+
+
+# Patch que troca só os dados do trace do esqueleto; chaves com ponto
+# ("marker.color") são caminhos dentro do trace
+def atualizar(dados):
+    patch = Patch()
+    for chave, valor in dados.items():
+        *caminho, ultimo = chave.split(".")
+        alvo = patch["data"][0]
+        for parte in caminho:
+            alvo = alvo[parte]
+        alvo[ultimo] = valor
+    return patch
@@ -0,0 +1,19 @@
+# Configuração do gunicorn para wsgi.py (gunicorn -c gunicorn.conf.py wsgi:server)
+import multiprocessing
+import os
+
+bind = os.environ.get("BI_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("BI_WORKERS", multiprocessing.cpu_count()))
+# Mais de uma thread por worker usa o worker "gthread"
+threads = int(os.environ.get("BI_THREADS", "4"))
+timeout = int(os.environ.get("BI_TIMEOUT", "120"))
+
+# Importa o app no mestre; os workers herdam planilhas e páginas já montadas
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Threads do mestre não passam para o worker: cada um monitora as planilhas
+    # e, quando mudam, recarrega a partir do cache compartilhado em /dev/shm
+    import dados
+    dados.iniciar_monitoramento()
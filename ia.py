@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+
+from dash import html, dcc, dash_table
+import dash_bootstrap_components as dbc
+from dash.dependencies import Input, Output, State
+from app_instance import app
+import agregacao
+import banco
+import busca
+import dados
+import metricas
+
+# Páginas que registram as planilhas indexadas aqui
+import BI_processos
+import BI_projetos
+import ambiental
+
+logger = logging.getLogger(__name__)
+
+# Colunas de texto livre indexadas em cada planilha. Em processos,
+# "Atividades mapeadas" é a quantidade de atividades (número), então o texto
+# vem dos nomes dos setores e das etapas.
+FONTES = {
+    "processos": ["Setores mapeados", "Etapa / Entrega"],
+    "projetos": ["Nome do Projeto"],
+    "ambiental": ["Atividades"],
+}
+NOMES_FONTES = {"processos": "Processos", "projetos": "Projetos", "ambiental": "Ambiental"}
+
+LIMITE_RESULTADOS = 50
+LIMITE_SIMILARES = 10
+
+# Um documento por texto distinto de cada coluna (com a quantidade de linhas
+# em que aparece). Só a planilha recarregada é sincronizada, e só os textos
+# novos ou removidos mexem no índice.
+INDICE = busca.IndiceTexto()
+_versoes = {}
+_lock = threading.Lock()
+
+
+def _documentos(snap, colunas):
+    documentos = {}
+    for coluna in colunas:
+        if banco.ATIVO:
+            if coluna not in snap.tabela.colunas:
+                continue
+            contagem = banco.contar(snap.tabela, coluna, {}, limite=None)
+        else:
+            if coluna not in snap.df.columns:
+                continue
+            contagem = agregacao.contar(snap.df, coluna, limite=None)
+        for texto, linhas in contagem.itertuples(index=False):
+            texto = str(texto).strip()
+            if not texto:
+                continue
+            chave = (coluna, texto)
+            anterior = documentos.get(chave, (texto, {"linhas": 0}))[1]["linhas"]
+            documentos[chave] = (texto, {"fonte": snap.fonte, "coluna": coluna, "linhas": anterior + int(linhas)})
+    return documentos
+
+
+def _sincronizar(snap):
+    with _lock:
+        if _versoes.get(snap.fonte) == snap.versao:
+            return
+        inicio = time.perf_counter()
+        adicionados, removidos = INDICE.sincronizar(snap.fonte, _documentos(snap, FONTES[snap.fonte]))
+        _versoes[snap.fonte] = snap.versao
+        logger.info("Índice de busca: %s versão %s (+%d -%d textos) em %.0f ms", snap.fonte,
+                    snap.versao, adicionados, removidos, (time.perf_counter() - inicio) * 1000)
+
+
+def atualizar_indice():
+    for fonte in FONTES:
+        _sincronizar(dados.snapshot(fonte))
+
+
+# Planilha recarregada: sincroniza só ela, se o índice já foi montado
+@dados.ao_recarregar
+def _ao_recarregar(snap):
+    if snap.fonte in _versoes:
+        _sincronizar(snap)
+
+
+def _linha(resultado, coluna_pontos):
+    return {
+        "id": resultado["id"],
+        "Fonte": NOMES_FONTES[resultado["fonte"]],
+        "Campo": resultado["coluna"],
+        "Texto": resultado["texto"],
+        "Linhas": resultado["linhas"],
+        coluna_pontos: round(resultado["pontos"], 2),
+    }
+
+
+def _tabela(id_tabela, coluna_pontos):
+    return dash_table.DataTable(
+        id=id_tabela,
+        columns=[{"name": c, "id": c} for c in ("Fonte", "Campo", "Texto", "Linhas", coluna_pontos)],
+        data=[],
+        page_size=15,
+        style_table={'overflowX': 'auto'},
+        style_cell={'textAlign': 'left', 'backgroundColor': '#192A35', 'color': '#C2E0E7', 'whiteSpace': 'normal', 'height': 'auto'},
+        style_header={'fontWeight': 'bold', 'backgroundColor': '#263640', 'color': '#C2E0E7'},
+    )
+
+
+CARTAO = {
+    "backgroundColor": "#192A35",
+    "borderRadius": "15px",
+    "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
+    "padding": "10px",
+    "marginBottom": "20px"
+}
+
+
+# Layout da página (montar o layout garante o índice na versão atual dos dados)
+def layout():
+    atualizar_indice()
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col(html.H2("B.I PPGC - ANÁLISE IA", className="text-center fw-bold text-light mb-4"))
+        ]),
+
+        dbc.Row([
+            # Filtros laterais
+            dbc.Col([
+                html.Div([
+                    html.Label("Planilhas", className="fw-bold text-light"),
+                    dcc.Dropdown(
+                        options=[{"label": NOMES_FONTES[f], "value": f} for f in FONTES],
+                        id="fontes-ia", placeholder="Todas", multi=True, className="mb-3"
+                    ),
+                ], style={"backgroundColor": "#0E1A21", "padding": "20px", "borderRadius": "10px"})
+            ], width=2),
+
+            # Busca, resultados e itens semelhantes ao resultado selecionado
+            dbc.Col([
+                dbc.Card([
+                    dcc.Input(
+                        id="busca-ia", type="search", debounce=0.3, className="form-control mb-2",
+                        placeholder="Buscar setores, etapas, projetos e atividades..."
+                    ),
+                    html.Div(id="info-busca-ia", className="text-light small mb-2"),
+                    _tabela("resultados-ia", "Relevância"),
+                ], style=CARTAO),
+
+                html.H4("Itens semelhantes", className="text-light fw-bold mb-3"),
+                dbc.Card(_tabela("similares-ia", "Semelhança"), style=CARTAO),
+            ], width=10)
+        ])
+    ], fluid=True, style={"backgroundColor": "#121E26", "minHeight": "100vh", "padding": "20px"})
+
+
+# CALLBACKS
+@app.callback(
+    Output("resultados-ia", "data"),
+    Output("info-busca-ia", "children"),
+    Input("busca-ia", "value"),
+    Input("fontes-ia", "value")
+)
+def pesquisar(consulta, fontes):
+    atualizar_indice()
+    inicio = time.perf_counter()
+    resultados = INDICE.buscar(consulta or "", LIMITE_RESULTADOS, set(fontes or ()))
+    ms = (time.perf_counter() - inicio) * 1000
+    total = INDICE.estatisticas()["documentos"]
+    if not consulta:
+        return [], f"{total} textos indexados"
+    return [_linha(r, "Relevância") for r in resultados], f"{len(resultados)} resultados em {ms:.1f} ms ({total} textos indexados)"
+
+
+@app.callback(
+    Output("similares-ia", "data"),
+    Input("resultados-ia", "active_cell"),
+    State("fontes-ia", "value")
+)
+def semelhantes(celula, fontes):
+    if not celula or celula.get("row_id") is None:
+        return []
+    return [_linha(r, "Semelhança") for r in INDICE.similares(celula["row_id"], LIMITE_SIMILARES, set(fontes or ()))]
+
+
+@metricas.registrar_coletor
+def _metricas():
+    est = INDICE.estatisticas()
+    return [
+        "# HELP bi_busca_documentos Textos no índice de busca da página Análise IA.",
+        "# TYPE bi_busca_documentos gauge",
+        f"bi_busca_documentos {est['documentos']}",
+        "# HELP bi_busca_termos Termos distintos no índice de busca.",
+        "# TYPE bi_busca_termos gauge",
+        f"bi_busca_termos {est['termos']}",
+    ]
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+import metricas
+
+_VAZIO = np.empty(0, dtype=np.intp)
+
+
+# Índice de filtro: para cada coluna filtrável, as posições (ordenadas) das
+# linhas de cada valor. É construído uma vez por versão dos dados.
+def construir_indice(df, colunas):
+    indice = {}
+    for coluna in colunas:
+        serie = df[coluna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # Colunas categóricas já trazem os códigos; não é preciso fatorar
+            codigos, valores = serie.cat.codes.to_numpy(), serie.cat.categories
+        else:
+            codigos, valores = pd.factorize(serie)  # NaN fica com código -1
+        ordem = np.argsort(codigos, kind="stable")
+        limites = np.searchsorted(codigos[ordem], np.arange(len(valores) + 1))
+        indice[coluna] = {
+            valor: ordem[limites[i]:limites[i + 1]] for i, valor in enumerate(valores)
+        }
+    return indice
+
+
+# Posições das linhas que passam em todos os filtros ({coluna: valores}).
+# Dentro de uma coluna os valores selecionados se somam (união); entre colunas
+# vale a interseção. Devolve None quando nenhum filtro está ativo.
+def posicoes(indice, filtros):
+    resultado = None
+    for coluna, selecionados in filtros.items():
+        if not selecionados:
+            continue
+        partes = [indice[coluna].get(valor, _VAZIO) for valor in set(selecionados)]
+        # Cada linha tem um único valor na coluna, então a união não repete posições
+        uniao = np.sort(np.concatenate(partes))
+        if resultado is None:
+            resultado = uniao
+        else:
+            resultado = np.intersect1d(resultado, uniao, assume_unique=True)
+    return resultado
+
+
+# Aplica os filtros com um único `take`. Sem filtros devolve o próprio df do
+# snapshot (sem cópia), que não deve ser alterado por quem chama.
+@metricas.fase("filtro")
+def filtrar(df, indice, filtros):
+    pos = posicoes(indice, filtros)
+    resultado = df if pos is None else df.take(pos)
+    metricas.contar_linhas(len(resultado))
+    return resultado
@@ -0,0 +1,248 @@
+import contextlib
+import cProfile
+import functools
+import os
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, g, has_request_context, request
+
+import dados
+
+# Perfil cProfile por requisição: "0" desliga, "1" perfila toda chamada de
+# callback e "header" só as requisições com o cabeçalho X-Profile: 1. Os
+# perfis vão para BI_PROFILE_DIR; por padrão, junto do cache (BI_CACHE_DIR).
+PERFIL = os.environ.get("BI_PROFILE", "0")
+PASTA_PERFIS = os.environ.get("BI_PROFILE_DIR") or os.path.join(dados.CACHE_DIR, "perfis")
+
+# Limites (s) do histograma de tempo dos callbacks
+BALDES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_local = threading.local()
+_coletores = []
+
+
+def _novo_registro():
+    return {
+        "chamadas": 0,
+        "erros": 0,
+        "segundos": 0.0,
+        "baldes": [0] * len(BALDES),
+        "fases": defaultdict(float),
+        "linhas": 0,
+        "requisicoes": 0,
+        "requisicao_segundos": 0.0,
+        "segundos_requisicoes": 0.0,
+        "resposta_bytes": 0,
+    }
+
+
+_registros = defaultdict(_novo_registro)
+
+
+class fase(contextlib.ContextDecorator):
+    # Marca um trecho de um callback (ex.: "filtro", "figuras", "tabela").
+    # Fases aninhadas contam tempo exclusivo: o tempo do trecho interno não
+    # entra no trecho de fora.
+    def __init__(self, nome):
+        self.nome = nome
+
+    def __enter__(self):
+        pilha = getattr(_local, "pilha", None)
+        if pilha is None:
+            return self
+        pilha.append([self.nome, time.perf_counter(), 0.0])
+        return self
+
+    def __exit__(self, *exc):
+        pilha = getattr(_local, "pilha", None)
+        if not pilha:
+            return False
+        nome, inicio, filhos = pilha.pop()
+        duracao = time.perf_counter() - inicio
+        _local.fases[nome] += duracao - filhos
+        if pilha:
+            pilha[-1][2] += duracao
+        return False
+
+
+def contar_linhas(n):
+    # Linhas processadas pelo callback em andamento (ex.: resultado do filtro)
+    if getattr(_local, "pilha", None) is not None:
+        _local.linhas += n
+
+
+# Soma ao registro de `nome` uma chamada medida (segundos, erro, fases, linhas)
+def somar(nome, medicao):
+    segundos = medicao["segundos"]
+    with _lock:
+        registro = _registros[nome]
+        registro["chamadas"] += 1
+        registro["erros"] += medicao["erro"]
+        registro["segundos"] += segundos
+        for i, limite in enumerate(BALDES):
+            if segundos <= limite:
+                registro["baldes"][i] += 1
+        for f, s in medicao["fases"].items():
+            registro["fases"][f] += s
+        registro["linhas"] += medicao["linhas"]
+
+
+# Destino das medições deste processo: por padrão, o próprio registro. Um
+# processo de segundo plano (ver segundo_plano.py) troca por uma função que
+# as entrega ao worker que atende o /metrics.
+_destino = somar
+
+
+def redirecionar(destino):
+    global _destino
+    _destino = destino
+
+
+# Medição de um callback que rodou em outro processo: soma ao registro e
+# atribui ao callback a requisição que entrega o resultado, sem tempo de
+# callback (ele correu fora desta requisição)
+def receber(nome, medicao):
+    somar(nome, medicao)
+    if has_request_context():
+        g.bi_callback = nome
+        g.bi_callback_segundos = 0.0
+
+
+def _medir(nome, funcao):
+    @functools.wraps(funcao)
+    def medida(*args, **kwargs):
+        _local.pilha, _local.fases, _local.linhas = [], defaultdict(float), 0
+        inicio = time.perf_counter()
+        erro = False
+        try:
+            return funcao(*args, **kwargs)
+        except Exception:
+            erro = True
+            raise
+        finally:
+            segundos = time.perf_counter() - inicio
+            fases, linhas = _local.fases, _local.linhas
+            _local.pilha = None
+            _destino(nome, {"segundos": segundos, "erro": erro, "fases": dict(fases), "linhas": linhas})
+            if has_request_context():
+                g.bi_callback = nome
+                g.bi_callback_segundos = segundos
+    return medida
+
+
+# Funções que devolvem linhas extras no formato Prometheus para o /metrics
+def registrar_coletor(funcao):
+    _coletores.append(funcao)
+    return funcao
+
+
+def _rotulo(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def texto_prometheus():
+    linhas = []
+    with _lock:
+        registros = {nome: dict(r, fases=dict(r["fases"]), baldes=list(r["baldes"])) for nome, r in _registros.items()}
+
+    linhas += [
+        "# HELP bi_callback_segundos Tempo de execução dos callbacks.",
+        "# TYPE bi_callback_segundos histogram",
+    ]
+    for nome, r in sorted(registros.items()):
+        cb = _rotulo(nome)
+        for limite, qtd in zip(BALDES, r["baldes"]):
+            linhas.append(f'bi_callback_segundos_bucket{{callback="{cb}",le="{limite}"}} {qtd}')
+        linhas.append(f'bi_callback_segundos_bucket{{callback="{cb}",le="+Inf"}} {r["chamadas"]}')
+        linhas.append(f'bi_callback_segundos_sum{{callback="{cb}"}} {r["segundos"]:.6f}')
+        linhas.append(f'bi_callback_segundos_count{{callback="{cb}"}} {r["chamadas"]}')
+
+    linhas += [
+        "# HELP bi_callback_fase_segundos_total Tempo exclusivo por fase (filtro, tabela, figuras, serializacao).",
+        "# TYPE bi_callback_fase_segundos_total counter",
+    ]
+    for nome, r in sorted(registros.items()):
+        fases = dict(r["fases"])
+        if r["requisicoes"]:
+            # Serialização e despacho do Dash: tempo da requisição fora do callback
+            fases["serializacao"] = max(0.0, r["requisicao_segundos"] - r["segundos_requisicoes"])
+        for f, s in sorted(fases.items()):
+            linhas.append(f'bi_callback_fase_segundos_total{{callback="{_rotulo(nome)}",fase="{_rotulo(f)}"}} {s:.6f}')
+
+    contadores = (
+        ("bi_callback_erros_total", "erros", "Callbacks que terminaram com exceção."),
+        ("bi_callback_linhas_total", "linhas", "Linhas processadas pelos callbacks (resultado dos filtros)."),
+        ("bi_callback_resposta_bytes_total", "resposta_bytes", "Bytes das respostas de _dash-update-component."),
+        ("bi_callback_requisicoes_total", "requisicoes", "Requisições HTTP atendidas por callback."),
+    )
+    for metrica, campo, ajuda in contadores:
+        linhas += [f"# HELP {metrica} {ajuda}", f"# TYPE {metrica} counter"]
+        for nome, r in sorted(registros.items()):
+            linhas.append(f'{metrica}{{callback="{_rotulo(nome)}"}} {r[campo]}')
+
+    for coletor in _coletores:
+        linhas += coletor()
+    return "\n".join(linhas) + "\n"
+
+
+def _perfilar():
+    if PERFIL == "1":
+        return True
+    return PERFIL == "header" and request.headers.get("X-Profile") == "1"
+
+
+def _antes():
+    if request.path.endswith("_dash-update-component"):
+        g.bi_inicio = time.perf_counter()
+        if _perfilar():
+            g.bi_perfil = cProfile.Profile()
+            g.bi_perfil.enable()
+
+
+def _depois(resposta):
+    inicio = g.pop("bi_inicio", None)
+    if inicio is None:
+        return resposta
+    total = time.perf_counter() - inicio
+    perfil = g.pop("bi_perfil", None)
+    if perfil is not None:
+        perfil.disable()
+    nome = g.get("bi_callback")
+    if nome is None:
+        return resposta
+    with _lock:
+        registro = _registros[nome]
+        registro["requisicoes"] += 1
+        registro["requisicao_segundos"] += total
+        registro["segundos_requisicoes"] += g.get("bi_callback_segundos", 0.0)
+        if not resposta.direct_passthrough:
+            registro["resposta_bytes"] += resposta.calculate_content_length() or 0
+    if perfil is not None:
+        os.makedirs(PASTA_PERFIS, exist_ok=True)
+        perfil.dump_stats(os.path.join(PASTA_PERFIS, f"{nome}-{time.time_ns()}.prof"))
+    return resposta
+
+
+# Passa a medir todo callback registrado com app.callback e publica /metrics
+# no servidor Flask. Deve ser chamado antes de as páginas registrarem callbacks.
+def instrumentar(app):
+    registrar = app.callback
+
+    @functools.wraps(registrar)
+    def callback(*args, **kwargs):
+        decorador = registrar(*args, **kwargs)
+
+        def instrumentado(funcao):
+            return decorador(_medir(funcao.__name__, funcao))
+        return instrumentado
+
+    app.callback = callback
+    app.server.before_request(_antes)
+    app.server.after_request(_depois)
+    app.server.add_url_rule(
+        "/metrics", "metricas",
+        lambda: Response(texto_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8"),
+    )
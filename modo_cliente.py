@@ -0,0 +1,40 @@
+import os
+
+import pandas as pd
+
+import agregacao
+import graficos
+
+# Modo cliente: cada página leva um retrato compacto dos dados num dcc.Store e
+# filtros, agregações e gráficos rodam em callbacks no navegador
+# (assets/modo_cliente.js). O servidor só é chamado ao montar a página.
+ATIVO = os.environ.get("BI_MODO_CLIENTE", "0") == "1"
+
+
+# Colunas de texto viram códigos inteiros + dicionário de valores; colunas
+# numéricas vão como lista de valores (NaN vira null)
+def compactar(snap, colunas):
+    df = snap.df
+    saida = {
+        "versao": snap.versao,
+        "linhas": len(df),
+        "tema": graficos.TEMA,
+        "cores": graficos.CORES_BARRAS,
+        "limite": agregacao.LIMITE_CATEGORIAS,
+        "outros": agregacao.OUTROS,
+        "colunas": {},
+    }
+    for coluna in colunas:
+        serie = df[coluna]
+        if pd.api.types.is_numeric_dtype(serie):
+            saida["colunas"][coluna] = {
+                "valores": [None if pd.isna(v) else v for v in serie.tolist()]
+            }
+        else:
+            codigos, dicionario = pd.factorize(serie)
+            saida["colunas"][coluna] = {
+                "codigos": codigos.tolist(),
+                # Datas no mesmo formato ISO que o Dash usa no modo servidor
+                "dicionario": [v.isoformat() if isinstance(v, pd.Timestamp) else str(v) for v in dicionario],
+            }
+    return saida
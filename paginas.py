@@ -0,0 +1,132 @@
+import importlib
+import logging
+import os
+import threading
+import time
+
+from flask import jsonify
+
+from app_instance import app
+import dados
+import metricas
+
+logger = logging.getLogger(__name__)
+
+# Rotas do menu e o módulo de cada página. O módulo é importado na partida só
+# para declarar os callbacks (o Dash precisa conhecer todos quando o navegador
+# abre o app); planilhas e layout são montados no primeiro acesso à rota.
+PAGINAS = {
+    "/projetos": "BI_projetos",
+    "/processos": "BI_processos",
+    "/ambiental": "ambiental",
+    "/ia": "ia",
+    "/planejamento": "planejamento",
+}
+
+# Monta as páginas em segundo plano logo após a partida ("0" desliga)
+PREAQUECER = os.environ.get("BI_PREAQUECER", "1") != "0"
+
+_modulos = {}
+_locks = {rota: threading.Lock() for rota in PAGINAS}
+_relatorio = {}
+
+
+def _memoria_residente():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().rss
+
+
+def registrar_callbacks():
+    for rota, nome in PAGINAS.items():
+        _modulos[rota] = importlib.import_module(nome)
+
+
+def _materializar(rota, origem):
+    # Primeiro layout da página: lê a planilha, prepara o snapshot e mede o
+    # custo. Com acessos simultâneos a memória medida é aproximada.
+    with _locks[rota]:
+        if rota in _relatorio:
+            return None
+        memoria = _memoria_residente()
+        inicio = time.perf_counter()
+        pagina = _modulos[rota].layout()
+        segundos = time.perf_counter() - inicio
+        depois = _memoria_residente()
+        _relatorio[rota] = {
+            "modulo": PAGINAS[rota],
+            "origem": origem,
+            "segundos": round(segundos, 4),
+            "memoria_bytes": depois - memoria if memoria is not None and depois is not None else None,
+        }
+        logger.info("Página %s montada (%s) em %.0f ms", rota, origem, segundos * 1000)
+        return pagina
+
+
+# Layout da rota, ou None se a rota não for de uma página registrada
+def layout(rota):
+    modulo = _modulos.get(rota)
+    if modulo is None:
+        return None
+    if rota not in _relatorio:
+        pagina = _materializar(rota, "acesso")
+        if pagina is not None:
+            return pagina
+    return modulo.layout()
+
+
+def _preaquecer():
+    for rota in PAGINAS:
+        try:
+            _materializar(rota, "preaquecimento")
+        except Exception:
+            logger.exception("Falha ao preaquecer a página %s", rota)
+
+
+def preaquecer(segundo_plano=True):
+    if not PREAQUECER:
+        return
+    if segundo_plano:
+        threading.Thread(target=_preaquecer, name="preaquecer-paginas", daemon=True).start()
+    else:
+        _preaquecer()
+
+
+def relatorio():
+    return {rota: _relatorio.get(rota) for rota in PAGINAS}
+
+
+@app.server.route("/_paginas")
+def _rota_relatorio():
+    return jsonify(relatorio())
+
+
+# Memória das planilhas carregadas (antes/depois do esquema de tipos) e de
+# cada DataFrame dos snapshots
+@app.server.route("/_memoria")
+def _rota_memoria():
+    return jsonify(dados.relatorio_memoria())
+
+
+@metricas.registrar_coletor
+def _metricas():
+    linhas = [
+        "# HELP bi_pagina_montagem_segundos Tempo da primeira montagem de cada página.",
+        "# TYPE bi_pagina_montagem_segundos gauge",
+    ]
+    for rota, r in sorted(_relatorio.items()):
+        linhas.append(f'bi_pagina_montagem_segundos{{rota="{rota}"}} {r["segundos"]}')
+    linhas += [
+        "# HELP bi_dados_memoria_bytes Memória de cada DataFrame dos snapshots carregados.",
+        "# TYPE bi_dados_memoria_bytes gauge",
+    ]
+    for fonte, r in sorted(dados.relatorio_memoria().items()):
+        for quadro, tamanho in sorted(r["quadros"].items()):
+            linhas.append(f'bi_dados_memoria_bytes{{fonte="{fonte}",quadro="{quadro}"}} {tamanho}')
+    return linhas
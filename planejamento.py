@@ -0,0 +1,351 @@
+import bisect
+import logging
+import math
+import os
+import re
+import threading
+import time
+from datetime import date
+
+import pandas as pd
+from dash import html, dcc, dash_table, ctx, no_update
+import dash_bootstrap_components as dbc
+from dash.dependencies import Input, Output
+from app_instance import app
+import banco
+import caminho_critico
+import dados
+import graficos
+import metricas
+import tabelas
+
+# Páginas que registram as planilhas usadas no plano
+import BI_projetos
+import ambiental
+
+logger = logging.getLogger(__name__)
+
+PLANOS = {"projetos": "Projetos", "ambiental": "Ambiental"}
+
+# Duração (dias) de projeto ainda sem ritmo medido (sem Início ou 0% concluído)
+DURACAO_PADRAO = int(os.environ.get("BI_PLANEJAMENTO_DURACAO_DIAS", "90"))
+
+# Coluna opcional de Projetos.xlsx com os IDs dos projetos que precisam
+# terminar antes (ex.: "3, 7"). Sem ela os projetos são independentes.
+COLUNA_DEPENDENCIAS = "Depende de"
+
+# Tarefas no gráfico de Gantt (críticas primeiro, depois por início)
+LIMITE_GANTT = 60
+
+CORES = {"critica": "#EF5350", "folga": "#FFA726"}
+
+# Plano único com as tarefas das duas planilhas. Cada planilha recarregada
+# (ou a virada do dia) gera de novo só as suas tarefas, e o cronograma
+# recalcula só as que mudaram e as que dependem delas.
+PLANO = caminho_critico.Cronograma(date.today().toordinal())
+_versoes = {}
+_tarefas = {}
+_lock = threading.Lock()
+
+
+def _dia(valor):
+    return None if pd.isna(valor) else pd.Timestamp(valor).date().toordinal()
+
+
+# Coluna de datas em dias (date.toordinal()), sem passar por Timestamp a cada valor
+def _dias(serie):
+    return (serie.to_numpy(dtype="datetime64[D]").astype("int64") + date(1970, 1, 1).toordinal()).tolist()
+
+
+# Projeto: o ritmo até hoje (% Concluído desde o Início) dá a duração total;
+# concluído termina até hoje e sem ritmo medido usa DURACAO_PADRAO
+def tarefa_projeto(nome, inicio, concluido, dependencias, hoje):
+    progresso = 0.0 if pd.isna(concluido) else min(max(float(concluido) / 100, 0.0), 1.0)
+    inicio = _dia(inicio)
+    decorridos = hoje - inicio + 1 if inicio is not None and inicio <= hoje else 0
+    duracao = math.ceil(decorridos / progresso) if decorridos and progresso > 0 else DURACAO_PADRAO
+    return caminho_critico.Tarefa(nome, "projetos", inicio, duracao, progresso, dependencias)
+
+
+def _tarefas_projetos(snap, hoje):
+    if banco.ATIVO:
+        df = banco.ler(snap.tabela)
+    else:
+        df = snap.df
+    dependencias = df[COLUNA_DEPENDENCIAS] if COLUNA_DEPENDENCIAS in df.columns else pd.Series(None, index=df.index)
+    tarefas = {}
+    for id_, nome, inicio, concluido, deps in zip(
+        df["ID"], df["Nome do Projeto"], df["Início"], df["% Concluído"], dependencias
+    ):
+        if pd.isna(id_):
+            continue
+        deps = [] if pd.isna(deps) else [f"projetos:{d}" for d in re.findall(r"\d+", str(deps))]
+        tarefas[f"projetos:{int(id_)}"] = tarefa_projeto(str(nome), inicio, concluido, deps, hoje)
+    return tarefas
+
+
+# Atividades do cronograma ambiental (uma por Item e Cidade), com as datas da
+# planilha. Sem coluna de dependências, cada atividade depende, na mesma
+# cidade, das que terminam por último antes de ela começar; quando são várias,
+# passa por um marco (duração 0) que junta todas, para o grafo crescer com o
+# número de atividades e não com o quadrado. Como não há % concluído, o
+# andamento é o esperado pelas datas.
+def _tarefas_ambiental(snap, hoje):
+    colunas = ["Item", "Atividades", "Cidade", "Início", "Fim"]
+    longo = ambiental.longo(snap, date.fromordinal(hoje))
+    df = banco.ler(longo, colunas) if banco.ATIVO else longo[colunas]
+    df = df.dropna(subset=["Item", "Início", "Fim"])
+    tarefas = {}
+    for cidade, grupo in df.groupby("Cidade", observed=True, sort=False):
+        atividades = sorted(zip(_dias(grupo["Fim"]), _dias(grupo["Início"]), grupo["Item"].astype(int), grupo["Atividades"]))
+        fins = [a[0] for a in atividades]
+        for fim, inicio, item, nome in atividades:
+            anteriores = bisect.bisect_left(fins, inicio)
+            dependencias = []
+            if anteriores:
+                ultimo = fins[anteriores - 1]
+                primeiro = bisect.bisect_left(fins, ultimo)
+                if anteriores - primeiro == 1:
+                    dependencias = [f"ambiental:{cidade}:{atividades[primeiro][2]}"]
+                else:
+                    marco = f"ambiental:{cidade}:marco:{ultimo}"
+                    dependencias = [marco]
+                    if marco not in tarefas:
+                        tarefas[marco] = caminho_critico.Tarefa(
+                            f"Marco {date.fromordinal(ultimo).strftime('%d/%m/%Y')} ({cidade})", "ambiental", ultimo + 1, 0, 1,
+                            [f"ambiental:{cidade}:{a[2]}" for a in atividades[primeiro:anteriores]],
+                        )
+            duracao = fim - inicio + 1
+            tarefas[f"ambiental:{cidade}:{item}"] = caminho_critico.Tarefa(
+                f"{item} - {nome} ({cidade})", "ambiental", inicio, duracao, (hoje - inicio) / duracao, dependencias
+            )
+    return tarefas
+
+
+TAREFAS = {"projetos": _tarefas_projetos, "ambiental": _tarefas_ambiental}
+
+
+def atualizar_plano():
+    hoje = date.today()
+    with _lock:
+        mudou = False
+        for fonte in PLANOS:
+            snap = dados.snapshot(fonte)
+            if _versoes.get(fonte) != (snap.versao, hoje):
+                _tarefas[fonte] = TAREFAS[fonte](snap, hoje.toordinal())
+                _versoes[fonte] = (snap.versao, hoje)
+                mudou = True
+        if not mudou:
+            return
+        inicio = time.perf_counter()
+        todas = {chave: t for tarefas in _tarefas.values() for chave, t in tarefas.items()}
+        recalculadas = PLANO.sincronizar(todas, hoje.toordinal())
+        logger.info("Plano: %d de %d tarefas recalculadas em %.0f ms", recalculadas, len(todas),
+                    (time.perf_counter() - inicio) * 1000)
+
+
+# Planilha recarregada: atualiza o plano, se ele já foi montado
+@dados.ao_recarregar
+def _ao_recarregar(snap):
+    if snap.fonte in PLANOS and _versoes:
+        atualizar_plano()
+
+
+def _datas(dias):
+    return pd.to_datetime(dias - date(1970, 1, 1).toordinal(), unit="D")
+
+
+# Linhas do plano atual como DataFrame indexado pela chave, montado uma vez
+# por geração do cronograma (sem os marcos, em ordem de plano e início)
+_quadros = {}
+
+
+def _quadro_base(resultado):
+    df = _quadros.get(resultado["geracao"])
+    if df is None:
+        df = pd.DataFrame(resultado["linhas"], columns=["chave", "nome", "plano", "inicio", "fim", "cauda", "progresso", "marco"])
+        df = df[~df["marco"]].sort_values(["plano", "inicio", "nome"], kind="mergesort").set_index("chave")
+        _quadros.clear()
+        _quadros[resultado["geracao"]] = df
+    return df
+
+
+# Tabela do plano (simulado com `atraso` dias na tarefa `simulada`, se houver)
+# nos planos escolhidos. Numa simulação só as linhas das tarefas
+# recalculadas são trocadas; a folga sai de fim do plano - cauda - fim.
+def quadro_plano(planos, somente_criticas, simulada, atraso):
+    alteracoes = {}
+    if simulada and atraso:
+        tarefa = PLANO.tarefas().get(simulada)
+        if tarefa is not None:
+            alteracoes[simulada] = tarefa.com_atraso(atraso)
+    resultado = PLANO.resultado(alteracoes)
+    df = _quadro_base(resultado)
+    alteradas = [l for l in resultado["alteradas"].values() if not l["marco"]]
+    if alteradas:
+        df = df.copy()
+        novas = pd.DataFrame(alteradas).set_index("chave")
+        df.loc[novas.index, ["inicio", "fim", "cauda"]] = novas[["inicio", "fim", "cauda"]]
+    if planos:
+        df = df[df["plano"].isin(planos)]
+
+    folga = df["plano"].map(resultado["fim_planos"]) - df["cauda"] - df["fim"]
+    quadro = pd.DataFrame({
+        "Tarefa": df["nome"],
+        "Plano": df["plano"].map(PLANOS),
+        "Início": _datas(df["inicio"]),
+        "Fim projetado": _datas(df["fim"]),
+        "% Concluído": (df["progresso"] * 100).round().astype(int),
+        "Folga (dias)": folga,
+        "Crítica": folga.le(0).map({True: "Sim", False: "Não"}),
+    }).reset_index(drop=True)
+    if somente_criticas:
+        quadro = quadro[quadro["Crítica"] == "Sim"]
+    return quadro, resultado
+
+
+@metricas.fase("figuras")
+def montar_gantt(df):
+    criticas = df[df["Crítica"] == "Sim"].sort_values("Início", kind="mergesort")
+    demais = df[df["Crítica"] == "Não"].sort_values("Início", kind="mergesort")
+    visiveis = pd.concat([criticas, demais]).head(LIMITE_GANTT).sort_values("Início", kind="mergesort")
+    traces = []
+    for rotulo, critica, cor in (("Crítica", "Sim", CORES["critica"]), ("Com folga", "Não", CORES["folga"])):
+        parte = visiveis[visiveis["Crítica"] == critica]
+        duracao = (parte["Fim projetado"] - parte["Início"] + pd.Timedelta(days=1)).dt.total_seconds() * 1000
+        traces.append({
+            "type": "bar", "name": rotulo, "orientation": "h", "y": parte["Tarefa"].tolist(),
+            "base": parte["Início"].dt.strftime("%Y-%m-%d").tolist(), "x": duracao.tolist(), "marker": {"color": cor},
+            "customdata": list(zip(parte["Fim projetado"].dt.strftime("%Y-%m-%d"), parte["Folga (dias)"].tolist())),
+            "hovertemplate": "%{y}<br>Início: %{base}<br>Fim projetado: %{customdata[0]}<br>Folga: %{customdata[1]} dias<extra></extra>",
+        })
+    return graficos.figura(
+        traces,
+        title={"text": f"Cronograma projetado ({len(visiveis)} de {len(df)} tarefas)"},
+        xaxis={"type": "date"},
+        yaxis={"autorange": "reversed", "categoryorder": "array", "categoryarray": visiveis["Tarefa"].tolist()},
+        barmode="overlay", height=max(400, 22 * len(visiveis) + 120), legend={"orientation": "h"},
+    )
+
+
+def _resumo(resultado, ms):
+    partes = [f"Fim projetado {PLANOS[p]}: {date.fromordinal(f).strftime('%d/%m/%Y')}"
+              for p, f in sorted(resultado["fim_planos"].items())]
+    if resultado["recalculadas"]:
+        partes.append(f"simulação: {resultado['recalculadas']} tarefas recalculadas em {ms:.1f} ms")
+    return " · ".join(partes)
+
+
+CARTAO = {
+    "backgroundColor": "#192A35",
+    "borderRadius": "15px",
+    "boxShadow": "0 0 10px rgba(0, 255, 255, 0.2)",
+    "padding": "10px",
+    "marginBottom": "20px"
+}
+
+
+# Layout da página (montar o layout garante o plano na versão atual dos dados)
+def layout():
+    atualizar_plano()
+    tarefas = PLANO.tarefas()
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col(html.H2("B.I PPGC - PLANEJAMENTO", className="text-center fw-bold text-light mb-4"))
+        ]),
+
+        dbc.Row([
+            # Filtros laterais e simulação
+            dbc.Col([
+                html.Div([
+                    html.Label("Plano", className="fw-bold text-light"),
+                    dcc.Dropdown(
+                        options=[{"label": nome, "value": p} for p, nome in PLANOS.items()],
+                        id="filtro-plano-planejamento", placeholder="Todos", multi=True, className="mb-3"
+                    ),
+                    dbc.Checklist(
+                        options=[{"label": "Só tarefas críticas", "value": "criticas"}],
+                        value=[], id="filtro-criticas-planejamento", switch=True, className="text-light mb-4"
+                    ),
+                    html.Label("Simular atraso", className="fw-bold text-light"),
+                    dcc.Dropdown(
+                        options=[{"label": t.nome, "value": chave} for chave, t in sorted(tarefas.items(), key=lambda i: i[1].nome)],
+                        id="tarefa-simulada-planejamento", placeholder="Tarefa", className="mb-2"
+                    ),
+                    dcc.Input(
+                        id="atraso-planejamento", type="number", min=0, step=1, debounce=True,
+                        placeholder="Dias de atraso", className="form-control"
+                    ),
+                ], style={"backgroundColor": "#0E1A21", "padding": "20px", "borderRadius": "10px"})
+            ], width=2),
+
+            # Resumo, Gantt e tabela
+            dbc.Col([
+                html.Div(id="resumo-planejamento", className="text-light mb-2"),
+                dbc.Card(dcc.Graph(id="grafico-planejamento"), style=CARTAO),
+                dbc.Card(
+                    dash_table.DataTable(
+                        id="tabela-planejamento",
+                        columns=[
+                            {"name": c, "id": c, **({"type": "numeric"} if c in ("% Concluído", "Folga (dias)") else {})}
+                            for c in ("Tarefa", "Plano", "Início", "Fim projetado", "% Concluído", "Folga (dias)", "Crítica")
+                        ],
+                        style_table={'overflowX': 'auto'},
+                        style_cell={'textAlign': 'left', 'backgroundColor': '#192A35', 'color': '#C2E0E7', 'whiteSpace': 'normal', 'height': 'auto'},
+                        style_header={'fontWeight': 'bold', 'backgroundColor': '#263640', 'color': '#C2E0E7'},
+                        style_data_conditional=[
+                            {"if": {"filter_query": '{Crítica} = "Sim"'}, "color": CORES["critica"]},
+                        ],
+                        **tabelas.MODO_SERVIDOR
+                    ),
+                    style=CARTAO
+                ),
+            ], width=10)
+        ])
+    ], fluid=True, style={"backgroundColor": "#121E26", "minHeight": "100vh", "padding": "20px"})
+
+
+# CALLBACKS
+@app.callback(
+    Output("tabela-planejamento", "data"),
+    Output("tabela-planejamento", "page_count"),
+    Output("tabela-planejamento", "page_current"),
+    Output("grafico-planejamento", "figure"),
+    Output("resumo-planejamento", "children"),
+    Input("filtro-plano-planejamento", "value"),
+    Input("filtro-criticas-planejamento", "value"),
+    Input("tarefa-simulada-planejamento", "value"),
+    Input("atraso-planejamento", "value"),
+    Input("tabela-planejamento", "page_current"),
+    Input("tabela-planejamento", "page_size"),
+    Input("tabela-planejamento", "sort_by"),
+    Input("tabela-planejamento", "filter_query")
+)
+def atualizar_planejamento(planos, criticas, simulada, atraso, page_current, page_size, sort_by, filter_query):
+    atualizar_plano()
+    inicio = time.perf_counter()
+    df, resultado = quadro_plano(planos, "criticas" in (criticas or []), simulada, int(atraso or 0))
+    ms = (time.perf_counter() - inicio) * 1000
+
+    tabela, page_count, page_current = tabelas.pagina(df, page_current, page_size, sort_by, filter_query)
+    # As datas ficam como datetime no quadro (ordenação e filtro); texto só na página enviada
+    for linha in tabela:
+        linha["Início"] = linha["Início"].strftime("%Y-%m-%d")
+        linha["Fim projetado"] = linha["Fim projetado"].strftime("%Y-%m-%d")
+
+    # Paginação, ordenação e filtro da tabela não mudam o gráfico
+    if ctx.triggered_id == "tabela-planejamento":
+        return tabela, page_count, page_current, no_update, no_update
+    return tabela, page_count, page_current, montar_gantt(df), _resumo(resultado, ms)
+
+
+@metricas.registrar_coletor
+def _metricas():
+    return [
+        "# HELP bi_planejamento_tarefas Tarefas no plano da página Planejamento.",
+        "# TYPE bi_planejamento_tarefas gauge",
+        f"bi_planejamento_tarefas {len(PLANO.tarefas())}",
+        "# HELP bi_planejamento_recalculadas Tarefas recalculadas na última atualização do plano.",
+        "# TYPE bi_planejamento_recalculadas gauge",
+        f"bi_planejamento_recalculadas {PLANO.recalculadas}",
+    ]
@@ -0,0 +1,173 @@
+import calendar
+import functools
+import os
+import re
+import unicodedata
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+EM_ANDAMENTO = "Em andamento"
+PROXIMOS_PASSOS = "Próximos passos"
+VENCIDO = "Prazo vencido"
+
+MESES = {
+    "janeiro": 1, "fevereiro": 2, "marco": 3, "abril": 4, "maio": 5, "junho": 6,
+    "julho": 7, "agosto": 8, "setembro": 9, "outubro": 10, "novembro": 11, "dezembro": 12,
+    "jan": 1, "fev": 2, "mar": 3, "abr": 4, "mai": 5, "jun": 6,
+    "jul": 7, "ago": 8, "set": 9, "out": 10, "nov": 11, "dez": 12,
+}
+_MES = "|".join(sorted(MESES, key=len, reverse=True))
+
+_TOKENS = re.compile(
+    rf"(?P<data>\b(?P<d_dia>\d{{1,2}})/(?P<d_mes>\d{{1,2}})(?:/(?P<d_ano>\d{{4}}|\d{{2}}))?\b)"
+    rf"|(?P<quinzena>\b(?P<q_ordem>1|2|primeira|segunda)\s*[ao°]?\s*quinzena(?:\s+de)?\s+(?P<q_mes>{_MES})\b"
+    rf"(?:\s*(?:/|de|-)?\s*(?P<q_ano>\d{{4}}))?)"
+    rf"|(?P<mes>\b(?P<m_mes>{_MES})\b(?:\s*(?:/|de|-)?\s*(?P<m_ano>\d{{4}}\b|(?<=/)\d{{2}}\b))?)"
+    rf"|(?P<ano>\b20\d{{2}}\b)"
+)
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize("NFKD", str(texto).lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", texto).strip()
+
+
+def _ano(texto):
+    ano = int(texto)
+    return ano + 2000 if ano < 100 else ano
+
+
+def _fim_do_mes(ano, mes):
+    return calendar.monthrange(ano, mes)[1]
+
+
+def _ler_tokens(texto):
+    # Cada token é [mes, dia_inicio, dia_fim, ano ou None, posição no texto];
+    # dia_fim None = fim do mês
+    tokens = []
+    for m in _TOKENS.finditer(texto):
+        if m.group("data"):
+            mes, dia = int(m.group("d_mes")), int(m.group("d_dia"))
+            if 1 <= mes <= 12 and 1 <= dia <= 31:
+                ano = _ano(m.group("d_ano")) if m.group("d_ano") else None
+                tokens.append([mes, dia, dia, ano, m.start()])
+        elif m.group("quinzena"):
+            mes = MESES[m.group("q_mes")]
+            ano = _ano(m.group("q_ano")) if m.group("q_ano") else None
+            if m.group("q_ordem") in ("1", "primeira"):
+                tokens.append([mes, 1, 15, ano, m.start()])
+            else:
+                tokens.append([mes, 16, None, ano, m.start()])
+        elif m.group("mes"):
+            ano = _ano(m.group("m_ano")) if m.group("m_ano") else None
+            tokens.append([MESES[m.group("m_mes")], 1, None, ano, m.start()])
+        else:
+            # Ano solto ("Julho a Dezembro de 2025") vale para os meses sem ano
+            tokens.append([None, None, None, int(m.group("ano")), m.start()])
+    return tokens
+
+
+# Ano usado quando o prazo não informa o ano (ex.: "Julho/Agosto"):
+# BI_ANO_CRONOGRAMA ou o ano de `hoje`. Lido a cada chamada, para que um
+# processo que atravessa o 1º de janeiro passe a usar o ano novo.
+def ano_corrente(hoje=None):
+    ano = os.environ.get("BI_ANO_CRONOGRAMA")
+    return int(ano) if ano else pd.Timestamp(hoje or date.today()).year
+
+
+def _resolver_anos(tokens, ano_padrao):
+    anos = [t[3] for t in tokens]
+    datas = [t for t in tokens if t[0] is not None]
+    anterior = None
+    for i, token in enumerate(tokens):
+        if token[0] is None:
+            continue
+        if token[3] is None:
+            seguinte = next((a for a in anos[i + 1:] if a is not None), None)
+            if seguinte is not None:
+                token[3] = seguinte
+            elif anterior is not None:
+                # "Novembro a Fevereiro": o mês menor é do ano seguinte
+                token[3] = anterior[3] + (1 if token[0] < anterior[0] else 0)
+            else:
+                token[3] = ano_padrao
+        anterior = token
+    return datas
+
+
+# Interpreta um texto livre de prazo e devolve (inicio, fim) como datas; cada
+# extremidade pode ser None ("até Agosto" não tem início, "a partir de Julho"
+# não tem fim). Textos sem nenhuma data reconhecida devolvem (None, None).
+# Sem `ano_padrao`, os prazos sem ano ficam no ano_corrente() da chamada.
+def interpretar_prazo(prazo, ano_padrao=None):
+    return _interpretar_prazo(prazo, ano_padrao or ano_corrente())
+
+
+# O resultado é guardado por valor da célula, que se repete muito na planilha,
+# e pelo ano padrão, já resolvido
+@functools.lru_cache(maxsize=4096)
+def _interpretar_prazo(prazo, ano_padrao):
+    texto = _normalizar(prazo)
+    datas = _resolver_anos(_ler_tokens(texto), ano_padrao)
+    if not datas:
+        return None, None
+
+    inicios, fins = [], []
+    for mes, dia_inicio, dia_fim, ano, _ in datas:
+        ultimo = _fim_do_mes(ano, mes)
+        inicios.append(date(ano, mes, min(dia_inicio, ultimo)))
+        fins.append(date(ano, mes, min(dia_fim or ultimo, ultimo)))
+    inicio, fim = min(inicios), max(fins)
+
+    # "até" só abre o início quando vem antes da primeira data ("até Agosto");
+    # em "Julho até Setembro" é o fim de um intervalo fechado. Do mesmo modo,
+    # "a partir de" só abre o fim se nenhum "até" vier depois dele.
+    primeira = datas[0][4]
+    ate = [m.start() for m in re.finditer(r"\bate\b", texto)]
+    if ate and ate[0] < primeira:
+        inicio = None
+    partir = re.search(r"\ba ?partir\b", texto)
+    if partir and not any(p > partir.start() for p in ate):
+        fim = None
+    return inicio, fim
+
+
+# Converte uma coluna inteira de prazos em colunas de início e fim. Cada valor
+# distinto é interpretado uma única vez e o resultado é espalhado pelos códigos.
+def interpretar_coluna(serie, ano_padrao=None):
+    ano_padrao = ano_padrao or ano_corrente()
+    codigos, valores = pd.factorize(serie)
+    intervalos = [_interpretar_prazo(str(v), ano_padrao) for v in valores]
+    inicios = pd.to_datetime([i for i, _ in intervalos] + [None])
+    fins = pd.to_datetime([f for _, f in intervalos] + [None])
+    # Código -1 (célula vazia) aponta para o último item, que é NaT
+    return (
+        pd.Series(inicios.take(codigos), index=serie.index, name="Início"),
+        pd.Series(fins.take(codigos), index=serie.index, name="Fim"),
+    )
+
+
+# Status de cada prazo em relação a hoje; prazos não reconhecidos ficam None
+def calcular_status(inicio, fim, hoje=None):
+    hoje = pd.Timestamp(hoje or date.today())
+    conhecido = inicio.notna() | fim.notna()
+    status = np.select(
+        [~conhecido, fim.notna() & (fim < hoje), inicio.notna() & (inicio > hoje)],
+        [None, VENCIDO, PROXIMOS_PASSOS],
+        default=EM_ANDAMENTO,
+    )
+    return pd.Series(status, index=inicio.index, name="Status")
+
+
+# Linhas cujo prazo cruza a janela [inicio, fim]; extremidades abertas do
+# prazo ou da janela não limitam
+def filtrar_janela(df, inicio=None, fim=None, col_inicio="Início", col_fim="Fim"):
+    mascara = df[col_inicio].notna() | df[col_fim].notna()
+    if inicio is not None:
+        mascara &= df[col_fim].isna() | (df[col_fim] >= pd.Timestamp(inicio))
+    if fim is not None:
+        mascara &= df[col_inicio].isna() | (df[col_inicio] <= pd.Timestamp(fim))
+    return df[mascara]
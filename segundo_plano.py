@@ -0,0 +1,127 @@
+import functools
+import logging
+import os
+from datetime import date
+
+import dash_bootstrap_components as dbc
+from dash import DiskcacheManager
+from dash.dependencies import Input, Output
+
+from app_instance import app
+import dados
+import metricas
+import modo_cliente
+
+try:
+    import diskcache
+except ImportError:  # sem diskcache os callbacks pesados rodam no próprio worker
+    diskcache = None
+
+logger = logging.getLogger(__name__)
+
+# Callbacks em segundo plano: com BI_SEGUNDO_PLANO=1 os callbacks pesados
+# (recalcular tabela e gráficos) rodam num processo à parte, gerenciado pelo
+# DiskcacheManager do Dash, e o worker fica livre para outras requisições. O
+# navegador consulta o andamento a cada INTERVALO_MS; um pedido novo do mesmo
+# callback (filtro trocado antes de terminar) encerra o processo anterior.
+ATIVO = os.environ.get("BI_SEGUNDO_PLANO", "0") == "1" and not modo_cliente.ATIVO
+PASTA = os.environ.get("BI_SEGUNDO_PLANO_DIR", os.path.join(dados.CACHE_DIR, "tarefas"))
+INTERVALO_MS = int(os.environ.get("BI_SEGUNDO_PLANO_INTERVALO_MS", "500"))
+# Resultados ficam no disco por este tempo (s) e são compartilhados entre workers
+EXPIRA = int(os.environ.get("BI_SEGUNDO_PLANO_EXPIRA", "3600"))
+
+
+# Versões dos dados e o dia entram na chave dos resultados guardados: uma
+# recarga da planilha (ou a virada do dia, para o Status do ambiental) não
+# reaproveita resultados antigos
+def _chave_dados():
+    return sorted(dados.versoes().items()), date.today().isoformat()
+
+
+# Medição (metricas) do callback que rodou no processo da tarefa `job`
+def _chave_medicao(job):
+    return f"metricas-{job}"
+
+
+class _Gerenciador(DiskcacheManager):
+    # Ao entregar o resultado de uma tarefa, soma ao /metrics deste worker a
+    # medição que o processo dela deixou no cache (ver tarefa em callback()).
+    # Resultados já guardados (sem job) não rodaram nada e não contam.
+    def get_result(self, key, job):
+        resultado = super().get_result(key, job)
+        if resultado is not self.UNDEFINED and job:
+            medicao = self.handle.pop(_chave_medicao(job), None)
+            if medicao is not None:
+                metricas.receber(*medicao)
+        return resultado
+
+
+def _enviar_medicao(nome, medicao):
+    gerenciador.handle.set(_chave_medicao(os.getpid()), (nome, medicao), expire=EXPIRA)
+
+
+gerenciador = None
+if ATIVO:
+    try:
+        if diskcache is None:
+            raise ImportError("diskcache")
+        # Também exige multiprocess e psutil (verificados pelo Dash aqui)
+        gerenciador = _Gerenciador(diskcache.Cache(PASTA), cache_by=[_chave_dados], expire=EXPIRA)
+    except ImportError:
+        logger.warning("Callbacks em segundo plano desligados: instale dash[diskcache]")
+        ATIVO = False
+
+# set_progress do callback em andamento. Cada tarefa roda no seu próprio
+# processo, então basta uma variável global.
+_progresso = None
+
+
+# Informa o andamento (0 a 100) do callback em segundo plano; fora dele não faz nada
+def progresso(valor):
+    if _progresso is not None:
+        _progresso(valor)
+
+
+# Barra de andamento de uma página; só existe com o segundo plano ativo
+def barra(id_barra):
+    if not ATIVO:
+        return []
+    return [dbc.Progress(id=id_barra, value=0, striped=True, animated=True,
+                         style={"height": "4px", "visibility": "hidden"}, className="mb-2")]
+
+
+# Como app.callback, mas em segundo plano quando ativo. `id_barra` é a barra
+# de andamento da página (ver barra()), exibida enquanto o callback roda e
+# atualizada pelas chamadas a progresso(); trocar de página cancela a tarefa.
+def callback(id_barra, *dependencias):
+    def registrar(funcao):
+        if not ATIVO:
+            return app.callback(*dependencias)(funcao)
+
+        # Roda no processo da tarefa, dentro da medição do metricas: a medição
+        # segue pelo cache para o worker que entregar o resultado
+        @functools.wraps(funcao)
+        def tarefa(set_progress, *args):
+            global _progresso
+            metricas.redirecionar(_enviar_medicao)
+            _progresso = set_progress
+            try:
+                return funcao(*args)
+            finally:
+                _progresso = None
+
+        return app.callback(
+            *dependencias,
+            background=True,
+            manager=gerenciador,
+            interval=INTERVALO_MS,
+            progress=Output(id_barra, "value"),
+            progress_default=0,
+            running=[(Output(id_barra, "style"), {"height": "4px", "visibility": "visible"},
+                      {"height": "4px", "visibility": "hidden"})],
+            cancel=[Input("url", "pathname")],
+            # A chave inclui quem disparou: atualizar_tudo devolve no_update
+            # nos gráficos quando só a tabela mudou
+            cache_ignore_triggered=False,
+        )(tarefa)
+    return registrar
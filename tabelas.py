@@ -0,0 +1,125 @@
+import math
+import re
+
+import pandas as pd
+
+import metricas
+
+# Linhas por página nas tabelas com paginação no servidor
+TAMANHO_PAGINA = 20
+
+# Propriedades do DataTable para o modo servidor: paginação, ordenação e
+# filtro são feitos no callback e só a página visível vai para o navegador
+MODO_SERVIDOR = dict(
+    page_action="custom",
+    sort_action="custom",
+    sort_mode="multi",
+    filter_action="custom",
+    page_current=0,
+    page_size=TAMANHO_PAGINA,
+    sort_by=[],
+    filter_query="",
+)
+
+# Propriedades do DataTable quando os dados já estão no navegador (modo cliente)
+MODO_NATIVO = dict(
+    page_action="native",
+    sort_action="native",
+    sort_mode="multi",
+    filter_action="native",
+    page_size=TAMANHO_PAGINA,
+)
+
+# Expressão do filter_query do DataTable, ex.: {% Concluído} >= 50 && {Status} contains And
+_TERMO = re.compile(
+    r"^\s*\{(?P<coluna>[^}]+)\}\s*"
+    r"(?P<caso>[si]?)(?P<op>>=|<=|!=|=|<|>|eq|ne|lt|le|gt|ge|contains|datestartswith)\s*"
+    r"(?P<valor>.*?)\s*$"
+)
+_OPERADORES = {
+    "eq": "=", "ne": "!=", "lt": "<", "le": "<=", "gt": ">", "ge": ">=",
+}
+
+
+def _ler_valor(texto):
+    if len(texto) >= 2 and texto[0] == texto[-1] and texto[0] in "'\"`":
+        return texto[1:-1].replace("\\" + texto[0], texto[0])
+    return texto
+
+
+def interpretar_filtro(filter_query):
+    # Converte o filter_query em uma lista de (coluna, operador, valor, sensível)
+    termos = []
+    for parte in (filter_query or "").split(" && "):
+        encontrado = _TERMO.match(parte)
+        if not encontrado:
+            continue
+        op = _OPERADORES.get(encontrado.group("op"), encontrado.group("op"))
+        sensivel = encontrado.group("caso") != "i"
+        termos.append((encontrado.group("coluna"), op, _ler_valor(encontrado.group("valor")), sensivel))
+    return termos
+
+
+def _comparar(serie, op, valor, sensivel):
+    if op == "contains":
+        return serie.astype(str).str.contains(valor, case=sensivel, regex=False, na=False)
+    if op == "datestartswith":
+        return serie.astype(str).str.startswith(valor, na=False)
+
+    if pd.api.types.is_numeric_dtype(serie):
+        try:
+            valor = float(valor)
+        except ValueError:
+            return pd.Series(False, index=serie.index)
+    else:
+        serie = serie.astype(str)
+        if not sensivel:
+            serie, valor = serie.str.lower(), valor.lower()
+
+    if op == "=":
+        return serie == valor
+    if op == "!=":
+        return serie != valor
+    if op == "<":
+        return serie < valor
+    if op == "<=":
+        return serie <= valor
+    if op == ">":
+        return serie > valor
+    return serie >= valor
+
+
+def filtrar(dff, filter_query):
+    mascara = None
+    for coluna, op, valor, sensivel in interpretar_filtro(filter_query):
+        if coluna not in dff.columns:
+            continue
+        cond = _comparar(dff[coluna], op, valor, sensivel)
+        mascara = cond if mascara is None else mascara & cond
+    return dff if mascara is None else dff[mascara]
+
+
+def ordenar(dff, sort_by):
+    sort_by = [s for s in (sort_by or []) if s["column_id"] in dff.columns]
+    if not sort_by:
+        return dff
+    return dff.sort_values(
+        [s["column_id"] for s in sort_by],
+        ascending=[s["direction"] == "asc" for s in sort_by],
+        kind="mergesort",
+        na_position="last",
+    )
+
+
+# Aplica filtro e ordenação do DataTable e devolve só a página pedida, junto
+# com o total de páginas e a página efetivamente usada (ajustada quando o
+# filtro deixa menos páginas do que a atual)
+@metricas.fase("tabela")
+def pagina(dff, page_current, page_size, sort_by, filter_query):
+    page_size = page_size or TAMANHO_PAGINA
+    dff = ordenar(filtrar(dff, filter_query), sort_by)
+    page_count = max(1, math.ceil(len(dff) / page_size))
+    page_current = min(page_current or 0, page_count - 1)
+    inicio = page_current * page_size
+    registros = dff.iloc[inicio:inicio + page_size].to_dict('records')
+    return registros, page_count, page_current
@@ -0,0 +1,34 @@
+# Categorias além do limite viram "Outros"; na média, o "Outros" é a média
+# das linhas que ele junta, e não a média das médias das categorias.
+import numpy as np
+import pandas as pd
+import pytest
+
+from agregacao import OUTROS, somar
+
+
+def test_media_do_outros_pondera_pelas_linhas():
+    df = pd.DataFrame({
+        "Projeto": ["a"] * 3 + ["b"] * 2 + ["c"] + ["d"] * 50,
+        "% Concluído": [1.0] * 3 + [0.9] * 2 + [0.0] + [0.5] * 50,
+    })
+    resultado = somar(df, "Projeto", "% Concluído", limite=3, funcao="mean")
+    assert list(resultado["Projeto"]) == ["a", "b", OUTROS]
+    # c (1 linha, 0.0) e d (50 linhas, 0.5): 25 / 51, não (0.0 + 0.5) / 2
+    assert resultado["% Concluído"].iloc[-1] == pytest.approx(25 / 51)
+
+
+def test_media_do_outros_ignora_vazios():
+    df = pd.DataFrame({
+        "Projeto": ["a", "b", "c", "c", "d"],
+        "% Concluído": [1.0, 0.9, np.nan, 0.2, np.nan],
+    })
+    resultado = somar(df, "Projeto", "% Concluído", limite=3, funcao="mean")
+    assert resultado["% Concluído"].iloc[-1] == pytest.approx(0.2)
+
+
+def test_soma_do_outros():
+    df = pd.DataFrame({"Setor": list("abcdd"), "Atividades": [5, 4, 1, 1, 2]})
+    resultado = somar(df, "Setor", "Atividades", limite=3)
+    assert list(resultado["Setor"]) == ["a", "b", OUTROS]
+    assert resultado["Atividades"].iloc[-1] == 4
@@ -0,0 +1,86 @@
+# O recálculo incremental do Cronograma tem de dar o mesmo resultado que um
+# plano montado do zero com as mesmas tarefas, inclusive com ciclos (em que a
+# aresta descartada pode mudar de uma atualização para outra).
+import logging
+import random
+
+import pytest
+
+from caminho_critico import Cronograma, Tarefa
+
+logging.getLogger("caminho_critico").setLevel(logging.ERROR)
+
+HOJE = 90
+
+
+def _datas(cronograma, alteracoes=None):
+    resultado = cronograma.resultado(alteracoes)
+    linhas = {linha["chave"]: linha for linha in resultado["linhas"]}
+    linhas.update(resultado["alteradas"])
+    fim_planos = resultado["fim_planos"]
+    return {
+        k: (l["inicio"], l["fim"], fim_planos[l["plano"]] - l["cauda"] - l["fim"])
+        for k, l in linhas.items()
+    }, fim_planos
+
+
+def _do_zero(tarefas, hoje=HOJE):
+    cronograma = Cronograma(hoje)
+    cronograma.sincronizar(tarefas)
+    return _datas(cronograma)
+
+
+def _tarefa(rng, chave, chaves):
+    predecessoras = rng.sample(chaves, rng.randint(0, min(3, len(chaves))))
+    return Tarefa(
+        chave, rng.choice("AB"), rng.choice([None, 100 + rng.randint(0, 10)]), rng.randint(0, 5),
+        rng.choice([0, 0.5, 1]), predecessoras,
+    )
+
+
+def test_ciclo_com_aresta_descartada_diferente():
+    def plano(grafo):
+        return {k: Tarefa(k, "A", 100 + i, 1 + i % 5, 0, ps) for i, (k, ps) in enumerate(grafo.items())}
+
+    grafo = {"t0": ("t1", "t2"), "t1": ("t1", "t0"), "t2": ("t2",), "t3": ("t2",), "t4": ()}
+    cronograma = Cronograma(HOJE)
+    cronograma.sincronizar(plano(grafo))
+    grafo["t2"] = ("t1", "t0")
+    cronograma.sincronizar(plano(grafo))
+    assert _datas(cronograma) == _do_zero(plano(grafo))
+
+
+@pytest.mark.parametrize("semente", range(40))
+def test_incremental_igual_ao_plano_do_zero(semente):
+    rng = random.Random(semente)
+    chaves = [f"t{i}" for i in range(rng.randint(2, 25))]
+    # Predecessoras sorteadas entre todas as tarefas: ciclos são comuns
+    tarefas = {k: _tarefa(rng, k, chaves) for k in chaves}
+    cronograma = Cronograma(HOJE)
+    cronograma.sincronizar(tarefas)
+    assert _datas(cronograma) == _do_zero(tarefas)
+
+    hoje = HOJE
+    for passo in range(30):
+        tarefas = dict(tarefas)
+        sorteio = rng.random()
+        if sorteio < 0.5 or len(tarefas) < 3:
+            k = rng.choice(chaves)
+            tarefas[k] = _tarefa(rng, k, chaves)
+        elif sorteio < 0.7:
+            del tarefas[rng.choice(sorted(tarefas))]
+        elif sorteio < 0.9:
+            k = f"n{passo}"
+            chaves.append(k)
+            tarefas[k] = _tarefa(rng, k, chaves)
+        else:
+            hoje += 1
+        cronograma.sincronizar(tarefas, hoje)
+        assert _datas(cronograma) == _do_zero(tarefas, hoje), f"passo {passo}"
+
+        # Simulação de atraso: igual ao plano do zero com a tarefa atrasada
+        k = rng.choice(sorted(tarefas))
+        simulada = tarefas[k].com_atraso(rng.randint(1, 10))
+        esperado = _do_zero(dict(tarefas, **{k: simulada}), hoje)
+        assert _datas(cronograma, {k: simulada}) == esperado, f"simulação no passo {passo}"
+        assert _datas(cronograma) == _do_zero(tarefas, hoje)
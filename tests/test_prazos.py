@@ -0,0 +1,35 @@
+# Leitura dos prazos em texto livre: intervalos fechados, abertos no início
+# ("até") ou no fim ("a partir de") e o ano padrão dos prazos sem ano.
+from datetime import date
+
+import pytest
+
+from prazos import interpretar_prazo
+
+ANO = 2025
+
+
+@pytest.mark.parametrize("prazo, esperado", [
+    # "até" depois de uma data fecha o intervalo
+    ("de Julho até Setembro", (date(2025, 7, 1), date(2025, 9, 30))),
+    ("Julho até Setembro", (date(2025, 7, 1), date(2025, 9, 30))),
+    ("De 01/07 até 30/09/2025", (date(2025, 7, 1), date(2025, 9, 30))),
+    ("A partir de Julho até Setembro de 2025", (date(2025, 7, 1), date(2025, 9, 30))),
+    ("Julho a Setembro", (date(2025, 7, 1), date(2025, 9, 30))),
+    # "até" antes da primeira data e "a partir de" abrem uma das pontas
+    ("Até Agosto", (None, date(2025, 8, 31))),
+    ("até 15/08/2025", (None, date(2025, 8, 15))),
+    ("Até a 2ª quinzena de Agosto", (None, date(2025, 8, 31))),
+    ("A partir de Julho", (date(2025, 7, 1), None)),
+    # Sem data reconhecida
+    ("Contínuo", (None, None)),
+])
+def test_interpretar_prazo(prazo, esperado):
+    assert interpretar_prazo(prazo, ANO) == esperado
+
+
+def test_ano_padrao_lido_na_chamada(monkeypatch):
+    monkeypatch.setenv("BI_ANO_CRONOGRAMA", "2031")
+    assert interpretar_prazo("Julho/Agosto") == (date(2031, 7, 1), date(2031, 8, 31))
+    monkeypatch.setenv("BI_ANO_CRONOGRAMA", "2032")
+    assert interpretar_prazo("Julho/Agosto") == (date(2032, 7, 1), date(2032, 8, 31))
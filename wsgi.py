@@ -0,0 +1,38 @@
+# Entrada de produção: o servidor Flask do Dash sob o gunicorn, com vários
+# processos (configuração em gunicorn.conf.py)
+#
+#   gunicorn -c gunicorn.conf.py wsgi:server
+#
+# O app e as planilhas são carregados uma vez no processo mestre e herdados
+# pelos workers no fork. O cache Arrow das planilhas fica em /dev/shm e é lido
+# por memory map, então todos os processos usam as mesmas páginas de memória;
+# numa recarga o primeiro worker regrava o cache e os outros mapeiam o novo.
+import gc
+import hashlib
+import os
+
+os.environ["BI_PREFORK"] = "1"
+if os.path.isdir("/dev/shm"):
+    # Uma pasta por instalação, para dois apps na mesma máquina não se misturarem
+    instalacao = hashlib.sha1(os.path.abspath(os.path.dirname(__file__)).encode()).hexdigest()[:8]
+    os.environ.setdefault("BI_CACHE_DIR", os.path.join("/dev/shm", f"bi_ppgc-{instalacao}"))
+
+from app import app  # noqa: E402
+import estaticos  # noqa: E402
+import paginas  # noqa: E402
+
+# Versões WebP/AVIF das imagens de assets/ (o mesmo que python estaticos.py);
+# só as que faltam ou estão desatualizadas são gravadas
+try:
+    estaticos.pre_codificar()
+except OSError:
+    estaticos.logger.exception("Falha ao pré-codificar as imagens de assets/")
+
+# Planilhas lidas e páginas montadas antes do fork
+paginas.preaquecer(segundo_plano=False)
+
+# O que já existe sai da coleta de lixo: o GC dos workers não grava nesses
+# objetos e as páginas continuam compartilhadas (copy-on-write)
+gc.freeze()
+
+server = app.server